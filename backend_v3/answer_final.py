@@ -1,14 +1,23 @@
-import pandas as pd
 from datetime import datetime, timedelta
-from ortools.sat.python import cp_model
+import os
 import sys
+import threading
 import time
-import joblib
 import json
-import shap
-import numpy as np
+import logging
+from lazy_imports import LazyModule, import_now
 
-# --- 1. CONFIGURATION AND MODELS (Loaded once) ---
+# Heavy dependencies are imported on first use, so tooling that only needs the
+# constants or helpers imports this module in milliseconds. warm_up() pulls them in.
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+joblib = LazyModule("joblib")
+shap = LazyModule("shap")
+cp_model = LazyModule("ortools.sat.python.cp_model")
+# Model reloads happen on server request threads; they go to the servers' logging, not stdout.
+LOGGER = logging.getLogger(__name__)
+
+# --- 1. CONFIGURATION AND MODELS (Loaded on first use) ---
 SIMULATION_START_DATE = datetime(2025, 9, 1)
 SIMULATION_MONTH_DAYS = 30
 DAILY_KM_PER_TRAIN = 200
@@ -16,11 +25,112 @@ DAILY_HOURS_PER_TRAIN = 16
 CERTIFICATE_VALIDITY_DAYS = 365
 BOGIE_SERVICE_INTERVAL_KM = 25000
 PENALTY_PER_EXPIRED_DAY = 5
+MODEL_FILE = "strategy_model.joblib"
+# Lookup-table form of the model, written by strategy_grid.py. Used instead of the
+# forest when it was compiled from the current MODEL_FILE.
+STRATEGY_GRID_FILE = "strategy_grid.npz"
+# Read-only memory map for the model's numpy arrays: processes loading the same
+# (uncompressed) file share its pages. joblib falls back to a normal load for
+# compressed files.
+MODEL_MMAP_MODE = "r"
+
+def get_shap_explainers(ai_model):
+    """One TreeExplainer per strategist output, built on first use and kept on the model object."""
+    explainers = getattr(ai_model, 'shap_explainers_', None)
+    if explainers is None:
+        explainers = [shap.TreeExplainer(estimator) for estimator in ai_model.estimators_]
+        ai_model.shap_explainers_ = explainers
+    return explainers
+
+_LOADED_MODELS = {}
+_MODEL_LOCK = threading.Lock()
+
+def _modified_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def get_strategist_model(model_file=MODEL_FILE, mmap_mode=MODEL_MMAP_MODE):
+    """
+    The AI strategist, loaded from model_file on first call and cached per file.
+    Returns None if the file does not exist. Loading it in a parent process before
+    forking workers lets them share the model's pages instead of copying them.
+    When the file is replaced (e.g. by incremental_training.py) the next call
+    loads the new model; runs already started keep the one they were given.
+    """
+    with _MODEL_LOCK:
+        modified = _modified_ns(model_file)
+        cached = _LOADED_MODELS.get(model_file)
+        if cached is None or cached[0] != modified:
+            model = joblib.load(model_file, mmap_mode=mmap_mode) if modified is not None else None
+            if cached is not None:
+                LOGGER.info("Reloaded strategist model from %s.", model_file)
+            _LOADED_MODELS[model_file] = (modified, model)
+        return _LOADED_MODELS[model_file][1]
+
+_COMPILED_STRATEGISTS = {}
 
-try:
-    AI_STRATEGIST_MODEL = joblib.load("strategy_model.joblib")
-except FileNotFoundError:
-    AI_STRATEGIST_MODEL = None
+def get_strategist(model_file=MODEL_FILE, grid_file=STRATEGY_GRID_FILE):
+    """
+    What the engine should predict with: the compiled grid if it exists and matches
+    model_file, otherwise the forest (None if neither exists). The grid loads the
+    forest itself only if SHAP explanations are asked for. Like
+    get_strategist_model, picks up replaced files on the next call.
+    """
+    with _MODEL_LOCK:
+        versions = (_modified_ns(grid_file), _modified_ns(model_file))
+        cached = _COMPILED_STRATEGISTS.get(grid_file)
+        if cached is None or cached[0] != versions:
+            compiled = None
+            if versions[0] is not None:
+                from strategy_grid import CompiledStrategist
+                compiled = CompiledStrategist.load(grid_file)
+                if versions[1] is not None and not compiled.is_current(model_file):
+                    LOGGER.warning("Ignoring %s: compiled from a different %s. Re-run strategy_grid.py.", grid_file, model_file)
+                    compiled = None
+            _COMPILED_STRATEGISTS[grid_file] = (versions, compiled)
+        compiled = _COMPILED_STRATEGISTS[grid_file][1]
+    return compiled if compiled is not None else get_strategist_model(model_file)
+
+def predict_strategy(ai_model, conditions, feature_names):
+    """The strategist's five outputs for one day's conditions, as a list of floats."""
+    predict_conditions = getattr(ai_model, 'predict_conditions', None)
+    if predict_conditions is not None:
+        return predict_conditions(conditions)
+    # .tolist() keeps the log entry free of NumPy scalars so it serializes natively.
+    return ai_model.predict(pd.DataFrame([conditions])[feature_names])[0].tolist()
+
+def predict_strategies(ai_model, conditions_rows, feature_names):
+    """predict_strategy for many conditions dicts in one predict call; row i equals predict_strategy(conditions_rows[i])."""
+    return ai_model.predict(pd.DataFrame(conditions_rows)[feature_names]).tolist()
+
+def warm_up(model_file=MODEL_FILE, explain=True):
+    """
+    Imports the engine's dependencies and loads the strategist (and its SHAP
+    explainers) ahead of the first request. Servers call this at startup.
+    Returns the seconds spent per step.
+    """
+    timings = {}
+    start = time.perf_counter()
+    for module in (np, pd, joblib, cp_model):
+        import_now(module)
+    timings['imports'] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    ai_model = get_strategist(model_file)
+    timings['model'] = round(time.perf_counter() - start, 3)
+    if explain and ai_model is not None:
+        start = time.perf_counter()
+        get_shap_explainers(ai_model)
+        timings['shap'] = round(time.perf_counter() - start, 3)
+    print(f"Engine warmed up: {timings}")
+    return timings
+
+def __getattr__(name):
+    # Kept for callers that still import AI_STRATEGIST_MODEL; loads the model on first access.
+    if name == "AI_STRATEGIST_MODEL":
+        return get_strategist_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 SCENARIO_MODIFIERS = {
     "NORMAL": {"MIN_SERVICE": 6, "MAX_SERVICE": 6, "MAINTENANCE_SLOTS": 2},
@@ -28,8 +138,20 @@ SCENARIO_MODIFIERS = {
     "FESTIVAL_SURGE": {"MIN_SERVICE": 7, "MAX_SERVICE": 8, "MAINTENANCE_SLOTS": 1}
 }
 
+# CP-SAT settings used for every daily solve. Callers can override any key by
+# passing a partial solver_config dict. max_time_in_seconds=None means no limit.
+# The default is a single-worker search with a deterministic time limit, so the
+# same inputs always give the same month; parallel search (num_workers > 1) is
+# opt-in and is only reproducible with deterministic=True.
+DEFAULT_SOLVER_CONFIG = {
+    "num_workers": 1,
+    "max_time_in_seconds": 10.0,
+    "relative_gap_limit": 0.0,
+    "deterministic": True
+}
+
 # --- 2. HELPER FUNCTIONS ---
-def initialize_fleet_status(base_file="fleet_data.csv", output_file="fleet_status.csv"):
+def build_initial_fleet(base_file="fleet_data.csv"):
     df = pd.read_csv(base_file)
     df['bogie_last_service_km'] = df['current_km']
     df['current_hours'] = 0.0
@@ -37,34 +159,232 @@ def initialize_fleet_status(base_file="fleet_data.csv", output_file="fleet_statu
     df['total_service_days_month'] = 0
     df['total_maintenance_days_month'] = 0
     df['target_hours'] = df['target_hours'].fillna(0)
+    return df
+
+def initialize_fleet_status(base_file="fleet_data.csv", output_file="fleet_status.csv"):
+    df = build_initial_fleet(base_file)
     df.to_csv(output_file, index=False)
     print(f"Fleet status for new month initialized in '{output_file}'")
 
+# Kernels shared by the DataFrame functions below and FleetState. Each works on
+# whole columns, so a day costs the same however many overrides or maintenance
+# trains there are; the arithmetic runs in the same order as the original
+# row-masked pandas code, so the results are bit-identical.
+PRIORITY_PENALTIES = {'LOW': 10, 'MEDIUM': 20, 'CRITICAL': 50}
+# The integer columns advance_counters() moves forward each day.
+COUNTER_COLUMNS = ['current_km', 'bogie_last_service_km', 'current_hours', 'consecutive_service_days',
+                   'total_service_days_month', 'total_maintenance_days_month']
+
+def health_score_kernel(km_since, consecutive_days, is_cert_expired, days_expired, priority_penalty, override_penalty=None):
+    """
+    Health scores from per-rake arrays, elementwise, so the arrays may also be
+    2-D (replica x rake). days_expired only needs to be valid where
+    is_cert_expired; consecutive_days and override_penalty may be None.
+    """
+    health = np.full(np.shape(km_since), 100.0)
+    health -= (km_since / 50).astype(float)
+    if consecutive_days is not None:
+        health -= consecutive_days * 10
+    health[is_cert_expired] -= days_expired[is_cert_expired] * PENALTY_PER_EXPIRED_DAY
+    health -= priority_penalty
+    if override_penalty is not None:
+        health -= override_penalty
+    return np.where(health < 0, 0.0, health)
+
+def override_arrays(train_ids, manual_inputs):
+    """(health penalty or None, force-maintenance mask) per rake, via one dict lookup per rake."""
+    if not manual_inputs:
+        return None, np.zeros(len(train_ids), dtype=bool)
+    ids = pd.Series(train_ids, dtype=object)
+    penalties = {tid: o['health_penalty'] for tid, o in manual_inputs.items() if 'health_penalty' in o}
+    forced = [tid for tid, o in manual_inputs.items() if 'force_maintenance' in o]
+    override_penalty = ids.map(penalties).fillna(0).to_numpy(dtype=float) if penalties else None
+    return override_penalty, ids.isin(forced).to_numpy()
+
+def advance_counters(numeric, in_service, in_maintenance, branding_sla_active):
+    """Service, mileage and maintenance counters for one day; updates the arrays in `numeric` in place."""
+    consecutive_days = numeric['consecutive_service_days']
+    numeric['consecutive_service_days'] = np.where(in_service, consecutive_days + 1, 0).astype(consecutive_days.dtype)
+    numeric['current_km'][in_service] += DAILY_KM_PER_TRAIN
+    numeric['current_hours'][in_service & branding_sla_active] += DAILY_HOURS_PER_TRAIN
+    numeric['bogie_last_service_km'][in_maintenance] = numeric['current_km'][in_maintenance]
+    numeric['total_service_days_month'][in_service] += 1
+    numeric['total_maintenance_days_month'][in_maintenance] += 1
+    return numeric
+
 def preprocess_and_health_score(df, current_day, manual_inputs):
     df['cert_telecom_expiry'] = pd.to_datetime(df['cert_telecom_expiry'])
     today = SIMULATION_START_DATE + timedelta(days=current_day - 1)
-    df['is_cert_expired'] = df['cert_telecom_expiry'] < today
-    df['health_score'] = 100.0
-    df['km_since_last_service'] = df['current_km'] - df['bogie_last_service_km']
-    df['health_score'] -= (df['km_since_last_service'] / 50).astype(float)
-    if 'consecutive_service_days' in df.columns:
-        df['health_score'] -= df['consecutive_service_days']*10
-    expired_trains = df[df['is_cert_expired']].index
-    if not expired_trains.empty:
-        days_expired = (today - df.loc[expired_trains, 'cert_telecom_expiry']).dt.days
-        expired_penalty = days_expired * PENALTY_PER_EXPIRED_DAY
-        df.loc[expired_trains, 'health_score'] -= expired_penalty
-    priority_penalties = {'LOW': 10, 'MEDIUM': 20, 'CRITICAL': 50}
-    for p, penalty in priority_penalties.items():
-        df.loc[(df['job_card_status'] == 'OPEN') & (df['job_card_priority'] == p), 'health_score'] -= penalty
-    df['manual_force_maintenance'] = False
-    for train_id, override in manual_inputs.items():
-        if 'health_penalty' in override: df.loc[df['train_id'] == train_id, 'health_score'] -= override['health_penalty']
-        if 'force_maintenance' in override: df.loc[df['train_id'] == train_id, 'manual_force_maintenance'] = True
-    df['health_score'] = df['health_score'].clip(lower=0)
+    expiry = df['cert_telecom_expiry']
+    is_cert_expired = (expiry < today).to_numpy()
+    df['is_cert_expired'] = is_cert_expired
+    days_expired = np.zeros(len(df), dtype=np.int64)
+    if is_cert_expired.any():
+        days_expired[is_cert_expired] = (today - expiry[is_cert_expired]).dt.days.to_numpy()
+    km_since = df['current_km'] - df['bogie_last_service_km']
+    consecutive_days = df['consecutive_service_days'].to_numpy() if 'consecutive_service_days' in df.columns else None
+    job_open = (df['job_card_status'] == 'OPEN').to_numpy()
+    priority = df['job_card_priority'].to_numpy()
+    priority_penalty = np.zeros(len(df))
+    for p, penalty in PRIORITY_PENALTIES.items():
+        priority_penalty[job_open & (priority == p)] = penalty
+    override_penalty, force_maintenance = override_arrays(df['train_id'].to_numpy(), manual_inputs)
+    df['health_score'] = health_score_kernel(km_since.to_numpy(), consecutive_days, is_cert_expired,
+                                             days_expired, priority_penalty, override_penalty)
+    df['km_since_last_service'] = km_since
+    df['manual_force_maintenance'] = force_maintenance
     return df
 
-def solve_daily_optimization(fleet_df, current_day, scenario, dynamic_strategy={}):
+def compute_daily_cost_columns(fleet_df, current_day, scenario, dynamic_strategy={}):
+    """
+    Computes every per-rake objective coefficient and constraint flag for one day
+    as NumPy arrays, mirroring the arithmetic of the row-wise builder exactly.
+    fleet_df may be a DataFrame or a FleetState.
+    """
+    modifiers = SCENARIO_MODIFIERS[scenario]
+    FATIGUE_PENALTY_FACTOR = dynamic_strategy.get('fatigue_factor', 500)
+    PER_KM_DEVIATION_COST = dynamic_strategy.get('cost_per_km', 5)
+    BRANDING_SLA_PENALTY = dynamic_strategy.get('branding_penalty', 50000)
+    TARGET_MONTHLY_KM = dynamic_strategy.get('target_mileage', 6000)
+    HEALTH_SCORE_MAINTENANCE_THRESHOLD = dynamic_strategy.get('maint_threshold', 50)
+    n = len(fleet_df)
+
+    if 'consecutive_service_days' in fleet_df.columns:
+        consecutive_days = np.asarray(fleet_df['consecutive_service_days'])
+    else:
+        consecutive_days = np.zeros(n, dtype=np.int64)
+    fatigue_cost = np.trunc((consecutive_days ** 3) * FATIGUE_PENALTY_FACTOR).astype(np.int64)
+    ideal_km = (TARGET_MONTHLY_KM / SIMULATION_MONTH_DAYS) * current_day
+    urgency_multiplier = current_day / SIMULATION_MONTH_DAYS
+    current_km = np.asarray(fleet_df['current_km'])
+    mileage_cost = np.trunc(np.abs(current_km - ideal_km) * PER_KM_DEVIATION_COST * urgency_multiplier).astype(np.int64)
+    service_cost = fatigue_cost + mileage_cost
+    if scenario == "HEAVY_MONSOON":
+        old_brakes = np.asarray(fleet_df['brake_model']) == 'HydroMech_v1'
+        bogie_wear = np.asarray(fleet_df['km_since_last_service']) > BOGIE_SERVICE_INTERVAL_KM
+        service_cost += np.where(old_brakes, modifiers['WEATHER_PENALTY_OLD_BRAKES'], 0)
+        service_cost += np.where(bogie_wear, modifiers['WEATHER_PENALTY_BOGIE_WEAR'], 0)
+
+    maintenance_cost = np.trunc(np.asarray(fleet_df['health_score'], dtype=float)).astype(np.int64)
+
+    hours_needed = np.asarray(fleet_df['target_hours'], dtype=float) - np.asarray(fleet_df['current_hours'], dtype=float)
+    run_rate = hours_needed / (SIMULATION_MONTH_DAYS - current_day + 1)
+    urgency = run_rate / DAILY_HOURS_PER_TRAIN
+    branding_active = np.asarray(fleet_df['branding_sla_active'], dtype=bool) & (hours_needed > 0)
+    branding_penalty = np.where(branding_active, np.trunc(BRANDING_SLA_PENALTY * urgency), 0).astype(np.int64)
+
+    health = np.asarray(fleet_df['health_score'], dtype=float)
+    return {
+        'service_cost': service_cost,
+        'maintenance_cost': maintenance_cost,
+        'branding_penalty': branding_penalty,
+        'forbid_service': np.asarray(fleet_df['is_cert_expired'], dtype=bool) | (np.asarray(fleet_df['job_card_priority']) == 'CRITICAL'),
+        'force_maintenance': (health < HEALTH_SCORE_MAINTENANCE_THRESHOLD) | np.asarray(fleet_df['manual_force_maintenance'], dtype=bool),
+    }
+
+def build_daily_model(fleet_df, current_day, scenario, dynamic_strategy={}):
+    """
+    Columnar CP-SAT model builder. Costs come from compute_daily_cost_columns and
+    the decision variables are created as pandas Series indexed by train_id.
+    Returns (model, is_in_service, is_in_maintenance).
+    """
+    model = cp_model.CpModel()
+    modifiers = SCENARIO_MODIFIERS[scenario]
+    costs = compute_daily_cost_columns(fleet_df, current_day, scenario, dynamic_strategy)
+    train_index = pd.Index(fleet_df['train_id'])
+    is_in_service = model.NewBoolVarSeries("s", train_index)
+    is_in_maintenance = model.NewBoolVarSeries("m", train_index)
+    is_on_standby = model.NewBoolVarSeries("b", train_index)
+    for s, m, b in zip(is_in_service, is_in_maintenance, is_on_standby):
+        model.AddExactlyOne(s, m, b)
+    for s in is_in_service[costs['forbid_service']]: model.Add(s == 0)
+    for m in is_in_maintenance[costs['force_maintenance']]: model.Add(m == 1)
+
+    num_in_service = cp_model.LinearExpr.Sum(list(is_in_service))
+    model.Add(num_in_service <= modifiers['MAX_SERVICE'])
+    shortfall = model.NewIntVar(0, modifiers['MIN_SERVICE'], 'shortfall')
+    model.Add(shortfall >= modifiers['MIN_SERVICE'] - num_in_service)
+    maint_dev = model.NewIntVar(-len(fleet_df), len(fleet_df), 'maint_dev')
+    model.Add(maint_dev == cp_model.LinearExpr.Sum(list(is_in_maintenance)) - modifiers['MAINTENANCE_SLOTS'])
+    abs_maint_dev = model.NewIntVar(0, len(fleet_df), 'abs_maint_dev')
+    model.AddAbsEquality(abs_maint_dev, maint_dev)
+
+    # penalty * (1 - s) is folded into a constant plus a negative service coefficient.
+    service_coeffs = (costs['service_cost'] - costs['branding_penalty']).tolist()
+    maintenance_coeffs = costs['maintenance_cost'].tolist()
+    model.Minimize(
+        shortfall * 5000000 + abs_maint_dev * 1000000
+        + cp_model.LinearExpr.WeightedSum(list(is_in_service), service_coeffs)
+        + cp_model.LinearExpr.WeightedSum(list(is_in_maintenance), maintenance_coeffs)
+        + int(costs['branding_penalty'].sum())
+    )
+    return model, is_in_service, is_in_maintenance
+
+def make_solver(solver_config=None):
+    """
+    Builds a CpSolver from DEFAULT_SOLVER_CONFIG merged with solver_config.
+    In deterministic mode the time limit is applied as deterministic time and
+    several workers interleave their search, so the same model always yields the
+    same plan.
+    """
+    config = {**DEFAULT_SOLVER_CONFIG, **(solver_config or {})}
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = int(config['num_workers'])
+    solver.parameters.relative_gap_limit = float(config['relative_gap_limit'])
+    if config['deterministic'] and int(config['num_workers']) != 1:
+        solver.parameters.interleave_search = True
+    if config['max_time_in_seconds'] is not None:
+        if config['deterministic']:
+            solver.parameters.max_deterministic_time = float(config['max_time_in_seconds'])
+        else:
+            solver.parameters.max_time_in_seconds = float(config['max_time_in_seconds'])
+    return solver
+
+def add_plan_hint(model, is_in_service, is_in_maintenance, hint_plan):
+    """Seeds the model with a previous plan (usually yesterday's) as a solution hint."""
+    service_hint = is_in_service.index.isin(hint_plan.get('SERVICE', []))
+    maintenance_hint = is_in_maintenance.index.isin(hint_plan.get('MAINTENANCE', []))
+    for var, value in zip(is_in_service, service_hint): model.AddHint(var, bool(value))
+    for var, value in zip(is_in_maintenance, maintenance_hint): model.AddHint(var, bool(value))
+
+# Callables given each solve_info as solve_daily_optimization finishes, including
+# failed solves (e.g. the backend's metrics). See add_solve_observer.
+SOLVE_OBSERVERS = []
+
+def add_solve_observer(observer):
+    SOLVE_OBSERVERS.append(observer)
+
+def solve_daily_optimization(fleet_df, current_day, scenario, dynamic_strategy={}, hint_plan=None, solver_config=None):
+    """
+    Returns (plan, cost, solve_info). solve_info holds the solver status name, the
+    wall time of the solve itself and the time spent building the model; plan and
+    cost are None if no solution was found.
+    """
+    build_start = time.perf_counter()
+    model, is_in_service, is_in_maintenance = build_daily_model(fleet_df, current_day, scenario, dynamic_strategy)
+    if hint_plan:
+        add_plan_hint(model, is_in_service, is_in_maintenance, hint_plan)
+    build_time_s = time.perf_counter() - build_start
+    solver = make_solver(solver_config)
+    status = solver.Solve(model)
+    solve_info = {'solver_status': solver.StatusName(status), 'solve_time_s': solver.WallTime(), 'build_time_s': build_time_s}
+    for observer in SOLVE_OBSERVERS:
+        observer(solve_info)
+    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        in_service = solver.BooleanValues(is_in_service).to_numpy()
+        in_maintenance = solver.BooleanValues(is_in_maintenance).to_numpy() & ~in_service
+        train_ids = is_in_service.index
+        plan = {
+            'SERVICE': train_ids[in_service].tolist(),
+            'MAINTENANCE': train_ids[in_maintenance].tolist(),
+            'STANDBY': train_ids[~(in_service | in_maintenance)].tolist()
+        }
+        return plan, int(solver.ObjectiveValue()), solve_info
+    return None, None, solve_info
+
+# Row-at-a-time reference builder. Kept so the columnar builder above can be
+# checked against it (see benchmark_model_builder.py).
+def solve_daily_optimization_rowwise(fleet_df, current_day, scenario, dynamic_strategy={}):
     model = cp_model.CpModel()
     modifiers = SCENARIO_MODIFIERS[scenario]
     FATIGUE_PENALTY_FACTOR = dynamic_strategy.get('fatigue_factor', 500)
@@ -126,289 +446,330 @@ def solve_daily_optimization(fleet_df, current_day, scenario, dynamic_strategy={
     return None, None
 
 def apply_daily_updates(df, plan, current_day):
-    service_trains, maintenance_trains = plan['SERVICE'], plan['MAINTENANCE']
     today = SIMULATION_START_DATE + timedelta(days=current_day - 1)
     if 'consecutive_service_days' not in df.columns: df['consecutive_service_days'] = 0
-    df.loc[df['train_id'].isin(service_trains), 'consecutive_service_days'] += 1
-    df.loc[~df['train_id'].isin(service_trains), 'consecutive_service_days'] = 0
-    df.loc[df['train_id'].isin(service_trains), 'current_km'] += DAILY_KM_PER_TRAIN
-    branded_service = df[(df['train_id'].isin(service_trains)) & (df['branding_sla_active'])]
-    df.loc[df.index.isin(branded_service.index), 'current_hours'] += DAILY_HOURS_PER_TRAIN
-    for train_id in maintenance_trains:
-        train_index = df[df['train_id'] == train_id].index
-        current_expiry = pd.to_datetime(df.loc[train_index, 'cert_telecom_expiry'].iloc[0])
-        if current_expiry < today:
-            new_expiry_date = today + timedelta(days=CERTIFICATE_VALIDITY_DAYS)
-            df.loc[train_index, 'cert_telecom_expiry'] = new_expiry_date
-    df.loc[df['train_id'].isin(maintenance_trains), 'health_score'] = 100
-    df.loc[df['train_id'].isin(maintenance_trains), 'bogie_last_service_km'] = df.loc[df['train_id'].isin(maintenance_trains), 'current_km']
-    maintained_indices = df[df['train_id'].isin(maintenance_trains)].index
-    df.loc[maintained_indices, 'job_card_status'] = 'CLOSED'
-    df.loc[maintained_indices, 'job_card_priority'] = 'NONE'
+    in_service = df['train_id'].isin(plan['SERVICE']).to_numpy()
+    in_maintenance = df['train_id'].isin(plan['MAINTENANCE']).to_numpy()
+    expiry = pd.to_datetime(df['cert_telecom_expiry'])
+    renew = in_maintenance & (expiry < today).to_numpy()
+    if renew.any():
+        df['cert_telecom_expiry'] = expiry.mask(renew, today + timedelta(days=CERTIFICATE_VALIDITY_DAYS))
+    df.loc[in_maintenance, 'health_score'] = 100
+    df.loc[in_maintenance, 'job_card_status'] = 'CLOSED'
+    df.loc[in_maintenance, 'job_card_priority'] = 'NONE'
     if 'total_service_days_month' not in df.columns: df['total_service_days_month'] = 0
     if 'total_maintenance_days_month' not in df.columns: df['total_maintenance_days_month'] = 0
-    df.loc[df['train_id'].isin(service_trains), 'total_service_days_month'] += 1
-    df.loc[df['train_id'].isin(maintenance_trains), 'total_maintenance_days_month'] += 1
+    numeric = {col: df[col].to_numpy(copy=True) for col in COUNTER_COLUMNS}
+    advance_counters(numeric, in_service, in_maintenance, np.asarray(df['branding_sla_active'], dtype=bool))
+    for col, values in numeric.items():
+        df[col] = values
     return df
 
-# --- 3. THE UNIFIED SIMULATION ENGINE FUNCTION WITH READABLE SHAP ---
-def run_simulation(start_day, initial_fleet_state, ai_model, feature_names, targets, manual_overrides={}):
-    if ai_model is None:
-        raise Exception("AI Strategist model is not loaded.")
-        
-    monthly_log = []
-    fleet_df = initial_fleet_state.copy()
+# --- 2b. COMPACT FLEET STATE ---
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+NUMERIC_COLUMNS = ['current_km', 'bogie_last_service_km', 'current_hours', 'target_hours',
+                   'consecutive_service_days', 'total_service_days_month', 'total_maintenance_days_month']
+CODED_COLUMNS = ['job_card_status', 'job_card_priority', 'brake_model']
+DERIVED_COLUMNS = ['is_cert_expired', 'health_score', 'km_since_last_service', 'manual_force_maintenance']
 
-    MONTHLY_SCENARIOS = ['NORMAL'] * SIMULATION_MONTH_DAYS
-    MONTHLY_SCENARIOS[6] = MONTHLY_SCENARIOS[7] = 'FESTIVAL_SURGE'
-    MONTHLY_SCENARIOS[12] = MONTHLY_SCENARIOS[13] = 'HEAVY_MONSOON'
-    MONTHLY_SCENARIOS[21] = 'FESTIVAL_SURGE'
-    
-    MANUAL_INPUTS_CALENDAR = {
-        5: {"Rake-12": {"health_penalty": 40, "reason": "Visual inspection"}},
-        15: {"Rake-19": {"force_maintenance": True, "reason": "Driver report"}}
-    }
-    for day, override in manual_overrides.items():
-        MANUAL_INPUTS_CALENDAR[int(day)] = override
+def category_code(categories, value):
+    if value not in categories:
+        categories.append(value)
+    return categories.index(value)
 
-    def shap_to_readable(features, shap_values, threshold=0.01):
-        # Map technical feature names to business-friendly labels
-        FEATURE_LABELS = {
-            "total_fleet_size": "Fleet Size",
-            "target_service_trains": "Trains in Service",
-            "avg_fleet_health": "Average Fleet Health",
-            "is_monsoon": "Monsoon Season",
-            "is_surge": "Surge Demand"
-        }
-        
-        explanations = []
-        for feature, val in zip(features, shap_values):
-            label = FEATURE_LABELS.get(feature, feature.replace('_', ' ').title())
-            
-            if abs(val) < threshold:
-                explanations.append(f"📊 {label} has minimal impact on operational costs")
+def _today_ordinal(current_day):
+    return (SIMULATION_START_DATE + timedelta(days=current_day - 1)).toordinal()
+
+class FleetState:
+    """
+    Fixed-dtype, array-backed fleet for the engine's hot loop. Dates are integer
+    day ordinals, string categories are small-int codes into a per-column
+    category list, and train IDs are interned to row indices. preprocess() and
+    apply_updates() run the same kernels as preprocess_and_health_score and
+    apply_daily_updates; to_records() rebuilds the same log records as DataFrame.to_dict.
+    """
+    def __init__(self, df):
+        self.column_order = list(df.columns)
+        self.train_ids = np.asarray(df['train_id'], dtype=object)
+        self.index_of = {tid: i for i, tid in enumerate(self.train_ids)}
+        expiry = pd.to_datetime(df['cert_telecom_expiry']).to_numpy().astype('datetime64[D]')
+        self.cert_expiry = expiry.astype(np.int64) + EPOCH_ORDINAL
+        self.branding_sla_active = np.asarray(df['branding_sla_active'], dtype=bool)
+        self.numeric = {}
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                self.numeric[col] = np.asarray(df[col]).copy()
             else:
-                # Determine impact intensity
-                if abs(val) < 0.05:
-                    intensity = "slightly"
-                    icon = "📈" if val > 0 else "📉"
-                elif abs(val) < 0.15:
-                    intensity = "moderately"
-                    icon = "📊" if val > 0 else "📋"
-                else:
-                    intensity = "strongly"
-                    icon = "🚨" if val > 0 else "✅"
-                
-                # Create context-aware business explanations
-                if feature == "total_fleet_size":
-                    if val > 0:
-                        msg = f"{icon} Having more trains {intensity} increases cost per kilometer ({abs(val):.2f})"
-                    else:
-                        msg = f"{icon} Optimized fleet size {intensity} reduces operational costs ({abs(val):.2f})"
-                        
-                elif feature == "target_service_trains":
-                    if val > 0:
-                        msg = f"{icon} Deploying more trains {intensity} improves service capacity but increases costs ({abs(val):.2f})"
-                    else:
-                        msg = f"{icon} Optimized train deployment {intensity} reduces operational overhead ({abs(val):.2f})"
-                        
-                elif feature == "avg_fleet_health":
-                    if val > 0:
-                        msg = f"{icon} Better fleet health {intensity} increases maintenance costs ({abs(val):.2f})"
-                    else:
-                        msg = f"{icon} Preventive maintenance {intensity} reduces emergency repair costs ({abs(val):.2f})"
-                        
-                elif feature == "is_monsoon":
-                    if val > 0:
-                        msg = f"{icon} Monsoon conditions {intensity} increase operational challenges and costs ({abs(val):.2f})"
-                    else:
-                        msg = f"{icon} Weather-optimized operations {intensity} reduce monsoon-related expenses ({abs(val):.2f})"
-                        
-                elif feature == "is_surge":
-                    if val > 0:
-                        msg = f"{icon} High demand periods {intensity} increase operational costs due to surge capacity ({abs(val):.2f})"
-                    else:
-                        msg = f"{icon} Efficient surge management {intensity} optimizes resource utilization ({abs(val):.2f})"
-                        
-                else:
-                    # Fallback for any other features
-                    direction = "increases" if val > 0 else "reduces"
-                    msg = f"{icon} {label} {intensity} {direction} operational impact ({abs(val):.2f})"
-                
-                explanations.append(msg)
-        
-        return explanations
+                self.numeric[col] = np.zeros(len(df), dtype=np.int64)
+                self.column_order.append(col)
+        self.categories = {}
+        self.codes = {}
+        for col in CODED_COLUMNS:
+            categories, codes = np.unique(np.asarray(df[col], dtype=object), return_inverse=True)
+            self.categories[col] = list(categories)
+            self.codes[col] = codes.astype(np.int16)
+        self.derived = {col: np.asarray(df[col]).copy() for col in DERIVED_COLUMNS if col in df.columns}
+        handled = {'train_id', 'cert_telecom_expiry', 'branding_sla_active', *NUMERIC_COLUMNS, *CODED_COLUMNS, *DERIVED_COLUMNS}
+        self.passthrough = {col: np.asarray(df[col]) for col in df.columns if col not in handled}
 
-    for day in range(start_day, SIMULATION_MONTH_DAYS + 1):
-        scenario = MONTHLY_SCENARIOS[day - 1]
-        manual_inputs_today = MANUAL_INPUTS_CALENDAR.get(day, {})
-        
-        fleet_df_processed = preprocess_and_health_score(fleet_df, day, manual_inputs_today)
+    def __len__(self):
+        return len(self.train_ids)
 
-        current_conditions = {
-            'total_fleet_size': len(fleet_df_processed), 
-            'target_service_trains': SCENARIO_MODIFIERS[scenario]['MIN_SERVICE'], 
-            'avg_fleet_health': fleet_df_processed['health_score'].mean(), 
-            'is_monsoon': 1 if scenario == 'HEAVY_MONSOON' else 0, 
-            'is_surge': 1 if scenario == 'FESTIVAL_SURGE' else 0
-        }
-        conditions_df = pd.DataFrame([current_conditions])[feature_names]
-        
-        predicted_strategy = ai_model.predict(conditions_df)[0]
-        dynamic_strategy = {
-            'cost_per_km': predicted_strategy[0], 'fatigue_factor': predicted_strategy[1], 
-            'branding_penalty': predicted_strategy[2], 'target_mileage': predicted_strategy[3], 
-            'maint_threshold': predicted_strategy[4]
-        }
-        
-        shap_explanations = []
-        for i, estimator in enumerate(ai_model.estimators_):
-            explainer = shap.TreeExplainer(estimator)
-            shap_values_raw = explainer.shap_values(conditions_df)
-            sv = np.array(shap_values_raw)
-            if sv.ndim >= 2 and sv.shape[0] == 1:
-                sv = np.squeeze(sv, axis=0)
-
-            # Base SHAP explanation dictionary
-            explanation = {
-                "output_name": targets[i],
-                "base_value": float(explainer.expected_value) if np.isscalar(explainer.expected_value) else explainer.expected_value.tolist(),
-                "shap_values": sv.tolist(),
-                "feature_names": feature_names,
-                "feature_values": [current_conditions[f] for f in feature_names],
-                "readable": [str(x).encode('utf-8', 'replace').decode('utf-8') for x in shap_to_readable(feature_names, sv)]
-            }
-            shap_explanations.append(explanation)
+    @property
+    def columns(self):
+        return self.column_order
 
-        
-        daily_plan, daily_cost = solve_daily_optimization(fleet_df_processed, day, scenario, dynamic_strategy)
-        
-        if daily_plan:
-            fleet_status_before = fleet_df_processed.copy()
-            fleet_status_before['cert_telecom_expiry'] = fleet_status_before['cert_telecom_expiry'].dt.strftime('%Y-%m-%d')
+    def code_of(self, col, value):
+        """Small-int code of `value` in a coded column, adding it as a new category if unseen."""
+        return category_code(self.categories[col], value)
 
-            updated_df = apply_daily_updates(fleet_df_processed.copy(), daily_plan, day)
-            fleet_status_after = updated_df.copy()
-            fleet_status_after['cert_telecom_expiry'] = fleet_status_after['cert_telecom_expiry'].dt.strftime('%Y-%m-%d')
-            
-            daily_log_entry = {
-                "day": day,
-                "scenario": scenario,
-                "plan": daily_plan,
-                "cost": daily_cost,
-                "ai_strategy": dynamic_strategy,
-                "fleet_status_before": fleet_status_before.to_dict(orient='records'),
-                "fleet_status_after": fleet_status_after.to_dict(orient='records'),
-                "shap_explanations": shap_explanations,
-                "feature_names": feature_names,
-                "feature_values": conditions_df.iloc[0].tolist()
-            }
-            monthly_log.append(daily_log_entry)
-            
-            fleet_df = updated_df
-        else:
-            print(f"CRITICAL FAILURE on Day {day}. Halting simulation.")
-            break
-            
-    return monthly_log
+    def mask_of(self, train_ids):
+        mask = np.zeros(len(self), dtype=bool)
+        mask[[self.index_of[t] for t in train_ids if t in self.index_of]] = True
+        return mask
 
+    def __getitem__(self, col):
+        if col == 'train_id':
+            return self.train_ids
+        if col == 'cert_telecom_expiry':
+            return (self.cert_expiry - EPOCH_ORDINAL).astype('datetime64[D]')
+        if col == 'branding_sla_active':
+            return self.branding_sla_active
+        if col in self.numeric:
+            return self.numeric[col]
+        if col in self.codes:
+            return np.asarray(self.categories[col], dtype=object)[self.codes[col]]
+        if col in self.derived:
+            return self.derived[col]
+        return self.passthrough[col]
 
+    def _set_derived(self, col, values):
+        if col not in self.column_order:
+            self.column_order.append(col)
+        self.derived[col] = values
 
-# --- 3. THE UNIFIED SIMULATION ENGINE FUNCTION ---
-#def run_simulation(start_day, initial_fleet_state, ai_model, feature_names, targets, manual_overrides={}):
-    if ai_model is None:
-        raise Exception("AI Strategist model is not loaded.")
+    def preprocess(self, current_day, manual_inputs):
+        """Array version of preprocess_and_health_score, updating this state in place."""
+        today = _today_ordinal(current_day)
+        is_cert_expired = self.cert_expiry < today
+        km_since = self.numeric['current_km'] - self.numeric['bogie_last_service_km']
+        job_open = self.codes['job_card_status'] == self.code_of('job_card_status', 'OPEN')
+        priority_penalty = np.zeros(len(self))
+        for p, penalty in PRIORITY_PENALTIES.items():
+            priority_penalty[job_open & (self.codes['job_card_priority'] == self.code_of('job_card_priority', p))] = penalty
+        override_penalty, force_maintenance = override_arrays(self.train_ids, manual_inputs)
+        self._set_derived('is_cert_expired', is_cert_expired)
+        self._set_derived('health_score', health_score_kernel(km_since, self.numeric['consecutive_service_days'], is_cert_expired,
+                                                              today - self.cert_expiry, priority_penalty, override_penalty))
+        self._set_derived('km_since_last_service', km_since)
+        self._set_derived('manual_force_maintenance', force_maintenance)
+        return self
+
+    def apply_updates(self, plan, current_day):
+        """Array version of apply_daily_updates, updating this state in place."""
+        today = _today_ordinal(current_day)
+        in_service = self.mask_of(plan['SERVICE'])
+        in_maintenance = self.mask_of(plan['MAINTENANCE'])
+        renew = in_maintenance & (self.cert_expiry < today)
+        self.cert_expiry = np.where(renew, today + CERTIFICATE_VALIDITY_DAYS, self.cert_expiry)
+        self.derived['health_score'][in_maintenance] = 100
+        self.codes['job_card_status'][in_maintenance] = self.code_of('job_card_status', 'CLOSED')
+        self.codes['job_card_priority'][in_maintenance] = self.code_of('job_card_priority', 'NONE')
+        advance_counters(self.numeric, in_service, in_maintenance, self.branding_sla_active)
+        return self
+
+    def to_records(self):
+        """Log records with dates as YYYY-MM-DD strings, equal to DataFrame.to_dict(orient='records')."""
+        columns = {col: self[col] for col in self.column_order}
+        columns['cert_telecom_expiry'] = columns['cert_telecom_expiry'].astype(str)
+        values = [columns[col].tolist() for col in self.column_order]
+        return [dict(zip(self.column_order, row)) for row in zip(*values)]
+
+    def to_dataframe(self):
+        df = pd.DataFrame({col: self[col] for col in self.column_order})
+        df['cert_telecom_expiry'] = pd.to_datetime(df['cert_telecom_expiry'])
+        return df
+
+def shap_to_readable(features, shap_values, threshold=0.01):
+    # Map technical feature names to business-friendly labels
+    FEATURE_LABELS = {
+        "total_fleet_size": "Fleet Size",
+        "target_service_trains": "Trains in Service",
+        "avg_fleet_health": "Average Fleet Health",
+        "is_monsoon": "Monsoon Season",
+        "is_surge": "Surge Demand"
+    }
+    
+    explanations = []
+    for feature, val in zip(features, shap_values):
+        label = FEATURE_LABELS.get(feature, feature.replace('_', ' ').title())
         
-    monthly_log = []
-    fleet_df = initial_fleet_state.copy()
+        if abs(val) < threshold:
+            explanations.append(f"📊 {label} has minimal impact on operational costs")
+        else:
+            # Determine impact intensity
+            if abs(val) < 0.05:
+                intensity = "slightly"
+                icon = "📈" if val > 0 else "📉"
+            elif abs(val) < 0.15:
+                intensity = "moderately"
+                icon = "📊" if val > 0 else "📋"
+            else:
+                intensity = "strongly"
+                icon = "🚨" if val > 0 else "✅"
+            
+            # Create context-aware business explanations
+            if feature == "total_fleet_size":
+                if val > 0:
+                    msg = f"{icon} Having more trains {intensity} increases cost per kilometer ({abs(val):.2f})"
+                else:
+                    msg = f"{icon} Optimized fleet size {intensity} reduces operational costs ({abs(val):.2f})"
+                    
+            elif feature == "target_service_trains":
+                if val > 0:
+                    msg = f"{icon} Deploying more trains {intensity} improves service capacity but increases costs ({abs(val):.2f})"
+                else:
+                    msg = f"{icon} Optimized train deployment {intensity} reduces operational overhead ({abs(val):.2f})"
+                    
+            elif feature == "avg_fleet_health":
+                if val > 0:
+                    msg = f"{icon} Better fleet health {intensity} increases maintenance costs ({abs(val):.2f})"
+                else:
+                    msg = f"{icon} Preventive maintenance {intensity} reduces emergency repair costs ({abs(val):.2f})"
+                    
+            elif feature == "is_monsoon":
+                if val > 0:
+                    msg = f"{icon} Monsoon conditions {intensity} increase operational challenges and costs ({abs(val):.2f})"
+                else:
+                    msg = f"{icon} Weather-optimized operations {intensity} reduce monsoon-related expenses ({abs(val):.2f})"
+                    
+            elif feature == "is_surge":
+                if val > 0:
+                    msg = f"{icon} High demand periods {intensity} increase operational costs due to surge capacity ({abs(val):.2f})"
+                else:
+                    msg = f"{icon} Efficient surge management {intensity} optimizes resource utilization ({abs(val):.2f})"
+                    
+            else:
+                # Fallback for any other features
+                direction = "increases" if val > 0 else "reduces"
+                msg = f"{icon} {label} {intensity} {direction} operational impact ({abs(val):.2f})"
+            
+            explanations.append(msg)
+    
+    return explanations
 
+def explain_conditions(ai_model, conditions_rows, feature_names, targets):
+    """
+    Computes SHAP explanations for many strategist inputs at once: one shap_values
+    call per estimator over all rows. Returns one list of per-target explanations
+    per row, in the same format run_simulation logs.
+    """
+    conditions_df = pd.DataFrame(conditions_rows)[feature_names]
+    explainers = get_shap_explainers(ai_model)
+    per_row = [[] for _ in conditions_rows]
+    for i, explainer in enumerate(explainers):
+        sv_all = np.array(explainer.shap_values(conditions_df))
+        base_value = float(explainer.expected_value) if np.isscalar(explainer.expected_value) else explainer.expected_value.tolist()
+        for row, (conditions, sv) in enumerate(zip(conditions_rows, sv_all)):
+            per_row[row].append({
+                "output_name": targets[i],
+                "base_value": base_value,
+                "shap_values": sv.tolist(),
+                "feature_names": feature_names,
+                "feature_values": [conditions[f] for f in feature_names],
+                "readable": [str(x).encode('utf-8', 'replace').decode('utf-8') for x in shap_to_readable(feature_names, sv)]
+            })
+    return per_row
+
+# --- 3. THE UNIFIED SIMULATION ENGINE FUNCTION WITH READABLE SHAP ---
+def default_scenario_calendar():
+    """The standard month: surge on days 7, 8 and 22, monsoon on days 13 and 14."""
     MONTHLY_SCENARIOS = ['NORMAL'] * SIMULATION_MONTH_DAYS
     MONTHLY_SCENARIOS[6] = MONTHLY_SCENARIOS[7] = 'FESTIVAL_SURGE'
     MONTHLY_SCENARIOS[12] = MONTHLY_SCENARIOS[13] = 'HEAVY_MONSOON'
     MONTHLY_SCENARIOS[21] = 'FESTIVAL_SURGE'
-    
+    return MONTHLY_SCENARIOS
+
+def manual_inputs_calendar(manual_overrides={}):
+    """{day: {train_id: override}}: the standard month's inspections, with manual_overrides replacing whole days."""
     MANUAL_INPUTS_CALENDAR = {
         5: {"Rake-12": {"health_penalty": 40, "reason": "Visual inspection"}},
         15: {"Rake-19": {"force_maintenance": True, "reason": "Driver report"}}
     }
     for day, override in manual_overrides.items():
         MANUAL_INPUTS_CALENDAR[int(day)] = override
+    return MANUAL_INPUTS_CALENDAR
+
+def iter_simulation(start_day, initial_fleet_state, ai_model, feature_names, targets, manual_overrides={}, solver_config=None, initial_plan_hint=None, batch_shap=False, scenario_calendar=None, explain=True):
+    """
+    Generator form of the engine: yields each day's log entry as soon as it is
+    solved, holding only the current fleet state. With batch_shap=True the SHAP
+    explanations are computed in one batched call after the last day, so entries
+    are held back and yielded together at the end. scenario_calendar is a list of
+    SIMULATION_MONTH_DAYS scenario names (default_scenario_calendar() if None);
+    explain=False skips SHAP entirely and logs empty shap_explanations.
+    """
+    if ai_model is None:
+        raise Exception("AI Strategist model is not loaded.")
+        
+    held_entries = []
+    pending_conditions = []
+    fleet_state = FleetState(initial_fleet_state)
+    # Each day's model is warm-started from the plan of the day before it.
+    previous_plan = initial_plan_hint
+
+    MONTHLY_SCENARIOS = list(scenario_calendar) if scenario_calendar is not None else default_scenario_calendar()
+    
+    MANUAL_INPUTS_CALENDAR = manual_inputs_calendar(manual_overrides)
 
     for day in range(start_day, SIMULATION_MONTH_DAYS + 1):
         scenario = MONTHLY_SCENARIOS[day - 1]
         manual_inputs_today = MANUAL_INPUTS_CALENDAR.get(day, {})
         
-        fleet_df_processed = preprocess_and_health_score(fleet_df, day, manual_inputs_today)
+        phase_start = time.perf_counter()
+        fleet_state.preprocess(day, manual_inputs_today)
+        preprocess_s = time.perf_counter() - phase_start
 
         current_conditions = {
-            'total_fleet_size': len(fleet_df_processed), 
+            'total_fleet_size': len(fleet_state), 
             'target_service_trains': SCENARIO_MODIFIERS[scenario]['MIN_SERVICE'], 
-            'avg_fleet_health': fleet_df_processed['health_score'].mean(), 
+            'avg_fleet_health': float(fleet_state['health_score'].mean()), 
             'is_monsoon': 1 if scenario == 'HEAVY_MONSOON' else 0, 
             'is_surge': 1 if scenario == 'FESTIVAL_SURGE' else 0
         }
-        conditions_df = pd.DataFrame([current_conditions])[feature_names]
-        
-        predicted_strategy = ai_model.predict(conditions_df)[0]
+        phase_start = time.perf_counter()
+        predicted_strategy = predict_strategy(ai_model, current_conditions, feature_names)
+        predict_s = time.perf_counter() - phase_start
         dynamic_strategy = {
             'cost_per_km': predicted_strategy[0], 'fatigue_factor': predicted_strategy[1], 
             'branding_penalty': predicted_strategy[2], 'target_mileage': predicted_strategy[3], 
             'maint_threshold': predicted_strategy[4]
         }
         
-        shap_explanations = []
-        for i, estimator in enumerate(ai_model.estimators_):
-            explainer = shap.TreeExplainer(estimator)
-            shap_values = explainer.shap_values(conditions_df)
-            
-            # inside run_simulation, replacing the old shap explanation creation
-            shap_values_raw = explainer.shap_values(conditions_df)
-
-            # Convert to numpy and squeeze the leading batch axis if present
-            sv = np.array(shap_values_raw)
-            # If the explainer returned something with a leading batch dimension (1, ...), remove it
-            if sv.ndim >= 2 and sv.shape[0] == 1:
-                sv = np.squeeze(sv, axis=0)   # e.g. (1, n_features) -> (n_features,) or (1,n_features,n_classes)->(n_features,n_classes)
-
-            # Convert expected value to numpy so we can reason about shapes
-            ev = np.array(explainer.expected_value)
-
-            # Now decide the canonical representation to store:
-            # - For single-output: store scalar base_value and shap_values as a 1-D list of length n_features
-            # - For multi-output: store base_value as list (length n_outputs) and shap_values as 2-D list shape (n_features, n_outputs)
-            if sv.ndim == 1:
-                # sv: (n_features,) -> single-output
-                stored_shap = sv.tolist()
-                # store base_value as scalar if possible
-                if ev.shape == ():
-                    stored_base = float(ev)
-                elif ev.size == 1:
-                    stored_base = float(ev.item())
-                else:
-                    # unexpected: ev is multi-element but sv is single-output -> coerce to list anyway
-                    stored_base = ev.tolist()
-            else:
-                # sv.ndim >= 2, we expect (n_features, n_outputs)
-                stored_shap = sv.tolist()
-                stored_base = ev.tolist()
-
-            explanation = {
-                "output_name": targets[i],
-                "base_value": stored_base,
-                "shap_values": stored_shap,
-            }
-            shap_explanations.append(explanation)
+        phase_start = time.perf_counter()
+        if not explain:
+            shap_explanations = []
+        elif batch_shap:
+            shap_explanations = []
+            pending_conditions.append(current_conditions)
+        else:
+            shap_explanations = explain_conditions(ai_model, [current_conditions], feature_names, targets)[0]
+        shap_s = time.perf_counter() - phase_start
 
-        
-        daily_plan, daily_cost = solve_daily_optimization(fleet_df_processed, day, scenario, dynamic_strategy)
+        daily_plan, daily_cost, solve_info = solve_daily_optimization(
+            fleet_state, day, scenario, dynamic_strategy,
+            hint_plan=previous_plan, solver_config=solver_config
+        )
         
         if daily_plan:
-            fleet_status_before = fleet_df_processed.copy()
-            fleet_status_before['cert_telecom_expiry'] = fleet_status_before['cert_telecom_expiry'].dt.strftime('%Y-m-%d')
-
-            updated_df = apply_daily_updates(fleet_df_processed.copy(), daily_plan, day)
-            fleet_status_after = updated_df.copy()
-            fleet_status_after['cert_telecom_expiry'] = fleet_status_after['cert_telecom_expiry'].dt.strftime('%Y-m-%d')
+            # Records are only materialized here, at the log boundary.
+            phase_start = time.perf_counter()
+            fleet_status_before = fleet_state.to_records()
+            update_start = time.perf_counter()
+            fleet_state.apply_updates(daily_plan, day)
+            update_s = time.perf_counter() - update_start
+            fleet_status_after = fleet_state.to_records()
+            serialize_s = time.perf_counter() - phase_start - update_s
             
             daily_log_entry = {
                 "day": day,
@@ -416,17 +777,50 @@ def run_simulation(start_day, initial_fleet_state, ai_model, feature_names, targ
                 "plan": daily_plan,
                 "cost": daily_cost,
                 "ai_strategy": dynamic_strategy,
-                "fleet_status_before": fleet_status_before.to_dict(orient='records'),
-                "fleet_status_after": fleet_status_after.to_dict(orient='records'),
+                "fleet_status_before": fleet_status_before,
+                "fleet_status_after": fleet_status_after,
                 "shap_explanations": shap_explanations,
                 "feature_names": feature_names,
-                "feature_values": conditions_df.iloc[0].tolist()
+                "feature_values": [float(current_conditions[f]) for f in feature_names],
+                "solver_status": solve_info['solver_status'],
+                "solve_time_s": solve_info['solve_time_s'],
+                # Seconds per phase of this day. With batch_shap, shap_s is this day's share of the batch.
+                "timings": {
+                    "preprocess_s": preprocess_s,
+                    "predict_s": predict_s,
+                    "shap_s": shap_s,
+                    "build_s": solve_info['build_time_s'],
+                    "solve_s": solve_info['solve_time_s'],
+                    "update_s": update_s,
+                    "serialize_s": serialize_s
+                }
             }
-            monthly_log.append(daily_log_entry)
+            if batch_shap and explain:
+                held_entries.append(daily_log_entry)
+            else:
+                yield daily_log_entry
             
-            fleet_df = updated_df
+            previous_plan = daily_plan
         else:
-            print(f"CRITICAL FAILURE on Day {day}. Halting simulation.")
+            print(f"CRITICAL FAILURE on Day {day} (solver status {solve_info['solver_status']}). Halting simulation.")
             break
-            
-    return monthly_log 
\ No newline at end of file
+
+    if held_entries:
+        phase_start = time.perf_counter()
+        batched = explain_conditions(ai_model, pending_conditions[:len(held_entries)], feature_names, targets)
+        shap_share_s = (time.perf_counter() - phase_start) / len(held_entries)
+        for entry, shap_explanations in zip(held_entries, batched):
+            entry['shap_explanations'] = shap_explanations
+            entry['timings']['shap_s'] += shap_share_s
+            yield entry
+
+def run_simulation(start_day, initial_fleet_state, ai_model, feature_names, targets, manual_overrides={}, solver_config=None, initial_plan_hint=None, on_day_complete=None, batch_shap=False, scenario_calendar=None, explain=True):
+    """Runs iter_simulation to completion and returns the list of log entries."""
+    monthly_log = []
+    for entry in iter_simulation(start_day, initial_fleet_state, ai_model, feature_names, targets, manual_overrides,
+                                 solver_config=solver_config, initial_plan_hint=initial_plan_hint, batch_shap=batch_shap,
+                                 scenario_calendar=scenario_calendar, explain=explain):
+        monthly_log.append(entry)
+        if on_day_complete is not None:
+            on_day_complete(entry)
+    return monthly_log
@@ -1,77 +1,286 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import pandas as pd
-import os
+import gzip
+import hashlib
 import json
-import numpy as np
+import threading
+from contextlib import closing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Import from your final optimizer_engine.py
 from answer_final import (
-    run_simulation,
+    iter_simulation,
     initialize_fleet_status,
-    AI_STRATEGIST_MODEL
+    add_solve_observer,
+    get_strategist,
+    warm_up,
+    SIMULATION_MONTH_DAYS
 )
+from checkpoint_store import backup_checkpoints, restore_checkpoints, save_checkpoints, load_checkpoint, truncate_checkpoints
+from log_store import LOG_DIR, SNAPSHOT_KEYS, DayShardedLogWriter, encode_log, iter_log, log_exists, log_size_bytes, log_version, read_log, read_day, migrate_legacy_log
+from metrics import BYTE_BUCKETS, Registry, instrument_app
+from simulation_store import STORE_FILE, SimulationStoreWriter
+from sim_jobs import JobManager, JobRejected
 
 app = Flask(__name__)
-CORS(app)
-MASTER_LOG_FILE = "simulation_log_master.json"
-
-# Helper function to handle special number types for JSON
-# In backend.py
-
-# Helper function to handle special number types for JSON
-def default_converter(o):
-    # Handle NumPy integers
-    if isinstance(o, (np.int64, np.int32, np.int16, np.int8)):
-        return int(o)
-    # Handle NumPy floats  
-    if isinstance(o, (np.float64, np.float32, np.float16)):
-        return float(o)
-    # Handle NumPy arrays
-    if isinstance(o, np.ndarray):
-        return o.tolist()
-    # Handle NumPy booleans
-    if isinstance(o, np.bool_):
-        return bool(o)
-    # Handle any other NumPy scalar types
-    if hasattr(o, 'item'):
-        return o.item()
-    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+CORS(app, expose_headers=["ETag", "X-Job-Id"])
+# Responses smaller than this are sent uncompressed.
+MIN_COMPRESS_BYTES = 1024
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+# Every run that writes the master log holds this lock, whichever endpoint started it.
+SIMULATION_LOCK = threading.Lock()
+# Held while the strategist is grown from recorded runs; simulations keep running on the model they started with.
+STRATEGIST_UPDATE_LOCK = threading.Lock()
+# Shared so each appended day is delta-encoded against the one before it without re-reading the log.
+LOG_WRITER = DayShardedLogWriter(LOG_DIR)
+# The chatbot reads simulated days from this store directly and notices every write.
+SIMULATION_STORE = SimulationStoreWriter(STORE_FILE)
+JOBS = JobManager()
+
+# --- Metrics (Prometheus text format at /metrics) ---
+METRICS = Registry()
+instrument_app(app, METRICS, "kronos_backend")
+SOLVER_WALL_TIME = METRICS.histogram("kronos_solver_wall_time_seconds", "CP-SAT wall time of each daily solve.")
+SOLVER_STATUS = METRICS.counter("kronos_solver_status_total", "Daily CP-SAT solves by final status.", ("status",))
+PHASE_TIME = METRICS.histogram("kronos_simulation_phase_seconds", "Seconds per simulated day in each engine phase.", ("phase",))
+LOG_WRITE_TIME = METRICS.histogram("kronos_log_write_seconds", "Time to persist one day (log shard, checkpoint, store).")
+LOG_ENTRY_BYTES = METRICS.histogram("kronos_log_entry_bytes", "Size of each written day shard.", buckets=BYTE_BUCKETS)
+METRICS.gauge("kronos_simulation_log_bytes", "Size of the simulation log on disk.", log_size_bytes)
+
+
+def observe_solve(solve_info):
+    SOLVER_WALL_TIME.observe(solve_info['solve_time_s'])
+    SOLVER_STATUS.inc(status=solve_info['solver_status'])
+
+
+add_solve_observer(observe_solve)
+
+
+def persist_day(entry):
+    """Called by iter_run_days as each day is solved: appends the log shard, fleet checkpoint and store rows."""
+    with LOG_WRITE_TIME.time():
+        LOG_ENTRY_BYTES.observe(LOG_WRITER.append(entry))
+        save_checkpoints([entry])
+        SIMULATION_STORE.write_days([entry])
+    for phase, seconds in entry.get('timings', {}).items():
+        PHASE_TIME.observe(seconds, phase=phase[:-len('_s')])
+
+
+def truncate_from(start_day):
+    """
+    Drops every persisted day >= start_day. The store goes first: it is one
+    transaction, so if it fails the log and checkpoints are still untouched.
+    """
+    SIMULATION_STORE.truncate(start_day)
+    truncate_checkpoints(start_day)
+    LOG_WRITER.truncate(start_day)
+
+
+def record_training_data():
+    """Adds the days of the finished run to the strategist's training store (see incremental_training.py)."""
+    from incremental_training import append_log
+    added = append_log(iter_log(decode_fleet=False))
+    if added:
+        print(f"Recorded {added} simulated days for strategist training.")
+
+
+def compressed_json_response(payload, etag):
+    """
+    Serializes payload as compact JSON tagged with a weak ETag, answering 304 when
+    the client already holds that version. The body is brotli- or gzip-encoded
+    when the client accepts it.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        encoding = request.accept_encodings.best_match(encodings) if len(body) >= MIN_COMPRESS_BYTES else None
+        if encoding == 'br':
+            body = brotli.compress(body)
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=6)
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def load_start_state(start_day):
+    """
+    Returns (fleet_df, previous_plan) for a run that starts on start_day: a fresh
+    fleet for day 1, otherwise the day start_day-1 checkpoint. (None, None) if missing.
+    """
+    if start_day == 1:
+        initialize_fleet_status()
+        return pd.read_csv("fleet_status.csv"), None
+    fleet_df, previous_plan = load_checkpoint(start_day - 1)
+    if fleet_df is None:
+        # Logs written before checkpoints existed: read the state from that day's log shard instead.
+        previous_day_log = read_day(start_day - 1)
+        if previous_day_log:
+            return pd.DataFrame(previous_day_log['fleet_status_after']), previous_day_log.get('plan')
+    return fleet_df, previous_plan
+
+
+def backup_from(start_day):
+    """Copies of the persisted log shards and checkpoints for days >= start_day, for restore_from."""
+    return {"log": LOG_WRITER.backup_days(start_day), "checkpoints": backup_checkpoints(start_day)}
+
+
+def restore_from(start_day, backup):
+    """Puts back the days >= start_day saved by backup_from; the store is rebuilt from the restored log."""
+    SIMULATION_STORE.truncate(start_day)
+    restore_checkpoints(start_day, backup["checkpoints"])
+    LOG_WRITER.restore_days(start_day, backup["log"])
+    SIMULATION_STORE.write_days(iter_log(start_day=start_day))
+
+
+def iter_run_days(start_day, params):
+    """
+    Runs the engine from start_day and persists each day as it is yielded,
+    replacing that day's previous version. Once the run ends, days after its
+    last one are dropped. If it is cancelled, fails or is closed early, the days
+    it replaced are restored, so the log is never left cut off part-way. Callers
+    must hold SIMULATION_LOCK and should close the generator (contextlib.closing)
+    when they stop early.
+    """
+    initial_fleet_state, previous_plan = load_start_state(start_day)
+    if initial_fleet_state is None:
+        raise ValueError(f"Could not find data for Day {start_day - 1} to start rerun.")
+    backup = backup_from(start_day)
+    last_day, finished = start_day - 1, False
+    try:
+        for entry in iter_simulation(
+            start_day=start_day,
+            initial_fleet_state=initial_fleet_state,
+            manual_overrides=params.get('manual_overrides') or {},
+            ai_model=get_strategist(),
+            feature_names=FEATURES,
+            targets=TARGETS,
+            solver_config=params.get('solver_config'),
+            initial_plan_hint=previous_plan
+        ):
+            persist_day(entry)
+            last_day = entry['day']
+            yield entry
+        finished = True
+    finally:
+        if finished:
+            truncate_from(last_day + 1)
+        else:
+            print(f"Run from Day {start_day} stopped after Day {last_day}; restoring the previous log.")
+            restore_from(start_day, backup)
+    record_training_data()
+
+
+def simulation_job(job):
+    start_day = job.params['start_day']
+    with SIMULATION_LOCK:
+        # Checked here rather than in the endpoint, so HTTP threads never wait for the lock.
+        if not start_state_available(start_day):
+            raise JobRejected(f"Could not find data for Day {start_day - 1} to start rerun.")
+        with closing(iter_run_days(start_day, job.params)) as days:
+            for entry in days:
+                job.report_day(entry['day'], entry)
+
+
+def start_state_available(start_day):
+    """True if a run can start on start_day: day 1 always can, later days need the day before logged."""
+    if start_day == 1:
+        return True
+    migrate_legacy_log()
+    return log_exists() and read_day(start_day - 1, decode_fleet=False) is not None
+
+
+def parse_start_day(data):
+    """Returns (start_day, None), or (None, error response) if data's start_day is not a day of the month."""
+    try:
+        start_day = int(data.get('start_day', 1))
+    except (TypeError, ValueError):
+        start_day = None
+    if start_day is None or not 1 <= start_day <= SIMULATION_MONTH_DAYS:
+        return None, (jsonify({"status": "error", "message": f"start_day must be between 1 and {SIMULATION_MONTH_DAYS}."}), 400)
+    return start_day, None
+
+
+def submit_simulation_job(start_day, data):
+    """Queues a run from start_day on the job pool. Returns (job, coalesced)."""
+    params = {
+        "start_day": start_day,
+        "manual_overrides": data.get('manual_overrides') or {},
+        "solver_config": data.get('solver_config')
+    }
+    kind = "full" if start_day == 1 else "rerun"
+    return JOBS.submit(kind, params, simulation_job, total_days=SIMULATION_MONTH_DAYS - start_day + 1)
+
+
+def finished_job_response(job, message):
+    if job.status == "succeeded":
+        return jsonify({"status": "success", "message": message, "job_id": job.id})
+    if job.status == "rejected":
+        return jsonify({"status": "error", "message": job.error, "job": job.to_dict()}), 400
+    reason = f": {job.error}" if job.error else ""
+    return jsonify({"status": "error", "message": f"Simulation job {job.id} {job.status}{reason}", "job": job.to_dict()}), \
+        409 if job.status == "cancelled" else 500
 
 
 @app.route('/run_full_simulation', methods=['POST'])
 def api_run_full_simulation():
+    """
+    Runs the month from day 1 on the job pool, like POST /jobs, but answers only
+    once the job has finished: the frontend expects the month to be ready when
+    this returns. The job shows up in /jobs and can be cancelled there.
+    """
     print("Received request to run a full simulation.")
-    initialize_fleet_status()
-    initial_fleet_df = pd.read_csv("fleet_status.csv")
-    
-    features = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
-    targets = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
-
-    full_log = run_simulation(
-        start_day=1,
-        initial_fleet_state=initial_fleet_df,
-        ai_model=AI_STRATEGIST_MODEL,
-        feature_names=features,
-        targets=targets
-    )
-    
-    with open(MASTER_LOG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(full_log, f, indent=2, default=default_converter, ensure_ascii=False)
-        
-    print(f"Full simulation complete. Log saved to {MASTER_LOG_FILE}")
-    return jsonify({"status": "success", "message": "Full simulation complete."})
+    data = request.get_json(silent=True) or {}
+    if get_strategist() is None:
+        return jsonify({"status": "error", "message": "AI Strategist model is not loaded."}), 500
+    job, _ = submit_simulation_job(1, data)
+    job.wait()
+    print(f"Full simulation job {job.id} {job.status}. Log in {LOG_DIR}/")
+    return finished_job_response(job, "Full simulation complete.")
 
 
 @app.route('/get_simulation_data', methods=['GET'])
 def api_get_simulation_data():
-    if not os.path.exists(MASTER_LOG_FILE):
+    """
+    Optional query parameters:
+      start_day / end_day: inclusive day range (defaults to the whole log)
+      fields: comma-separated entry keys to return, e.g. "plan,cost,scenario" ("day" is always included)
+      encoding: "delta" to send fleet snapshots delta-encoded (first day in full), as in log_store.encode_log
+    """
+    if not log_exists():
         return jsonify({"status": "error", "message": "No simulation data found. Run a simulation first."}), 404
+
+    start_day = request.args.get('start_day', type=int)
+    end_day = request.args.get('end_day', type=int)
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    delta = request.args.get('encoding') == 'delta'
+    query_key = f"{start_day}:{end_day}:{','.join(fields)}:{delta}"
+    etag = f"{log_version()}-{hashlib.sha1(query_key.encode()).hexdigest()[:8]}"
+    if request.if_none_match.contains_weak(etag):
+        return compressed_json_response(None, etag)
         
     try:
-        with open(MASTER_LOG_FILE, 'r') as f:
-            master_log = json.load(f)
-        return jsonify({"status": "success", "data": master_log})
+        # Snapshots are only rebuilt from their deltas when the response includes them.
+        decode_fleet = not fields or any(key in fields for key in SNAPSHOT_KEYS)
+        master_log = read_log(start_day=start_day, end_day=end_day, decode_fleet=decode_fleet)
+        if fields:
+            keep = set(fields) | {'day'}
+            master_log = [{k: v for k, v in entry.items() if k in keep} for entry in master_log]
+        if delta and master_log and all(key in master_log[0] for key in SNAPSHOT_KEYS):
+            master_log = encode_log(master_log)
+        return compressed_json_response({"status": "success", "data": master_log}, etag)
     except json.JSONDecodeError as e:
         return jsonify({"status": "error", "message": f"Invalid JSON in log file: {str(e)}"}), 500
     except Exception as e:
@@ -80,59 +289,134 @@ def api_get_simulation_data():
 
 @app.route('/rerun_from_day', methods=['POST'])
 def api_rerun_from_day():
-    data = request.json
-    start_day = data.get('start_day')
-    manual_overrides = data.get('manual_overrides', {})
+    """Blocking form of POST /jobs for a rerun; see /run_full_simulation."""
+    data = request.get_json(silent=True) or {}
+    start_day, error = parse_start_day(data)
+    if error:
+        return error
     
     print(f"Received request to rerun simulation from Day {start_day}.")
     
-    if not os.path.exists(MASTER_LOG_FILE):
+    if not log_exists():
         return jsonify({"status": "error", "message": "Master log file not found. Run a full simulation first."}), 400
-        
-    with open(MASTER_LOG_FILE, 'r') as f:
-        master_log = json.load(f)
-    
-    initial_fleet_state_for_rerun = None
-    if start_day == 1:
-        initialize_fleet_status()
-        initial_fleet_state_for_rerun = pd.read_csv("fleet_status.csv")
-    else:
-        previous_day_log = next((item for item in master_log if item["day"] == start_day - 1), None)
-        if previous_day_log:
-            initial_fleet_state_for_rerun = pd.DataFrame(previous_day_log['fleet_status_after'])
-        else:
-            return jsonify({"status": "error", "message": f"Could not find data for Day {start_day - 1} to start rerun."}), 400
-
-    features = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
-    targets = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
-
-    rerun_log_segment = run_simulation(
-        start_day=start_day,
-        initial_fleet_state=initial_fleet_state_for_rerun,
-        manual_overrides=manual_overrides,
-        ai_model=AI_STRATEGIST_MODEL,
-        feature_names=features,
-        targets=targets
-    )
-    
-    final_log = [item for item in master_log if item['day'] < start_day]
-    final_log.extend(rerun_log_segment)
+    if get_strategist() is None:
+        return jsonify({"status": "error", "message": "AI Strategist model is not loaded."}), 500
+
+    job, _ = submit_simulation_job(start_day, data)
+    job.wait()
+    print(f"Rerun job {job.id} from Day {start_day} {job.status}.")
+    return finished_job_response(job, f"Rerun from Day {start_day} complete.")
 
-    with open(MASTER_LOG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_log, f, indent=2, default=default_converter, ensure_ascii=False)
-        
-    print(f"Rerun from Day {start_day} complete. Master log updated.")
-    return jsonify({"status": "success", "message": f"Rerun from Day {start_day} complete."})
+
+@app.route('/stream_simulation', methods=['POST'])
+def api_stream_simulation():
+    """
+    Runs (or reruns) the simulation from start_day (default 1) on the job pool and
+    streams each day's log entry as soon as it is solved and persisted. The body is
+    NDJSON, or Server-Sent Events with ?format=sse; the job id is in the X-Job-Id
+    header. Accepts the same JSON body as /rerun_from_day. The job is shared with
+    identical /jobs submissions and keeps running if the client disconnects; cancel
+    it through /jobs/<job_id>/cancel. A run that does not succeed ends the stream
+    with an error object (NDJSON) or an "error" event (SSE).
+    """
+    data = request.get_json(silent=True) or {}
+    start_day, error = parse_start_day(data)
+    if error:
+        return error
+    use_sse = request.args.get('format') == 'sse'
+    print(f"Received request to stream simulation from Day {start_day}.")
+
+    if get_strategist() is None:
+        return jsonify({"status": "error", "message": "AI Strategist model is not loaded."}), 500
+    job, _ = submit_simulation_job(start_day, data)
+    entries = job.follow()
+    if entries is None:
+        # The job (an identical one this request was coalesced onto) finished before it could be followed.
+        return finished_job_response(job, f"Simulation from Day {start_day} complete; fetch it from /get_simulation_data.")
+
+    def generate():
+        for entry in entries:
+            line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+            yield f"data: {line}\n\n" if use_sse else f"{line}\n"
+        job.wait()
+        if job.status != "succeeded":
+            reason = f": {job.error}" if job.error else ""
+            line = json.dumps({"status": "error", "message": f"Simulation job {job.id} {job.status}{reason}", "job": job.to_dict()})
+            yield f"event: error\ndata: {line}\n\n" if use_sse else f"{line}\n"
+        elif use_sse:
+            yield "event: done\ndata: {}\n\n"
+        print(f"Streamed simulation job {job.id} from Day {start_day} {job.status}.")
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={'Cache-Control': 'no-cache', 'X-Job-Id': job.id})
+
+
+@app.route('/jobs', methods=['POST'])
+def api_submit_job():
+    """
+    Queues a full run (start_day 1, the default) or a rerun on the background pool and
+    returns immediately with a job id. Accepts the same JSON body as /rerun_from_day.
+    Identical submissions while a job is queued or running return that job instead.
+    """
+    data = request.get_json(silent=True) or {}
+    start_day, error = parse_start_day(data)
+    if error:
+        return error
+    if get_strategist() is None:
+        return jsonify({"status": "error", "message": "AI Strategist model is not loaded."}), 500
+
+    job, coalesced = submit_simulation_job(start_day, data)
+    return jsonify({"status": "success", "coalesced": coalesced, "job": job.to_dict()}), 202
+
+
+@app.route('/jobs', methods=['GET'])
+def api_list_jobs():
+    return jsonify({"status": "success", "jobs": [job.to_dict() for job in JOBS.list()]})
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job {job_id}."}), 404
+    return jsonify({"status": "success", "job": job.to_dict()})
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    job = JOBS.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job {job_id}."}), 404
+    return jsonify({"status": "success", "job": job.to_dict()})
+
+
+@app.route('/retrain_strategist', methods=['POST'])
+def api_retrain_strategist():
+    """
+    Grows the strategist with new trees fitted on the recorded runs it has not
+    learned from yet. The next simulation picks up the new model; no restart needed.
+    Optional JSON body: {"trees": <trees added per target>}.
+    """
+    from incremental_training import TREES_PER_UPDATE, update_strategist
+    data = request.get_json(silent=True) or {}
+    if get_strategist() is None:
+        return jsonify({"status": "error", "message": "AI Strategist model is not loaded."}), 500
+    if not STRATEGIST_UPDATE_LOCK.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "A strategist update is already running."}), 409
+    try:
+        result = update_strategist(trees=int(data.get('trees', TREES_PER_UPDATE)))
+    finally:
+        STRATEGIST_UPDATE_LOCK.release()
+    return jsonify({"status": "success", **result})
 
 
 @app.route('/get_explanations', methods=['GET'])
 def api_get_explanations():
-    if not os.path.exists(MASTER_LOG_FILE):
+    if not log_exists():
         return jsonify({"status": "error", "message": "Master log file not found. Run a simulation first."}), 400
 
     try:
-        with open(MASTER_LOG_FILE, 'r', encoding='utf-8') as f:
-            master_log = json.load(f)
+        master_log = read_log()
 
         explanations = []
         for entry in master_log:
@@ -154,5 +438,16 @@ def api_get_explanations():
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
 
+def backfill_store():
+    """Fills an empty store from an existing log, e.g. the first start after upgrading."""
+    with SIMULATION_LOCK:
+        if SIMULATION_STORE.is_empty() and log_exists():
+            SIMULATION_STORE.write_days(iter_log())
+            print(f"Simulation store {STORE_FILE} filled from the existing log.")
+
+
 if __name__ == '__main__':
+    # Pay for the engine's imports, the model and its explainers before the first request.
+    warm_up()
+    backfill_store()
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+from answer_final import (
+    CERTIFICATE_VALIDITY_DAYS,
+    CODED_COLUMNS,
+    COUNTER_COLUMNS,
+    NUMERIC_COLUMNS,
+    PRIORITY_PENALTIES,
+    SCENARIO_MODIFIERS,
+    SIMULATION_MONTH_DAYS,
+    SIMULATION_START_DATE,
+    SOLVE_OBSERVERS,
+    FleetState,
+    advance_counters,
+    build_initial_fleet,
+    category_code,
+    default_scenario_calendar,
+    explain_conditions,
+    get_strategist,
+    health_score_kernel,
+    manual_inputs_calendar,
+    override_arrays,
+    predict_strategies,
+    solve_daily_optimization
+)
+
+# --- 1. CONFIGURATION ---
+# python batch_engine.py replicas.json [--processes 4] [--output batch_logs.json]
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+# As in scenario_sweep: one CP-SAT worker per solve, so the pool scales with processes, not threads.
+BATCH_SOLVER_CONFIG = {"num_workers": 1}
+STRATEGY_KEYS = ['cost_per_km', 'fatigue_factor', 'branding_penalty', 'target_mileage', 'maint_threshold']
+
+# --- 2. BATCHED FLEET STATE ---
+class FleetBatch:
+    """
+    K fleets with the same rakes (same train IDs in the same order) advanced in
+    lockstep. Every FleetState column is held as one replica x rake array and
+    the day's preprocessing and updates run once over the whole batch through
+    the same kernels FleetState uses. replicas[k] is a FleetState whose arrays
+    are row views into the batch, so it can be solved or turned into log
+    records exactly like a single-run state.
+    """
+    def __init__(self, fleets):
+        self.replicas = [FleetState(df) for df in fleets]
+        self.train_ids = self.replicas[0].train_ids
+        for state in self.replicas[1:]:
+            if not np.array_equal(state.train_ids, self.train_ids):
+                raise ValueError("All replicas in a FleetBatch must have the same rakes in the same order.")
+        self.cert_expiry = np.vstack([state.cert_expiry for state in self.replicas])
+        self.branding_sla_active = np.vstack([state.branding_sla_active for state in self.replicas])
+        # Mixed dtypes across replicas are stacked to a common dtype.
+        self.numeric = {col: np.vstack([state.numeric[col] for state in self.replicas]) for col in NUMERIC_COLUMNS}
+        # Codes are remapped onto one category list per column, shared by every replica.
+        self.categories, self.codes = {}, {}
+        for col in CODED_COLUMNS:
+            shared = []
+            rows = []
+            for state in self.replicas:
+                remap = np.array([category_code(shared, value) for value in state.categories[col]], dtype=np.int16)
+                rows.append(remap[state.codes[col]])
+            self.categories[col] = shared
+            self.codes[col] = np.vstack(rows)
+        self.derived = {}
+        self._sync_views()
+
+    def __len__(self):
+        return len(self.replicas)
+
+    def code_of(self, col, value):
+        return category_code(self.categories[col], value)
+
+    def _sync_views(self):
+        # Kernels may replace whole arrays; re-point every replica at its row.
+        for k, state in enumerate(self.replicas):
+            state.cert_expiry = self.cert_expiry[k]
+            state.branding_sla_active = self.branding_sla_active[k]
+            state.numeric = {col: values[k] for col, values in self.numeric.items()}
+            state.codes = {col: values[k] for col, values in self.codes.items()}
+            state.categories = self.categories
+            for col, values in self.derived.items():
+                state._set_derived(col, values[k])
+
+    def masks_of(self, plans, key):
+        """replica x rake mask of the train IDs in plans[k][key]; replicas whose plan is None get no rows."""
+        index_of = self.replicas[0].index_of
+        mask = np.zeros((len(self), len(self.train_ids)), dtype=bool)
+        for k, plan in enumerate(plans):
+            if plan:
+                mask[k, [index_of[t] for t in plan[key] if t in index_of]] = True
+        return mask
+
+    def preprocess(self, current_day, manual_inputs_list):
+        """FleetState.preprocess for every replica at once; manual_inputs_list[k] holds replica k's overrides."""
+        today = (SIMULATION_START_DATE + timedelta(days=current_day - 1)).toordinal()
+        is_cert_expired = self.cert_expiry < today
+        km_since = self.numeric['current_km'] - self.numeric['bogie_last_service_km']
+        job_open = self.codes['job_card_status'] == self.code_of('job_card_status', 'OPEN')
+        priority_penalty = np.zeros(km_since.shape)
+        for p, penalty in PRIORITY_PENALTIES.items():
+            priority_penalty[job_open & (self.codes['job_card_priority'] == self.code_of('job_card_priority', p))] = penalty
+        overrides = [override_arrays(self.train_ids, manual_inputs) for manual_inputs in manual_inputs_list]
+        override_penalty = None
+        if any(penalty is not None for penalty, _ in overrides):
+            # Subtracting 0.0 leaves a score bit-for-bit unchanged, so replicas without penalties get zeros.
+            override_penalty = np.vstack([penalty if penalty is not None else np.zeros(len(self.train_ids)) for penalty, _ in overrides])
+        self.derived = {
+            'is_cert_expired': is_cert_expired,
+            'health_score': health_score_kernel(km_since, self.numeric['consecutive_service_days'], is_cert_expired,
+                                                today - self.cert_expiry, priority_penalty, override_penalty),
+            'km_since_last_service': km_since,
+            'manual_force_maintenance': np.vstack([force for _, force in overrides])
+        }
+        self._sync_views()
+        return self
+
+    def apply_updates(self, plans, current_day):
+        """FleetState.apply_updates for every replica whose plan is not None; the others are left unchanged."""
+        today = (SIMULATION_START_DATE + timedelta(days=current_day - 1)).toordinal()
+        rows = np.array([k for k, plan in enumerate(plans) if plan], dtype=np.int64)
+        in_service = self.masks_of(plans, 'SERVICE')
+        in_maintenance = self.masks_of(plans, 'MAINTENANCE')
+        renew = in_maintenance & (self.cert_expiry < today)
+        self.cert_expiry = np.where(renew, today + CERTIFICATE_VALIDITY_DAYS, self.cert_expiry)
+        self.derived['health_score'][in_maintenance] = 100
+        self.codes['job_card_status'][in_maintenance] = self.code_of('job_card_status', 'CLOSED')
+        self.codes['job_card_priority'][in_maintenance] = self.code_of('job_card_priority', 'NONE')
+        counters = {col: self.numeric[col][rows] for col in COUNTER_COLUMNS}
+        advance_counters(counters, in_service[rows], in_maintenance[rows], self.branding_sla_active[rows])
+        for col, values in counters.items():
+            self.numeric[col][rows] = values
+        self._sync_views()
+        return self
+
+# --- 3. SOLVER POOL ---
+def _init_solver_worker():
+    # Solves are reported to the parent's observers when their results come back.
+    SOLVE_OBSERVERS.clear()
+
+def _solve_task(task):
+    fleet_state, day, scenario, dynamic_strategy, hint_plan, solver_config = task
+    return solve_daily_optimization(fleet_state, day, scenario, dynamic_strategy, hint_plan=hint_plan, solver_config=solver_config)
+
+# --- 4. THE BATCHED ENGINE ---
+def run_batch(replicas, ai_model, feature_names, targets, start_day=1, solver_config=BATCH_SOLVER_CONFIG, processes=None,
+              explain=False, keep_fleet_status=True):
+    """
+    Runs K what-if variants of the month together and returns one log (a list
+    of entries, as run_simulation returns) per replica. Each replica is a dict:
+
+    fleet: the starting fleet DataFrame (every replica must have the same rakes).
+    manual_overrides, scenario_calendar, initial_plan_hint: as for run_simulation.
+    strategy_overrides: strategy keys (e.g. {"maint_threshold": 60}) that replace
+        the strategist's prediction for this replica.
+
+    Each day the fleets are preprocessed as one 2-D batch, the strategist makes
+    one predict call over all K condition rows, and the K CP-SAT solves run on a
+    pool of `processes` workers (in this process when it is 1). A replica whose
+    solve fails stops there, like run_simulation. With the same solver_config a
+    replica's entries equal run_simulation's apart from the timings, which hold
+    this replica's share of each batched phase. explain=True adds SHAP
+    explanations with one batched call at the end; keep_fleet_status=False logs
+    None instead of the fleet records, which dominate the cost at large fleets.
+    """
+    if ai_model is None:
+        raise Exception("AI Strategist model is not loaded.")
+    batch = FleetBatch([replica['fleet'] for replica in replicas])
+    calendars = [list(replica.get('scenario_calendar') or default_scenario_calendar()) for replica in replicas]
+    manual_calendars = [manual_inputs_calendar(replica.get('manual_overrides', {})) for replica in replicas]
+    previous_plans = [replica.get('initial_plan_hint') for replica in replicas]
+    logs = [[] for _ in replicas]
+    pending_conditions = []
+    active = list(range(len(replicas)))
+    processes = processes or os.cpu_count()
+    pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_solver_worker) if processes > 1 and len(replicas) > 1 else None
+
+    try:
+        for day in range(start_day, SIMULATION_MONTH_DAYS + 1):
+            if not active:
+                break
+            scenarios = [calendars[k][day - 1] for k in range(len(replicas))]
+            phase_start = time.perf_counter()
+            batch.preprocess(day, [manual_calendars[k].get(day, {}) for k in range(len(replicas))])
+            preprocess_s = (time.perf_counter() - phase_start) / len(active)
+
+            conditions = {}
+            for k in active:
+                conditions[k] = {
+                    'total_fleet_size': len(batch.train_ids),
+                    'target_service_trains': SCENARIO_MODIFIERS[scenarios[k]]['MIN_SERVICE'],
+                    'avg_fleet_health': float(batch.replicas[k]['health_score'].mean()),
+                    'is_monsoon': 1 if scenarios[k] == 'HEAVY_MONSOON' else 0,
+                    'is_surge': 1 if scenarios[k] == 'FESTIVAL_SURGE' else 0
+                }
+            phase_start = time.perf_counter()
+            predicted = predict_strategies(ai_model, [conditions[k] for k in active], feature_names)
+            predict_s = (time.perf_counter() - phase_start) / len(active)
+            strategies = {}
+            for k, outputs in zip(active, predicted):
+                strategies[k] = {**dict(zip(STRATEGY_KEYS, outputs)), **replicas[k].get('strategy_overrides', {})}
+
+            tasks = [(batch.replicas[k], day, scenarios[k], strategies[k], previous_plans[k], solver_config) for k in active]
+            if pool is not None:
+                results = list(pool.map(_solve_task, tasks))
+                for _, _, solve_info in results:
+                    for observer in SOLVE_OBSERVERS:
+                        observer(solve_info)
+            else:
+                results = [_solve_task(task) for task in tasks]
+
+            plans = [None] * len(replicas)
+            for k, (plan, _, solve_info) in zip(active, results):
+                if plan:
+                    plans[k] = plan
+                else:
+                    print(f"CRITICAL FAILURE on Day {day} for replica {k} (solver status {solve_info['solver_status']}). Halting this replica.")
+            solved = [k for k in active if plans[k]]
+            serialize_s = {}
+            fleet_status_before = {}
+            for k in solved:
+                phase_start = time.perf_counter()
+                fleet_status_before[k] = batch.replicas[k].to_records() if keep_fleet_status else None
+                serialize_s[k] = time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
+            if solved:
+                batch.apply_updates(plans, day)
+            update_s = (time.perf_counter() - phase_start) / max(len(solved), 1)
+
+            for k, (plan, cost, solve_info) in zip(active, results):
+                if not plan:
+                    continue
+                phase_start = time.perf_counter()
+                fleet_status_after = batch.replicas[k].to_records() if keep_fleet_status else None
+                serialize_s[k] += time.perf_counter() - phase_start
+                logs[k].append({
+                    "day": day,
+                    "scenario": scenarios[k],
+                    "plan": plan,
+                    "cost": cost,
+                    "ai_strategy": strategies[k],
+                    "fleet_status_before": fleet_status_before[k],
+                    "fleet_status_after": fleet_status_after,
+                    "shap_explanations": [],
+                    "feature_names": feature_names,
+                    "feature_values": [float(conditions[k][f]) for f in feature_names],
+                    "solver_status": solve_info['solver_status'],
+                    "solve_time_s": solve_info['solve_time_s'],
+                    "timings": {
+                        "preprocess_s": preprocess_s,
+                        "predict_s": predict_s,
+                        "shap_s": 0.0,
+                        "build_s": solve_info['build_time_s'],
+                        "solve_s": solve_info['solve_time_s'],
+                        "update_s": update_s,
+                        "serialize_s": serialize_s[k]
+                    }
+                })
+                if explain:
+                    pending_conditions.append((logs[k][-1], conditions[k]))
+                previous_plans[k] = plan
+            active = solved
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if pending_conditions:
+        phase_start = time.perf_counter()
+        batched = explain_conditions(ai_model, [row for _, row in pending_conditions], feature_names, targets)
+        shap_share_s = (time.perf_counter() - phase_start) / len(pending_conditions)
+        for (entry, _), shap_explanations in zip(pending_conditions, batched):
+            entry['shap_explanations'] = shap_explanations
+            entry['timings']['shap_s'] = shap_share_s
+    return logs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run what-if variants of the month as one batch.")
+    parser.add_argument("replicas", help="JSON list of replica dicts (manual_overrides, scenario_calendar, strategy_overrides, fleet_file)")
+    parser.add_argument("--base-file", default="fleet_data.csv", help="Starting fleet for replicas without a fleet_file")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--explain", action="store_true", help="Add SHAP explanations to every entry")
+    parser.add_argument("--output", default="batch_logs.json")
+    args = parser.parse_args()
+
+    with open(args.replicas, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    base_fleet = build_initial_fleet(args.base_file)
+    replicas = [{**spec, 'fleet': pd.read_csv(spec['fleet_file']) if spec.get('fleet_file') else base_fleet} for spec in specs]
+    start = time.perf_counter()
+    logs = run_batch(replicas, get_strategist(), FEATURES, TARGETS, processes=args.processes, explain=args.explain)
+    print(f"{len(logs)} replicas simulated in {time.perf_counter() - start:.1f}s.")
+    for k, log in enumerate(logs):
+        print(f"  replica {k}: {len(log)} days, total cost {sum(entry['cost'] for entry in log)}")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(logs, f)
+    print(f"Logs saved to {args.output}")
@@ -0,0 +1,32 @@
+import sys
+import time
+
+from answer_final import (
+    preprocess_and_health_score,
+    solve_daily_optimization,
+    solve_daily_optimization_rowwise,
+    build_daily_model
+)
+from fleet_generator import generate_fleet
+
+# --- 1. Configuration ---
+FLEET_SIZES = [25, 250, 500, 1000, 2500, 5000]
+BENCH_DAY = 13
+BENCH_STRATEGY = {'cost_per_km': 15.9, 'fatigue_factor': 1053.0, 'branding_penalty': 40240.0, 'target_mileage': 1058.5, 'maint_threshold': 64.8}
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+# --- 2. Run the scaling benchmark ---
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or FLEET_SIZES
+    print(f"{'rakes':>6} {'scenario':>14} {'rowwise_s':>10} {'columnar_s':>10} {'build_s':>8} {'same_cost':>9} {'same_plan':>9}")
+    for n in sizes:
+        for scenario in ['NORMAL', 'HEAVY_MONSOON']:
+            fleet = preprocess_and_health_score(generate_fleet(n), BENCH_DAY, {})
+            (plan_a, cost_a), t_rowwise = timed(solve_daily_optimization_rowwise, fleet, BENCH_DAY, scenario, BENCH_STRATEGY)
+            (plan_b, cost_b, _), t_columnar = timed(solve_daily_optimization, fleet, BENCH_DAY, scenario, BENCH_STRATEGY)
+            _, t_build = timed(build_daily_model, fleet, BENCH_DAY, scenario, BENCH_STRATEGY)
+            print(f"{n:>6} {scenario:>14} {t_rowwise:>10.3f} {t_columnar:>10.3f} {t_build:>8.3f} {str(cost_a == cost_b):>9} {str(plan_a == plan_b):>9}")
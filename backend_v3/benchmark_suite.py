@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from answer_final import (
+    FleetState,
+    apply_daily_updates,
+    explain_conditions,
+    get_strategist,
+    get_strategist_model,
+    predict_strategy,
+    preprocess_and_health_score,
+    run_simulation,
+    solve_daily_optimization
+)
+from fleet_generator import generate_fleet
+from log_store import encode_entry
+
+# --- 1. CONFIGURATION ---
+# python benchmark_suite.py [--sizes 25 250] [--output results.json] [--compare benchmark_baseline.json]
+# Timings only compare on the machine that recorded them, so no baseline is committed:
+# record one locally with --save-baseline. --compare refuses (exit status 2) a baseline
+# whose meta MACHINE_KEYS differ from the current run's.
+MICRO_SIZES = [25, 250, 2500]
+END_TO_END_SIZES = [25, 250, 2500]
+BENCH_DAY = 13
+BENCH_SCENARIO = 'NORMAL'
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+# One CP-SAT worker with deterministic time keeps solver timings comparable between machines and runs.
+BENCH_SOLVER_CONFIG = {"num_workers": 1, "deterministic": True}
+# Each microbenchmark runs up to REPEATS times (the median is reported) but stops
+# repeating once it has spent MAX_PHASE_S.
+REPEATS = 7
+MAX_PHASE_S = 5.0
+BASELINE_FILE = "benchmark_baseline.json"
+MACHINE_KEYS = ("platform", "cpu_count")
+# A benchmark regresses when its median exceeds the baseline's by more than this
+# fraction plus MIN_REGRESSION_S (so microsecond-scale noise never fails the check).
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_S = 0.002
+
+# --- 2. TIMING ---
+def measure(fn, setup=None, repeats=REPEATS, max_s=MAX_PHASE_S):
+    """Times fn(setup()) (setup untimed) and returns the timing summary of the runs."""
+    times = []
+    spent = time.perf_counter()
+    while len(times) < repeats and (not times or time.perf_counter() - spent < max_s):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        fn(argument) if setup else fn()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": len(times)}
+
+def conditions_for(state):
+    return {'total_fleet_size': len(state), 'target_service_trains': 6, 'avg_fleet_health': float(state['health_score'].mean()),
+            'is_monsoon': 0, 'is_surge': 0}
+
+# --- 3. BENCHMARKS ---
+def micro_benchmarks(n_rakes, forest, strategist):
+    """Per-phase timings of one simulated day at n_rakes, keyed "<phase>[<n_rakes>]"."""
+    fleet = generate_fleet(n_rakes)
+    prepared = preprocess_and_health_score(fleet.copy(), BENCH_DAY, {})
+    state = FleetState(fleet)
+    state.preprocess(BENCH_DAY, {})
+    plan, _, _ = solve_daily_optimization(state, BENCH_DAY, BENCH_SCENARIO, solver_config=BENCH_SOLVER_CONFIG)
+    conditions = conditions_for(state)
+    before = state.to_records()
+    after_state = FleetState(fleet)
+    after_state.preprocess(BENCH_DAY, {})
+    after_state.apply_updates(plan, BENCH_DAY)
+    entry = {"day": BENCH_DAY, "scenario": BENCH_SCENARIO, "plan": plan, "fleet_status_before": before,
+             "fleet_status_after": after_state.to_records()}
+    # Stands in for the previous day's fleet_status_after the writer would encode against.
+    _, previous_after = encode_entry(entry)
+
+    def fresh_state():
+        fresh = FleetState(fleet)
+        fresh.preprocess(BENCH_DAY, {})
+        return fresh
+
+    phases = {
+        "preprocess_and_health_score": (lambda df: preprocess_and_health_score(df, BENCH_DAY, {}), lambda: fleet.copy()),
+        "fleet_state_build": (lambda: FleetState(fleet), None),
+        "fleet_state_preprocess": (lambda s: s.preprocess(BENCH_DAY, {}), lambda: FleetState(fleet)),
+        "solve_daily_optimization": (lambda: solve_daily_optimization(state, BENCH_DAY, BENCH_SCENARIO, solver_config=BENCH_SOLVER_CONFIG), None),
+        "solve_daily_optimization_dataframe": (lambda: solve_daily_optimization(prepared, BENCH_DAY, BENCH_SCENARIO, solver_config=BENCH_SOLVER_CONFIG), None),
+        "apply_daily_updates": (lambda df: apply_daily_updates(df, plan, BENCH_DAY), lambda: prepared.copy()),
+        "fleet_state_apply_updates": (lambda s: s.apply_updates(plan, BENCH_DAY), fresh_state),
+        "fleet_state_to_records": (lambda: state.to_records(), None),
+        "strategist_predict_forest": (lambda: predict_strategy(forest, conditions, FEATURES), None),
+        "strategist_predict": (lambda: predict_strategy(strategist, conditions, FEATURES), None),
+        "json_serialize_entry": (lambda: json.dumps(entry, ensure_ascii=False, separators=(',', ':')), None),
+        "delta_encode_entry": (lambda: encode_entry(entry, previous_after), None),
+    }
+    results = {}
+    for phase, (fn, setup) in phases.items():
+        results[f"{phase}[{n_rakes}]"] = {**measure(fn, setup), "rakes": n_rakes}
+    return results
+
+def shap_benchmark(forest, n_rakes=25):
+    """The SHAP block does not depend on fleet size: one explain_conditions call for one day."""
+    state = FleetState(generate_fleet(n_rakes))
+    state.preprocess(BENCH_DAY, {})
+    conditions = conditions_for(state)
+    explain_conditions(forest, [conditions], FEATURES, TARGETS)  # builds the explainers
+    return {"shap_explain_day": measure(lambda: explain_conditions(forest, [conditions], FEATURES, TARGETS))}
+
+def end_to_end(n_rakes, strategist, days):
+    """One run_simulation over the last `days` days of the month (batched SHAP, as the backend runs it)."""
+    fleet = generate_fleet(n_rakes)
+    start = time.perf_counter()
+    log = run_simulation(31 - days, fleet, strategist, FEATURES, TARGETS, solver_config=BENCH_SOLVER_CONFIG, batch_shap=True)
+    elapsed = time.perf_counter() - start
+    return {f"run_simulation[{n_rakes}]": {"median_s": elapsed, "min_s": elapsed, "runs": 1, "rakes": n_rakes,
+                                           "days": days, "days_completed": len(log)}}
+
+def run_suite(micro_sizes=MICRO_SIZES, end_to_end_sizes=END_TO_END_SIZES, days=30):
+    forest, strategist = get_strategist_model(), get_strategist()
+    if forest is None:
+        raise SystemExit("strategy_model.joblib not found; run brain_make.py first.")
+    results = {}
+    for n_rakes in micro_sizes:
+        print(f"Microbenchmarks at {n_rakes} rakes...")
+        results.update(micro_benchmarks(n_rakes, forest, strategist))
+    results.update(shap_benchmark(forest))
+    for n_rakes in end_to_end_sizes:
+        print(f"End-to-end run at {n_rakes} rakes ({days} days)...")
+        results.update(end_to_end(n_rakes, strategist, days))
+    import numpy, pandas, ortools
+    return {
+        "meta": {
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "pandas": pandas.__version__,
+            "ortools": ortools.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "strategist": type(strategist).__name__,
+            "solver_config": BENCH_SOLVER_CONFIG
+        },
+        "results": results
+    }
+
+# --- 4. BASELINE COMPARISON ---
+def machine_mismatches(current, baseline):
+    """The MACHINE_KEYS on which the two result sets' meta differ, as (key, baseline value, current value)."""
+    return [(key, baseline["meta"].get(key), current["meta"].get(key)) for key in MACHINE_KEYS
+            if baseline["meta"].get(key) != current["meta"].get(key)]
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns (rows, regressions): one row per benchmark in both result sets, and the names that regressed."""
+    rows, regressions = [], []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else float('inf')
+        regressed = result["median_s"] > base["median_s"] * (1 + tolerance) + MIN_REGRESSION_S
+        rows.append((name, base["median_s"], result["median_s"], ratio, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+def print_results(results):
+    print(f"\n{'benchmark':<48} {'median_ms':>11} {'min_ms':>11} {'runs':>5}")
+    for name, result in results["results"].items():
+        print(f"{name:<48} {result['median_s'] * 1000:>11.3f} {result['min_s'] * 1000:>11.3f} {result['runs']:>5}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engine on synthetic fleets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=MICRO_SIZES, help="Fleet sizes for the per-phase microbenchmarks")
+    parser.add_argument("--e2e-sizes", type=int, nargs="*", default=END_TO_END_SIZES, help="Fleet sizes for end-to-end runs")
+    parser.add_argument("--days", type=int, default=30, help="Days per end-to-end run (the last days of the month)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, metavar="BASELINE", help="Fail if any benchmark regressed against this results file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {BASELINE_FILE}")
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.e2e_sizes, args.days)
+    print_results(results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatches = machine_mismatches(results, baseline)
+        if mismatches:
+            for key, base_value, current_value in mismatches:
+                print(f"Baseline {key} is {base_value!r}, this machine's is {current_value!r}.")
+            print(f"Not comparing against {args.compare}: it was recorded on another machine. Record a baseline here with --save-baseline.")
+            sys.exit(2)
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print(f"\n{'benchmark':<48} {'baseline_ms':>11} {'current_ms':>11} {'ratio':>7}")
+        for name, base_s, current_s, ratio, regressed in rows:
+            print(f"{name:<48} {base_s * 1000:>11.3f} {current_s * 1000:>11.3f} {ratio:>7.2f}{'  REGRESSED' if regressed else ''}")
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}.")
@@ -1,5 +1,14 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+import sklearn
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.multioutput import MultiOutputRegressor
 import joblib
@@ -7,52 +16,216 @@ import joblib
 # --- 1. Configuration ---
 HISTORICAL_DATA_FILE = "historical_data_retrain.csv"
 MODEL_OUTPUT_FILE = "strategy_model.joblib"
+# Written next to the model: chosen hyperparameters, CV and hold-out errors, timings.
+METADATA_FILE_SUFFIX = ".meta.json"
+# Only strategies that scored above this are learned from.
+SUCCESS_THRESHOLD = 80
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+CV_FOLDS = 5
+# Every combination is cross-validated. The first entry of each list is the
+# original brain_make model (100 fully grown trees).
+PARAM_GRID = {
+    'n_estimators': [100, 50, 25],
+    'max_depth': [None, 12],
+    'min_samples_leaf': [1, 3]
+}
+# A config within this fraction of the best CV error counts as equally good; the
+# one with the fastest single-row prediction among them is chosen.
+DEFAULT_TOLERANCE = 0.02
+# Single-row predictions timed per fitted model (the engine predicts one row per day).
+LATENCY_SAMPLES = 5
+
+def metadata_file(model_file):
+    return os.path.splitext(model_file)[0] + METADATA_FILE_SUFFIX
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 # --- 2. Load and Prepare Data ---
-print(f"Loading historical strategy data from '{HISTORICAL_DATA_FILE}'...")
-try:
-    df = pd.read_csv(HISTORICAL_DATA_FILE)
-except FileNotFoundError:
-    print(f"Error: '{HISTORICAL_DATA_FILE}' not found. Please ensure the file exists.")
-    exit()
-
-# Filter for successful strategies to learn from the best outcomes
-df_successful = df[df['success_score'] > 80].copy()
-print(f"Filtered for successful strategies: {len(df_successful)} data points.")
-
-# Define the features (inputs) and the targets (multiple outputs)
-features = [
-    'total_fleet_size',
-    'target_service_trains',
-    'avg_fleet_health',
-    'is_monsoon',
-    'is_surge'
-]
-# The model will now predict all 5 of these strategic parameters
-targets = [
-    'historical_cost_per_km',
-    'historical_fatigue_factor',
-    'historical_branding_penalty',
-    'historical_target_mileage',
-    'historical_maint_threshold'
-]
-
-X = df_successful[features]
-y = df_successful[targets]
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# --- 3. Train the AI "Strategist" Model ---
-print("\nTraining the AI Strategist model to predict 5 strategic parameters...")
-
-# The MultiOutputRegressor is perfect for this task
-base_model = RandomForestRegressor(n_estimators=100, random_state=42)
-multi_output_model = MultiOutputRegressor(estimator=base_model)
-
-multi_output_model.fit(X_train, y_train)
-print("AI Strategist training complete.")
-
-# --- 4. Save the Trained Model ---
-print(f"\nSaving the trained strategist model to '{MODEL_OUTPUT_FILE}'...")
-joblib.dump(multi_output_model, MODEL_OUTPUT_FILE)
-print("Model saved successfully.")
\ No newline at end of file
+def load_training_data(path=HISTORICAL_DATA_FILE):
+    """Features and targets of the successful historical strategies."""
+    # The file contains '#' section comments between blocks of rows.
+    df = pd.read_csv(path, comment='#')
+    # Filter for successful strategies to learn from the best outcomes
+    df_successful = df[df['success_score'] > SUCCESS_THRESHOLD].copy()
+    print(f"Loaded {len(df)} rows from '{path}'; {len(df_successful)} successful strategies to learn from.")
+    return df_successful[FEATURES], df_successful[TARGETS]
+
+def build_model(params, n_jobs=1):
+    """
+    One forest per target. n_jobs cores are split between the per-target fits and
+    the trees inside each forest.
+    """
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    output_jobs = max(1, min(len(TARGETS), n_jobs))
+    tree_jobs = max(1, n_jobs // output_jobs)
+    base_model = RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=tree_jobs, **params)
+    return MultiOutputRegressor(estimator=base_model, n_jobs=output_jobs)
+
+def for_inference(model):
+    """Single-threaded prediction: the engine predicts one row at a time, where thread pools only add latency."""
+    model.n_jobs = None
+    for estimator in model.estimators_:
+        estimator.n_jobs = None
+    return model
+
+# --- 3. Evaluation ---
+def target_errors(model, X, y):
+    """Per-target MAE, RMSE and R^2 of model on (X, y)."""
+    predicted = model.predict(X)
+    actual = y.to_numpy(dtype=float)
+    errors = {}
+    for i, target in enumerate(TARGETS):
+        residual = predicted[:, i] - actual[:, i]
+        variance = np.var(actual[:, i])
+        errors[target] = {
+            "mae": float(np.mean(np.abs(residual))),
+            "rmse": float(np.sqrt(np.mean(residual ** 2))),
+            "r2": float(1 - np.mean(residual ** 2) / variance) if variance > 0 else None
+        }
+    return errors
+
+def normalized_error(errors, target_scales):
+    """Mean over targets of RMSE divided by the target's spread, so targets of different units weigh the same."""
+    return float(np.mean([errors[target]['rmse'] / target_scales[target] for target in TARGETS]))
+
+def single_row_latency_ms(model, X):
+    row = X.iloc[:1]
+    start = time.perf_counter()
+    for _ in range(LATENCY_SAMPLES):
+        model.predict(row)
+    return (time.perf_counter() - start) / LATENCY_SAMPLES * 1000
+
+def _fit_fold(task):
+    """Process-pool task: fits one config on one CV fold."""
+    params, X, y, train_index, valid_index = task
+    model = build_model(params)
+    start = time.perf_counter()
+    model.fit(X.iloc[train_index], y.iloc[train_index])
+    fit_s = time.perf_counter() - start
+    return {
+        "errors": target_errors(model, X.iloc[valid_index], y.iloc[valid_index]),
+        "fit_s": fit_s,
+        "latency_ms": single_row_latency_ms(model, X.iloc[valid_index])
+    }
+
+def search_hyperparameters(X, y, param_grid=PARAM_GRID, folds=CV_FOLDS, processes=None, tolerance=DEFAULT_TOLERANCE):
+    """
+    k-fold cross-validates every config in param_grid, with each (config, fold)
+    fit as its own task on a process pool. Returns (chosen params, per-config
+    results sorted by CV error).
+    """
+    configs = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE).split(X))
+    tasks = [(params, X, y, train_index, valid_index) for params in configs for train_index, valid_index in splits]
+    target_scales = {target: float(y[target].std()) or 1.0 for target in TARGETS}
+    processes = processes or os.cpu_count()
+
+    print(f"\nCross-validating {len(configs)} configs x {folds} folds on {processes} processes...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        fold_results = list(pool.map(_fit_fold, tasks))
+    print(f"Search finished in {time.perf_counter() - start:.1f}s.")
+
+    results = []
+    for i, params in enumerate(configs):
+        folds_of_config = fold_results[i * folds:(i + 1) * folds]
+        mean_errors = {
+            target: {metric: float(np.mean([r['errors'][target][metric] for r in folds_of_config]))
+                     for metric in ('mae', 'rmse')}
+            for target in TARGETS
+        }
+        results.append({
+            "params": params,
+            "cv_error": normalized_error(mean_errors, target_scales),
+            "cv_target_errors": mean_errors,
+            "fit_s": float(np.mean([r['fit_s'] for r in folds_of_config])),
+            "latency_ms": float(np.mean([r['latency_ms'] for r in folds_of_config]))
+        })
+    results.sort(key=lambda r: r['cv_error'])
+    good_enough = [r for r in results if r['cv_error'] <= results[0]['cv_error'] * (1 + tolerance)]
+    chosen = min(good_enough, key=lambda r: r['latency_ms'])
+    for r in results:
+        marker = "->" if r is chosen else "  "
+        print(f"{marker} {r['params']}: CV error {r['cv_error']:.4f}, fit {r['fit_s']:.2f}s, predict {r['latency_ms']:.2f}ms/row")
+    return chosen['params'], results
+
+# --- 4. Train the AI "Strategist" Model ---
+def train(data_file=HISTORICAL_DATA_FILE, model_file=MODEL_OUTPUT_FILE, search=True, folds=CV_FOLDS, processes=None, tolerance=DEFAULT_TOLERANCE):
+    """Searches (optionally), fits the chosen config on all cores, evaluates on a hold-out split and saves model and metadata."""
+    X, y = load_training_data(data_file)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    if search:
+        params, search_results = search_hyperparameters(X_train, y_train, folds=folds, processes=processes, tolerance=tolerance)
+    else:
+        params, search_results = {name: values[0] for name, values in PARAM_GRID.items()}, []
+
+    print(f"\nTraining the AI Strategist model to predict {len(TARGETS)} strategic parameters with {params}...")
+    multi_output_model = build_model(params, n_jobs=-1)
+    start = time.perf_counter()
+    multi_output_model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+    for_inference(multi_output_model)
+    print(f"AI Strategist training complete in {fit_s:.2f}s.")
+
+    holdout_errors = target_errors(multi_output_model, X_test, y_test)
+    start = time.perf_counter()
+    multi_output_model.predict(X_test)
+    batch_ms = (time.perf_counter() - start) * 1000
+    latency_ms = single_row_latency_ms(multi_output_model, X_test)
+    print("\nHold-out error per target:")
+    for target, errors in holdout_errors.items():
+        r2 = f"{errors['r2']:.3f}" if errors['r2'] is not None else "n/a"
+        print(f"  {target}: MAE {errors['mae']:.3f}, RMSE {errors['rmse']:.3f}, R^2 {r2}")
+    print(f"Inference: {latency_ms:.2f}ms per single row, {batch_ms:.2f}ms for the {len(X_test)}-row hold-out set.")
+
+    # --- 5. Save the Trained Model ---
+    print(f"\nSaving the trained strategist model to '{model_file}'...")
+    # Uncompressed, so the engine can memory-map it.
+    joblib.dump(multi_output_model, model_file)
+    metadata = {
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "model_file": model_file,
+        "model_sha1": file_sha1(model_file),
+        "data_file": data_file,
+        "data_sha1": file_sha1(data_file),
+        "training_rows": len(X_train),
+        "holdout_rows": len(X_test),
+        "features": FEATURES,
+        "targets": TARGETS,
+        "params": params,
+        "cv_folds": folds if search else None,
+        "search_results": search_results,
+        "holdout_errors": holdout_errors,
+        "timings": {"fit_s": round(fit_s, 3), "single_row_predict_ms": round(latency_ms, 3), "holdout_batch_predict_ms": round(batch_ms, 3)},
+        "cpu_count": os.cpu_count(),
+        "sklearn_version": sklearn.__version__
+    }
+    with open(metadata_file(model_file), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Model saved successfully; metadata in '{metadata_file(model_file)}'.")
+    print("Run strategy_grid.py to compile it into the engine's lookup table (the old table is ignored until then).")
+    return multi_output_model, metadata
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the AI Strategist model.")
+    parser.add_argument("--data", default=HISTORICAL_DATA_FILE)
+    parser.add_argument("--output", default=MODEL_OUTPUT_FILE)
+    parser.add_argument("--no-search", action="store_true", help="Skip the hyperparameter search and train the default forest")
+    parser.add_argument("--folds", type=int, default=CV_FOLDS)
+    parser.add_argument("--processes", type=int, default=None, help="Processes for the search (default: all cores)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Prefer the fastest config whose CV error is within this fraction of the best")
+    args = parser.parse_args()
+    if not os.path.exists(args.data):
+        print(f"Error: '{args.data}' not found. Please ensure the file exists.")
+        raise SystemExit(1)
+    train(args.data, args.output, search=not args.no_search, folds=args.folds, processes=args.processes, tolerance=args.tolerance)
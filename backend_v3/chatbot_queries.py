@@ -0,0 +1,133 @@
+import re
+
+# --- 1. QUESTION PARSING ---
+# Factual questions about the log are answered here, deterministically and without
+# the LLM. Anything asking for reasons or advice is left to the model.
+EXPLANATORY_PATTERN = re.compile(r"\b(why|explain|reason|reasons|how come|what if|should|recommend|compare|justify)\b", re.IGNORECASE)
+TRAIN_PATTERN = re.compile(r"\brake[-\s]?(\d+)\b", re.IGNORECASE)
+DAY_RANGE_PATTERN = re.compile(r"\bdays?\s+(\d+)\s*(?:-|–|to|through|until|and)\s*(?:day\s+)?(\d+)\b", re.IGNORECASE)
+DAY_PATTERN = re.compile(r"\bday\s+(\d+)\b", re.IGNORECASE)
+LIST_PATTERN = re.compile(r"\b(which|what|list|show|how many)\b", re.IGNORECASE)
+COUNT_PATTERN = re.compile(r"\bhow many\b", re.IGNORECASE)
+FIELD_PATTERNS = {
+    'status': re.compile(r"\b(status|assigned|assignment|doing|deployed|allocated)\b", re.IGNORECASE),
+    'health_score': re.compile(r"\bhealth\b", re.IGNORECASE),
+    'consecutive_service_days': re.compile(r"\b(consecutive|in a row|streak)\b", re.IGNORECASE),
+    'scenario': re.compile(r"\b(scenario|conditions)\b", re.IGNORECASE)
+}
+# A bare "service" is not a status filter: "consecutive service days" asks for a field.
+STATUS_PATTERNS = {
+    'SERVICE': re.compile(r"\b(in|on) service\b", re.IGNORECASE),
+    'MAINTENANCE': re.compile(r"\b(maintenance|maintained|repair)\b", re.IGNORECASE),
+    'STANDBY': re.compile(r"\b(standby|stand-by|stand by|idle)\b", re.IGNORECASE)
+}
+
+def parse_train_ids(question):
+    """Train IDs mentioned in the question, normalized to the log's "Rake-NN" form, in order of mention."""
+    return list(dict.fromkeys(f"Rake-{int(n):02d}" for n in TRAIN_PATTERN.findall(question)))
+
+def parse_days(question):
+    """The inclusive day range the question asks about, as (first, last), or None if it names no day."""
+    match = DAY_RANGE_PATTERN.search(question)
+    if match:
+        first, last = int(match.group(1)), int(match.group(2))
+        return (min(first, last), max(first, last))
+    match = DAY_PATTERN.search(question)
+    if match:
+        return (int(match.group(1)), int(match.group(1)))
+    return None
+
+def _requested(patterns, question):
+    return [name for name, pattern in patterns.items() if pattern.search(question)]
+
+# --- 2. ANSWERS ---
+def _describe(row, fields):
+    parts = []
+    if 'status' in fields:
+        parts.append(f"**{row['status']}**")
+    if 'health_score' in fields:
+        parts.append(f"health score {row['health_score']:.1f}/100")
+    if 'consecutive_service_days' in fields:
+        parts.append(f"{row['consecutive_service_days']} consecutive service day(s)")
+    if 'scenario' in fields:
+        parts.append(f"scenario {row['scenario']}")
+    return ", ".join(parts)
+
+def _answer_for_trains(log_index, train_ids, days, fields):
+    lines = []
+    for train_id in train_ids:
+        for day in days:
+            row = log_index.row(day, train_id)
+            if row is None:
+                lines.append(f"- No data for {train_id} on Day {day}.")
+            else:
+                lines.append(f"- {train_id} on Day {day}: {_describe(row, fields)}")
+    return "\n".join(lines)
+
+def _count_for_trains(log_index, train_ids, days, statuses):
+    lines = []
+    for train_id in train_ids:
+        rows = [row for row in (log_index.row(day, train_id) for day in days) if row is not None]
+        if not rows:
+            lines.append(f"- No data for {train_id} on Days {days[0]}-{days[-1]}.")
+            continue
+        for status in statuses:
+            count = sum(row['status'] == status for row in rows)
+            lines.append(f"- {train_id}, Days {days[0]}-{days[-1]}: {count} of {len(rows)} day(s) in {status}")
+    return "\n".join(lines)
+
+def _answer_for_statuses(log_index, days, statuses, count_only):
+    lines = []
+    for day in days:
+        by_status = log_index.day_summary(day)["status"]
+        for status in statuses:
+            train_ids = by_status.get(status, [])
+            if count_only:
+                lines.append(f"- Day {day}: {len(train_ids)} train(s) in {status}")
+            else:
+                lines.append(f"- Day {day}, {status} ({len(train_ids)}): {', '.join(train_ids) if train_ids else 'none'}")
+    return "\n".join(lines)
+
+def answer_locally(question, log_index):
+    """
+    Answers a factual question (status, health, consecutive days or scenario of
+    trains on a day or day range, how many days a train spent in a status, or which
+    trains were in a given status) straight
+    from the log index. Returns None when the question needs the LLM.
+    """
+    if EXPLANATORY_PATTERN.search(question):
+        return None
+    day_range = parse_days(question)
+    if day_range is None:
+        return None
+    available_days = log_index.days
+    if not available_days:
+        return None
+    first, last = max(day_range[0], available_days[0]), min(day_range[1], available_days[-1])
+    days = [day for day in range(first, last + 1) if log_index.has_day(day)]
+    if not days:
+        return f"Day {day_range[0]} not found in simulation data. Available days: {available_days[0]}-{available_days[-1]}"
+
+    train_ids = parse_train_ids(question)
+    if train_ids:
+        fields = _requested(FIELD_PATTERNS, question)
+        statuses = _requested(STATUS_PATTERNS, question)
+        if COUNT_PATTERN.search(question) and set(fields) <= {'status'}:
+            # "How many days was Rake-05 in service?" asks for a count, not a per-day listing.
+            return _count_for_trains(log_index, train_ids, days, statuses) if statuses else None
+        if not fields and statuses:
+            # "Was Rake-03 in maintenance on day 13?" asks for its status.
+            fields = ['status']
+        if not fields:
+            return None
+        return _answer_for_trains(log_index, train_ids, days, fields)
+
+    statuses = _requested(STATUS_PATTERNS, question)
+    if any(field in ('health_score', 'consecutive_service_days') for field in _requested(FIELD_PATTERNS, question)):
+        # Health and streak questions need a train, so they go to the LLM rather than a status listing.
+        return None
+    if statuses and LIST_PATTERN.search(question):
+        return _answer_for_statuses(log_index, days, statuses, COUNT_PATTERN.search(question) is not None)
+    if FIELD_PATTERNS['scenario'].search(question):
+        return "\n".join(f"- Day {day}: scenario {log_index.day_summary(day)['scenario']}" for day in days)
+    return None
@@ -1,58 +1,115 @@
+import atexit
 import pandas as pd
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
+import time
 from dotenv import load_dotenv
-import google.generativeai as genai
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 import re # Import the regular expression module
+from chatbot_queries import answer_locally, parse_train_ids
+from model_selector import ModelSelector, DEFAULT_PROBE_TIMEOUT_S, DEFAULT_STATE_FILE
+from response_cache import ResponseCache, cache_key, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S
+from simulation_log_index import SimulationLogIndex
+from simulation_store import STORE_FILE, SimulationStoreReader
+from metrics import Registry, instrument_app
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
 
 # --- Configuration ---
 load_dotenv()
 LOG_FILE = "monthly_simulation_log.csv"  # CSV file with columns: simulation_day,train_id,status,health_score,consecutive_service_days,scenario
+# "store" reads the backend's simulation store, "csv" the converted LOG_FILE; "auto" uses the store once it exists.
+DATA_SOURCE = os.getenv("CHATBOT_DATA_SOURCE", "auto")
 API_KEY = os.getenv("GEMINI_API_KEY")
+# Set CHATBOT_MODEL=local-stub to run without Gemini (offline development and tests).
+LOCAL_STUB_MODEL = "local-stub"
+CHATBOT_MODEL = os.getenv("CHATBOT_MODEL")
+# Model answers are cached per question, day, trains and log version; set CHATBOT_CACHE_FILE to keep them across restarts.
+CACHE_MAX_ENTRIES = int(os.getenv("CHATBOT_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+CACHE_TTL_S = float(os.getenv("CHATBOT_CACHE_TTL_S", DEFAULT_TTL_S))
+CACHE_FILE = os.getenv("CHATBOT_CACHE_FILE")
+# "background" (default) binds the port at once and selects the model in a background thread,
+# "lazy" selects it on the first question that needs it, "eager" blocks startup until it is selected.
+MODEL_STARTUP = os.getenv("CHATBOT_MODEL_STARTUP", "background")
+MODEL_PROBE_TIMEOUT_S = float(os.getenv("CHATBOT_MODEL_PROBE_TIMEOUT_S", DEFAULT_PROBE_TIMEOUT_S))
+MODEL_STATE_FILE = os.getenv("CHATBOT_MODEL_STATE_FILE", DEFAULT_STATE_FILE)
+# How long a question that needs the model waits for a selection still in progress.
+ASK_MODEL_WAIT_S = float(os.getenv("CHATBOT_ASK_MODEL_WAIT_S", 15))
 
 # --- We need the simulation parameters to calculate pace ---
 SIMULATION_START_DATE = datetime(2025, 9, 1)
 SIMULATION_MONTH_DAYS = 30
 DAILY_HOURS_PER_TRAIN = 16
 
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY not found. Please create a .env file with your key.")
+class LocalStubModel:
+    """
+    Deterministic stand-in for a Gemini model: generate_content echoes the analysis
+    section of the prompt instead of calling the API.
+    """
+    model_name = LOCAL_STUB_MODEL
 
-genai.configure(api_key=API_KEY)
+    def generate_content(self, prompt):
+        analysis = prompt.split("**Detailed Analysis:**", 1)[-1].split("**Decision Logic Guidelines:**", 1)[0]
+        return SimpleNamespace(text=f"[{LOCAL_STUB_MODEL}] {analysis.strip()}")
 
-# Try Gemini 2.5 Pro with fallback
-def get_model():
-    model_names = [
-        'gemini-2.0-flash-exp',  # Latest Gemini 2.0 flash experimental
-        'gemini-exp-1206',       # Gemini 2.5 Pro experimental
-        'gemini-1.5-pro-latest', # Latest 1.5 Pro
-        'gemini-1.5-pro',        # Standard 1.5 Pro
-        'gemini-1.5-flash'       # Fallback flash model
-    ]
-    
-    for model_name in model_names:
-        try:
-            model = genai.GenerativeModel(model_name)
-            # Test the model with a simple query
-            test_response = model.generate_content("Hello")
-            print(f"✅ Successfully connected to model: {model_name}")
-            return model
-        except Exception as e:
-            print(f"❌ Model {model_name} failed: {str(e)}")
-            continue
-    
-    return None
+# Try Gemini 2.5 Pro with fallback, most preferred first
+MODEL_CANDIDATES = [
+    'gemini-2.0-flash-exp',  # Latest Gemini 2.0 flash experimental
+    'gemini-exp-1206',       # Gemini 2.5 Pro experimental
+    'gemini-1.5-pro-latest', # Latest 1.5 Pro
+    'gemini-1.5-pro',        # Standard 1.5 Pro
+    'gemini-1.5-flash'       # Fallback flash model
+]
 
-model = get_model()
-if not model:
-    print("❌ Could not connect to any Gemini model. Please check your API key and model availability.")
-    raise ValueError("No available Gemini model found")
+def create_model_selector():
+    """Selector for the configured model; setting CHATBOT_MODEL to a Gemini model name skips the fallbacks."""
+    if CHATBOT_MODEL == LOCAL_STUB_MODEL:
+        print(f"Using the {LOCAL_STUB_MODEL} model; LLM questions are answered with the prompt's own analysis.")
+        return ModelSelector.fixed(LocalStubModel(), LOCAL_STUB_MODEL)
+    if genai is None:
+        return ModelSelector.failed("google-generativeai is not installed. Install it or set CHATBOT_MODEL=local-stub.")
+    if not API_KEY:
+        return ModelSelector.failed("GEMINI_API_KEY not found. Please create a .env file with your key.")
+    genai.configure(api_key=API_KEY)
+    candidates = [CHATBOT_MODEL] if CHATBOT_MODEL else MODEL_CANDIDATES
+    return ModelSelector(candidates, genai.GenerativeModel, MODEL_PROBE_TIMEOUT_S, MODEL_STATE_FILE)
+
+MODEL_SELECTOR = create_model_selector()
+if MODEL_STARTUP == "eager":
+    if MODEL_SELECTOR.get() is None:
+        print("❌ Could not connect to any Gemini model. Please check your API key and model availability.")
+        raise ValueError(MODEL_SELECTOR.error or "No available Gemini model found")
+elif MODEL_STARTUP == "background":
+    MODEL_SELECTOR.start()
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from your React frontend
 
+# --- Metrics (Prometheus text format at /metrics) ---
+METRICS = Registry()
+instrument_app(app, METRICS, "kronos_chatbot")
+LLM_LATENCY = METRICS.histogram("kronos_llm_call_duration_seconds", "Latency of generate_content calls.", ("model", "outcome"))
+ANSWERS = METRICS.counter("kronos_chatbot_answers_total", "Answers by where they came from.", ("source",))
+
+# The store is written by the simulation backend as it runs, and every write bumps its version,
+# so reruns are visible on the next question. The CSV index is loaded on the first question and
+# re-read only when the file changes.
+STORE_READER = SimulationStoreReader(STORE_FILE)
+LOG_INDEX = SimulationLogIndex(LOG_FILE)
+
+def current_log_index():
+    if DATA_SOURCE == "store" or (DATA_SOURCE == "auto" and os.path.exists(STORE_FILE)):
+        return STORE_READER
+    return LOG_INDEX
+RESPONSE_CACHE = ResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL_S, CACHE_FILE)
+# Answers are saved in the background; write the last ones on the way out.
+atexit.register(RESPONSE_CACHE.flush)
+
 # --- Helper Functions ---
 
 def extract_day_from_question(question, default_day=15):
@@ -65,22 +122,24 @@ def extract_day_from_question(question, default_day=15):
         return int(match.group(1))
     return default_day
 
-def get_context_for_query(log_df, day, train_ids):
+def get_context_for_query(log_index, day, train_ids):
     """
-    Finds the relevant rows and creates a rich summary for the AI.
+    Finds the relevant rows in the log index and creates a rich summary for the AI.
     Expected CSV columns: simulation_day,train_id,status,health_score,consecutive_service_days,scenario
     """
-    # Filter data for the specific day and train IDs
-    context_df = log_df[(log_df['simulation_day'] == day) & (log_df['train_id'].isin(train_ids))]
+    # Look up the specific day and train IDs
+    context_rows = log_index.rows_for(day, train_ids)
     
-    if context_df.empty:
+    if not context_rows:
         return "No data found for the specified trains on that day.", ""
     
-    # Create a detailed summary string for each train to help the AI understand "why"
-    context_summary = ""
+    # Start with the fleet-wide picture for the day, already grouped by the index
+    day_summary = log_index.day_summary(day)
+    status_counts = ", ".join(f"{status} {len(ids)}" for status, ids in day_summary["status"].items())
+    context_summary = f"\n- Day {day} fleet allocation: {status_counts} (scenario {day_summary['scenario']})\n"
     detailed_data = []
     
-    for _, row in context_df.iterrows():
+    for row in context_rows:
         train_id = row['train_id']
         status = row['status']
         health_score = row['health_score']
@@ -135,17 +194,27 @@ def get_context_for_query(log_df, day, train_ids):
 def health_check():
     """Check if the chatbot service is healthy"""
     try:
-        if not model:
-            return jsonify({"status": "unhealthy", "message": "AI model not initialized"}), 503
+        model_status = MODEL_SELECTOR.status()
+        if model_status["state"] == "failed":
+            return jsonify({"status": "unhealthy", "message": model_status["error"], "model": model_status}), 503
+        if model_status["state"] == "probing":
+            return jsonify({"status": "starting", "message": "Selecting the AI model", "model": model_status}), 503
         
-        # Test if CSV file exists
-        if not os.path.exists(LOG_FILE):
+        # Test if the simulation data exists
+        data_file = STORE_FILE if current_log_index() is STORE_READER else LOG_FILE
+        if not os.path.exists(data_file):
             return jsonify({"status": "unhealthy", "message": "Simulation data not found"}), 503
         
-        return jsonify({"status": "healthy", "message": "RakeAssist AI is ready"})
+        # "idle" means lazy startup: the model is selected by the first question that needs it
+        return jsonify({"status": "healthy", "message": "RakeAssist AI is ready", "model": model_status})
     except Exception as e:
         return jsonify({"status": "unhealthy", "message": str(e)}), 503
 
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters and size of the model response cache"""
+    return jsonify(RESPONSE_CACHE.stats())
+
 # --- The Main API Endpoint ---
 @app.route('/ask', methods=['POST'])
 def ask_rake_assist():
@@ -156,32 +225,54 @@ def ask_rake_assist():
         return jsonify({"error": "No question provided."}), 400
 
     try:
-        log_df = pd.read_csv(LOG_FILE)
-        # Ensure we have the expected columns
-        required_columns = ['simulation_day', 'train_id', 'status', 'health_score', 'consecutive_service_days', 'scenario']
-        missing_columns = [col for col in required_columns if col not in log_df.columns]
-        if missing_columns:
-            return jsonify({"error": f"Missing required columns in CSV: {missing_columns}"}), 500
+        # Picks up new simulation data only if it changed since the last question
+        log_index = current_log_index().refresh()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 500
     except FileNotFoundError:
-        return jsonify({"error": f"Log file '{LOG_FILE}' not found. Please ensure the simulation data is available."}), 500
+        return jsonify({"error": "Simulation data not found. Run a simulation (or convert the log to '" + LOG_FILE + "') first."}), 500
     except Exception as e:
         return jsonify({"error": f"Error reading CSV file: {str(e)}"}), 500
 
+    # Factual questions (status, health, which trains were in maintenance, ...) are answered from the log directly
+    local_answer = answer_locally(user_question, log_index)
+    if local_answer is not None:
+        ANSWERS.inc(source="local")
+        return jsonify({"answer": local_answer, "source": "local"})
+
     # Extract the day from the question
     simulation_day = extract_day_from_question(user_question)
     
     # Find mentioned train IDs in the question
-    mentioned_train_ids = [word for word in user_question.replace(",", " ").split() if 'Rake-' in word]
+    mentioned_train_ids = parse_train_ids(user_question)
     if not mentioned_train_ids:
         return jsonify({"answer": "Please mention a specific train ID (e.g., Rake-03) in your question to get detailed information."})
 
     # Validate that the requested day exists in the data
-    available_days = sorted(log_df['simulation_day'].unique())
-    if simulation_day not in available_days:
+    available_days = log_index.days
+    if not available_days:
+        return jsonify({"answer": "No simulation data found. Run a simulation first."})
+    if not log_index.has_day(simulation_day):
         return jsonify({"answer": f"Day {simulation_day} not found in simulation data. Available days: {min(available_days)}-{max(available_days)}"})
 
+    model = MODEL_SELECTOR.get(timeout=ASK_MODEL_WAIT_S)
+    if not model:
+        if MODEL_SELECTOR.state == "probing":
+            return jsonify({"answer": "The AI model is still starting up. Please try again in a few seconds."}), 503
+        return jsonify({"answer": "Sorry, the AI model is not available right now. Please check the server logs for model initialization errors."}), 503
+    model_name = MODEL_SELECTOR.model_name
+
+    # A repeat of an answered question on unchanged data is served from the cache.
+    # The selected model's name is part of the version so switching models never returns the other model's answers.
+    RESPONSE_CACHE.sync_version(f"{log_index.data_version}:{model_name}")
+    answer_key = cache_key(user_question, simulation_day, mentioned_train_ids, log_index.data_version)
+    cached_answer = RESPONSE_CACHE.get(answer_key)
+    if cached_answer is not None:
+        ANSWERS.inc(source="cache")
+        return jsonify({"answer": cached_answer, "source": "cache"})
+
     # Get context for the specific trains and day
-    context_data, context_summary = get_context_for_query(log_df, simulation_day, mentioned_train_ids)
+    context_data, context_summary = get_context_for_query(log_index, simulation_day, mentioned_train_ids)
     days_remaining = SIMULATION_MONTH_DAYS - simulation_day + 1
 
     # Enhanced AI prompt for better analysis
@@ -227,18 +318,25 @@ def ask_rake_assist():
     """
 
     try:
-        if not model:
-            return jsonify({"answer": "Sorry, the AI model is not available right now. Please check the server logs for model initialization errors."}), 503
-        
-        response = model.generate_content(prompt)
-        ai_answer = response.text
-        return jsonify({"answer": ai_answer})
+        call_start = time.perf_counter()
+        try:
+            response = model.generate_content(prompt)
+            ai_answer = response.text
+        except Exception:
+            LLM_LATENCY.observe(time.perf_counter() - call_start, model=model_name, outcome="error")
+            raise
+        LLM_LATENCY.observe(time.perf_counter() - call_start, model=model_name, outcome="ok")
+        RESPONSE_CACHE.put(answer_key, ai_answer)
+        ANSWERS.inc(source="llm")
+        return jsonify({"answer": ai_answer, "source": "llm"})
     except Exception as e:
         error_msg = str(e)
         print(f"Error calling Gemini API: {error_msg}")
         
         # Provide more specific error messages
         if "404" in error_msg or "not found" in error_msg.lower():
+            # The selected model may have been retired: pick another one for the next question
+            MODEL_SELECTOR.report_failure(model_name)
             return jsonify({"answer": "The AI model is temporarily unavailable. This might be due to API quota limits or model availability. Please try again later or contact your administrator."}), 503
         elif "quota" in error_msg.lower() or "limit" in error_msg.lower():
             return jsonify({"answer": "API quota exceeded. Please check your Google AI Studio quota or try again later."}), 429
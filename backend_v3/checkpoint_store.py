@@ -0,0 +1,96 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# --- 1. CONFIGURATION ---
+# One columnar .npz snapshot of fleet_status_after per simulated day, plus a
+# small manifest that records which days exist and the plan chosen on each.
+CHECKPOINT_DIR = "checkpoints"
+MANIFEST_FILE = "manifest.json"
+
+def _checkpoint_file(day):
+    return f"day_{int(day):03d}.npz"
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+def load_manifest(checkpoint_dir=CHECKPOINT_DIR):
+    manifest_path = os.path.join(checkpoint_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {"days": {}}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# --- 2. READ / WRITE ---
+def save_checkpoints(log_entries, checkpoint_dir=CHECKPOINT_DIR):
+    """Writes the fleet_status_after snapshot of each log entry and updates the manifest once."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest = load_manifest(checkpoint_dir)
+    for entry in log_entries:
+        fleet_df = pd.DataFrame(entry['fleet_status_after'])
+        columns = {}
+        for col in fleet_df.columns:
+            values = fleet_df[col].to_numpy()
+            # Strings are stored as fixed-width unicode so the file loads without pickle.
+            columns[col] = values.astype(str) if values.dtype == object else values
+        file_name = _checkpoint_file(entry['day'])
+        tmp_path = os.path.join(checkpoint_dir, f"{file_name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(tmp_path, os.path.join(checkpoint_dir, file_name))
+        manifest["days"][str(entry['day'])] = {
+            "file": file_name,
+            "columns": list(fleet_df.columns),
+            "plan": entry.get('plan')
+        }
+    _write_json_atomic(os.path.join(checkpoint_dir, MANIFEST_FILE), manifest)
+
+def load_checkpoint(day, checkpoint_dir=CHECKPOINT_DIR):
+    """Returns (fleet_df, plan) for the end of `day`, or (None, None) if no checkpoint exists."""
+    record = load_manifest(checkpoint_dir)["days"].get(str(day))
+    if record is None:
+        return None, None
+    with np.load(os.path.join(checkpoint_dir, record["file"])) as arrays:
+        fleet_df = pd.DataFrame({col: arrays[col] for col in record["columns"]})
+    return fleet_df, record["plan"]
+
+def truncate_checkpoints(from_day, checkpoint_dir=CHECKPOINT_DIR):
+    """Drops every checkpoint for day >= from_day."""
+    manifest = load_manifest(checkpoint_dir)
+    stale_days = [d for d in manifest["days"] if int(d) >= from_day]
+    if not stale_days:
+        return
+    for d in stale_days:
+        file_path = os.path.join(checkpoint_dir, manifest["days"].pop(d)["file"])
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    _write_json_atomic(os.path.join(checkpoint_dir, MANIFEST_FILE), manifest)
+
+def backup_checkpoints(from_day, checkpoint_dir=CHECKPOINT_DIR):
+    """The manifest record and file bytes of every checkpoint for day >= from_day, for restore_checkpoints."""
+    backup = {}
+    for d, record in load_manifest(checkpoint_dir)["days"].items():
+        file_path = os.path.join(checkpoint_dir, record["file"])
+        if int(d) >= from_day and os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                backup[d] = {"record": record, "data": f.read()}
+    return backup
+
+def restore_checkpoints(from_day, backup, checkpoint_dir=CHECKPOINT_DIR):
+    """Replaces every checkpoint for day >= from_day with those saved by backup_checkpoints."""
+    truncate_checkpoints(from_day, checkpoint_dir)
+    if not backup:
+        return
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest = load_manifest(checkpoint_dir)
+    for d, saved in backup.items():
+        tmp_path = os.path.join(checkpoint_dir, f"{saved['record']['file']}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(saved["data"])
+        os.replace(tmp_path, os.path.join(checkpoint_dir, saved["record"]["file"]))
+        manifest["days"][d] = saved["record"]
+    _write_json_atomic(os.path.join(checkpoint_dir, MANIFEST_FILE), manifest)
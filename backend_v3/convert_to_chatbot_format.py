@@ -1,73 +1,99 @@
-import json
-import pandas as pd
+import argparse
+import csv
 import os
+from log_store import LOG_DIR, LEGACY_MASTER_LOG_FILE, log_exists, iter_log
 
-def convert_json_to_csv():
-    """Convert simulation_log_master.json to monthly_simulation_log.csv format for chatbot"""
-    
-    # Input and output paths
-    json_file = "simulation_log_master.json"
-    csv_file = "monthly_simulation_log.csv"
-    
-    if not os.path.exists(json_file):
-        print(f"Error: {json_file} not found")
-        return
-    
-    # Load the JSON data
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Convert to the format expected by the chatbot
+CSV_FILE = "monthly_simulation_log.csv"
+CSV_COLUMNS = ['simulation_day', 'train_id', 'status', 'health_score', 'consecutive_service_days', 'scenario']
+# consecutive_service_days counts at most this many previous days
+MAX_LOOKBACK_DAYS = 10
+
+def chatbot_rows(day_entry, streaks):
+    """
+    The chatbot rows (in CSV_COLUMNS order) for one logged day. streaks maps each
+    train to its service streak up to the day before; returns (rows, streaks
+    including this day).
+    """
+    day = day_entry['day']
+    scenario = day_entry.get('scenario', 'NORMAL')
+    plan = day_entry.get('plan', {})
+    # Health scores after the day's updates
+    health_lookup = {train.get('train_id', ''): train.get('health_score', 0) for train in day_entry.get('fleet_status_after', [])}
     rows = []
-    
-    for day_entry in data:
-        day = day_entry['day']
-        scenario = day_entry.get('scenario', 'NORMAL')
-        
-        # Get the plan assignments
-        plan = day_entry.get('plan', {})
-        
-        # Get fleet status after (which contains health scores)
-        fleet_status = day_entry.get('fleet_status_after', [])
-        
-        # Create a lookup for health scores
-        health_lookup = {}
-        for train in fleet_status:
-            train_id = train.get('train_id', '')
-            health_lookup[train_id] = train.get('health_score', 0)
-        
-        # Process each assignment category
-        for status, train_ids in plan.items():
-            if isinstance(train_ids, list):
-                for train_id in train_ids:
-                    # Calculate consecutive service days (simplified)
-                    consecutive_days = 0
-                    if status == 'SERVICE':
-                        # Look back through previous days to count consecutive service
-                        for prev_day in range(max(1, day-10), day):
-                            prev_entry = next((d for d in data if d['day'] == prev_day), None)
-                            if prev_entry and train_id in prev_entry.get('plan', {}).get('SERVICE', []):
-                                consecutive_days += 1
-                            else:
-                                break
-                    
-                    row = {
-                        'simulation_day': day,
-                        'train_id': train_id,
-                        'status': status,
-                        'health_score': health_lookup.get(train_id, 100),
-                        'consecutive_service_days': consecutive_days,
-                        'scenario': scenario
-                    }
-                    rows.append(row)
-    
-    # Create DataFrame and save to CSV
-    df = pd.DataFrame(rows)
-    df.to_csv(csv_file, index=False)
-    
-    print(f"✅ Converted {json_file} to {csv_file}")
-    print(f"📊 Generated {len(rows)} records for {len(df['simulation_day'].unique())} days")
-    print(f"🚂 Covering {len(df['train_id'].unique())} unique trains")
+    for status, train_ids in plan.items():
+        if not isinstance(train_ids, list):
+            continue
+        for train_id in train_ids:
+            consecutive_days = min(streaks.get(train_id, 0), MAX_LOOKBACK_DAYS) if status == 'SERVICE' else 0
+            rows.append([day, train_id, status, health_lookup.get(train_id, 100), consecutive_days, scenario])
+    service = plan.get('SERVICE', [])
+    return rows, {train_id: streaks.get(train_id, 0) + 1 for train_id in service} if isinstance(service, list) else {}
+
+def _copy_prefix(csv_file, from_day, writer):
+    """Copies the rows of days before from_day from an existing CSV. Returns the number of rows copied."""
+    if not os.path.exists(csv_file):
+        return 0
+    copied = 0
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        if next(reader, None) != CSV_COLUMNS:
+            return 0
+        for row in reader:
+            # The CSV is written in day order, so the prefix ends at the first day >= from_day
+            if int(row[0]) >= from_day:
+                break
+            writer.writerow(row)
+            copied += 1
+    return copied
+
+def convert_json_to_csv(from_day=None, csv_file=CSV_FILE, log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE):
+    """
+    Convert the simulation master log to monthly_simulation_log.csv format for chatbot.
+    Streams the log one day at a time, keeping a running service streak per train.
+    With from_day, only days >= from_day are regenerated and the existing rows for
+    earlier days are kept (e.g. after /rerun_from_day).
+    """
+    if not log_exists(log_dir, legacy_file):
+        print(f"Error: no simulation log found in {log_dir}/")
+        return
+
+    # The streak of the first regenerated day depends on up to MAX_LOOKBACK_DAYS days before it
+    warmup_start = max(1, from_day - MAX_LOOKBACK_DAYS) if from_day else None
+    # Service streak of each train up to (and including) previous_day
+    streaks = {}
+    previous_day = None
+    rows_written = 0
+    days, trains = set(), set()
+
+    tmp_file = f"{csv_file}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        prefix_rows = _copy_prefix(csv_file, from_day, writer) if from_day else 0
+
+        for day_entry in iter_log(log_dir, legacy_file, start_day=warmup_start):
+            day = day_entry['day']
+            if previous_day != day - 1:
+                # A gap in the log breaks every streak
+                streaks = {}
+            rows, streaks = chatbot_rows(day_entry, streaks)
+            if from_day is None or day >= from_day:
+                writer.writerows(rows)
+                rows_written += len(rows)
+                trains.update(row[1] for row in rows)
+                days.add(day)
+            previous_day = day
+    os.replace(tmp_file, csv_file)
+
+    if from_day:
+        print(f"✅ Regenerated days >= {from_day} of {csv_file} (kept {prefix_rows} earlier records)")
+    else:
+        print(f"✅ Converted simulation log to {csv_file}")
+    print(f"📊 Generated {rows_written} records for {len(days)} days")
+    print(f"🚂 Covering {len(trains)} unique trains")
 
 if __name__ == "__main__":
-    convert_json_to_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert the simulation log to the chatbot's CSV format.")
+    parser.add_argument("--from-day", type=int, default=None, help="Only regenerate days >= this day, keeping earlier rows")
+    args = parser.parse_args()
+    convert_json_to_csv(from_day=args.from_day)
@@ -0,0 +1,68 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+from answer_final import SIMULATION_START_DATE
+
+# --- 1. CONFIGURATION ---
+# Defaults resemble fleet_data.csv; every draw comes from one seeded generator, so
+# the same arguments always give the same fleet.
+DEFAULT_EXPIRY_OFFSET_DAYS = (-20, 400)
+DEFAULT_OPEN_JOB_CARD_RATIO = 0.3
+DEFAULT_PRIORITY_MIX = {'NONE': 0.7, 'LOW': 0.15, 'MEDIUM': 0.1, 'CRITICAL': 0.05}
+DEFAULT_BRANDING_RATIO = 0.3
+DEFAULT_BRAKE_MODELS = ('ElectroBrake_v2', 'HydroMech_v1')
+FLEET_STATUS_COLUMNS = ['train_id', 'cert_telecom_expiry', 'job_card_status', 'job_card_priority', 'branding_sla_active',
+                        'current_km', 'last_cleaned_date', 'stabling_shunt_moves', 'target_hours', 'brake_model',
+                        'bogie_last_service_km', 'current_hours', 'consecutive_service_days',
+                        'total_service_days_month', 'total_maintenance_days_month']
+
+def generate_fleet(n_rakes, seed=42, expiry_offset_days=DEFAULT_EXPIRY_OFFSET_DAYS, open_job_card_ratio=DEFAULT_OPEN_JOB_CARD_RATIO,
+                   priority_mix=DEFAULT_PRIORITY_MIX, branding_ratio=DEFAULT_BRANDING_RATIO, brake_models=DEFAULT_BRAKE_MODELS,
+                   brake_model_weights=None):
+    """
+    A fleet_status-shaped DataFrame of n_rakes synthetic rakes.
+
+    expiry_offset_days: (low, high) range of certificate expiry dates, in days
+        from the simulation start; a negative low gives already-expired rakes.
+    open_job_card_ratio: share of rakes with an OPEN job card.
+    priority_mix: {priority: probability} of job-card priorities.
+    branding_ratio: share of rakes under a branding SLA (these get target_hours).
+    brake_models / brake_model_weights: brake models to draw from (uniformly by default).
+    """
+    rng = np.random.default_rng(seed)
+    current_km = rng.integers(45000, 65000, n_rakes)
+    branding = rng.random(n_rakes) < branding_ratio
+    expiry = pd.Timestamp(SIMULATION_START_DATE) + pd.to_timedelta(rng.integers(*expiry_offset_days, n_rakes), unit="D")
+    fleet = pd.DataFrame({
+        'train_id': [f"Rake-{i:04d}" for i in range(1, n_rakes + 1)],
+        'cert_telecom_expiry': expiry.strftime('%Y-%m-%d'),
+        'job_card_status': np.where(rng.random(n_rakes) < open_job_card_ratio, 'OPEN', 'CLOSED'),
+        'job_card_priority': rng.choice(list(priority_mix), n_rakes, p=list(priority_mix.values())),
+        'branding_sla_active': branding,
+        'current_km': current_km,
+        'brake_model': rng.choice(list(brake_models), n_rakes, p=brake_model_weights),
+        'bogie_last_service_km': current_km - rng.integers(0, 30000, n_rakes),
+        'target_hours': np.where(branding, rng.integers(40, 120, n_rakes), 0).astype(float),
+        'current_hours': np.where(branding, rng.integers(0, 40, n_rakes), 0).astype(float),
+        'consecutive_service_days': rng.integers(0, 5, n_rakes),
+    })
+    cleaned = pd.Timestamp(SIMULATION_START_DATE) + pd.to_timedelta(rng.integers(0, 30, n_rakes), unit="D")
+    fleet['last_cleaned_date'] = cleaned.strftime('%Y-%m-%d')
+    fleet['stabling_shunt_moves'] = 0
+    fleet['total_service_days_month'] = 0
+    fleet['total_maintenance_days_month'] = 0
+    return fleet[FLEET_STATUS_COLUMNS]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic fleet_status-shaped CSV.")
+    parser.add_argument("rakes", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--branding-ratio", type=float, default=DEFAULT_BRANDING_RATIO)
+    parser.add_argument("--open-job-card-ratio", type=float, default=DEFAULT_OPEN_JOB_CARD_RATIO)
+    parser.add_argument("--expiry-offset-days", type=int, nargs=2, default=DEFAULT_EXPIRY_OFFSET_DAYS, metavar=("LOW", "HIGH"))
+    parser.add_argument("--output", default="synthetic_fleet_status.csv")
+    args = parser.parse_args()
+    generate_fleet(args.rakes, args.seed, tuple(args.expiry_offset_days), args.open_job_card_ratio,
+                   branding_ratio=args.branding_ratio).to_csv(args.output, index=False)
+    print(f"Wrote {args.rakes} synthetic rakes to {args.output}")
@@ -0,0 +1,172 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import joblib
+import pandas as pd
+
+from brain_make import FEATURES, TARGETS, MODEL_OUTPUT_FILE, metadata_file, file_sha1
+from log_store import LOG_DIR, LEGACY_MASTER_LOG_FILE, iter_log
+from strategy_grid import GRID_FILE
+
+# --- 1. CONFIGURATION ---
+# Append-only: one row per logged day, never rewritten. Reruns only add the days that changed.
+TRAINING_STORE_FILE = "strategy_training_log.csv"
+STORE_COLUMNS = ['row_key', 'recorded_at', 'day', 'scenario', *FEATURES, *TARGETS, 'cost', 'solver_status']
+# Log entry ai_strategy keys, in TARGETS order.
+STRATEGY_KEYS = ['cost_per_km', 'fatigue_factor', 'branding_penalty', 'target_mileage', 'maint_threshold']
+# Trees added to each per-target forest per update, and the most each forest keeps
+# (the oldest trees are dropped first) so prediction cost stays bounded.
+TREES_PER_UPDATE = 10
+MAX_TREES = 300
+# Fewer new successful rows than this and the update is skipped.
+MIN_NEW_ROWS = 5
+# Like brain_make's success_score filter: a logged day counts as a successful
+# strategy when it was solved and cost no more than this quantile of the costs
+# recorded for its scenario.
+SUCCESS_COST_QUANTILE = 0.5
+SOLVED_STATUSES = ('OPTIMAL', 'FEASIBLE')
+
+# --- 2. TRAINING STORE ---
+def _row_key(entry):
+    payload = json.dumps([entry['day'], entry.get('scenario'), entry['feature_values'], entry['ai_strategy'], entry['cost']])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+def log_rows(log_entries):
+    """Training rows (dicts with STORE_COLUMNS) for the log entries that carry a strategy and a cost."""
+    recorded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    rows = []
+    for entry in log_entries:
+        if not entry.get('feature_values') or not entry.get('ai_strategy') or entry.get('cost') is None:
+            continue
+        features = dict(zip(entry['feature_names'], entry['feature_values']))
+        row = {'row_key': _row_key(entry), 'recorded_at': recorded_at, 'day': entry['day'],
+               'scenario': entry.get('scenario', 'NORMAL'), 'cost': entry['cost'], 'solver_status': entry.get('solver_status', '')}
+        row.update({name: features[name] for name in FEATURES})
+        row.update({target: entry['ai_strategy'][key] for target, key in zip(TARGETS, STRATEGY_KEYS)})
+        rows.append(row)
+    return rows
+
+def _stored_keys(store_file):
+    if not os.path.exists(store_file):
+        return set()
+    with open(store_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return {row[0] for row in reader if row}
+
+def append_log(log_entries, store_file=TRAINING_STORE_FILE):
+    """Appends the entries' training rows that are not stored yet. Returns the number of rows added."""
+    known = _stored_keys(store_file)
+    rows = [row for row in log_rows(log_entries) if row['row_key'] not in known]
+    if not rows:
+        return 0
+    new_file = not os.path.exists(store_file)
+    with open(store_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=STORE_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+def successful_rows(store):
+    """The stored rows that count as successful strategies (see SUCCESS_COST_QUANTILE)."""
+    solved = store[store['solver_status'].isin(SOLVED_STATUSES)]
+    threshold = solved.groupby('scenario')['cost'].transform(lambda costs: costs.quantile(SUCCESS_COST_QUANTILE))
+    return solved[solved['cost'] <= threshold]
+
+# --- 3. INCREMENTAL UPDATE ---
+def grow_forests(model, X, y, trees=TREES_PER_UPDATE, max_trees=MAX_TREES):
+    """
+    Adds `trees` trees fitted on (X, y) to each per-target forest with warm_start;
+    the existing trees are kept as they are. Returns the number of trees dropped
+    to stay within max_trees.
+    """
+    dropped = 0
+    for forest, target in zip(model.estimators_, TARGETS):
+        forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + trees)
+        forest.fit(X, y[target])
+        forest.set_params(warm_start=False)
+        excess = len(forest.estimators_) - max_trees
+        if excess > 0:
+            forest.estimators_ = forest.estimators_[excess:]
+            forest.n_estimators = len(forest.estimators_)
+            dropped += excess
+    return dropped
+
+def _save_atomically(model, model_file):
+    # A running backend reloads the model when the file changes; it must never see half a file.
+    tmp_file = f"{model_file}.tmp"
+    joblib.dump(model, tmp_file)
+    os.replace(tmp_file, model_file)
+
+def _recompile_grid(model, model_file, grid_file):
+    from strategy_grid import CompiledStrategist, compile_strategist
+    from answer_final import SCENARIO_MODIFIERS
+    previous = CompiledStrategist.load(grid_file)
+    fleet_sizes = sorted({key[0] for key in previous.keys})
+    compiled = compile_strategist(model, fleet_sizes, SCENARIO_MODIFIERS, previous.mode,
+                                  previous.health_resolution, source_model_file=model_file)
+    compiled.save(grid_file)
+
+def update_strategist(model_file=MODEL_OUTPUT_FILE, store_file=TRAINING_STORE_FILE, trees=TREES_PER_UPDATE, grid_file=GRID_FILE):
+    """
+    Grows the saved strategist with the successful store rows it has not learned
+    from yet, then saves it (and recompiles the lookup grid, if there is one).
+    Which rows were learned is tracked in the model's metadata file. Returns a
+    summary dict; "updated" is False when there was too little new data.
+    """
+    if not os.path.exists(store_file):
+        return {"updated": False, "reason": f"No training store {store_file} yet."}
+    meta_file = metadata_file(model_file)
+    metadata = {}
+    if os.path.exists(meta_file):
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    incremental = metadata.setdefault("incremental", {"rows_learned": 0, "updates": []})
+
+    store = pd.read_csv(store_file)
+    # Success is judged against the whole store, not just the new rows.
+    new_rows = successful_rows(store).loc[lambda df: df.index >= incremental["rows_learned"]]
+    if len(new_rows) < MIN_NEW_ROWS:
+        return {"updated": False, "reason": f"{len(new_rows)} new successful rows (need {MIN_NEW_ROWS}).",
+                "store_rows": len(store), "rows_learned": incremental["rows_learned"]}
+
+    start = time.perf_counter()
+    model = joblib.load(model_file)
+    dropped = grow_forests(model, new_rows[FEATURES], new_rows[TARGETS], trees)
+    fit_s = time.perf_counter() - start
+    _save_atomically(model, model_file)
+    if grid_file and os.path.exists(grid_file):
+        _recompile_grid(model, model_file, grid_file)
+
+    update = {
+        "at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "new_rows": len(new_rows),
+        "trees_added": trees,
+        "trees_dropped": dropped,
+        "trees_per_target": [len(forest.estimators_) for forest in model.estimators_],
+        "fit_s": round(fit_s, 3),
+        "total_s": round(time.perf_counter() - start, 3)
+    }
+    incremental["rows_learned"] = len(store)
+    incremental["updates"].append(update)
+    metadata["model_sha1"] = file_sha1(model_file)
+    with open(meta_file, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Strategist grown by {trees} trees per target from {len(new_rows)} new rows in {update['total_s']}s.")
+    return {"updated": True, **update}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn from completed simulations: record the master log and grow the strategist.")
+    parser.add_argument("--model", default=MODEL_OUTPUT_FILE)
+    parser.add_argument("--store", default=TRAINING_STORE_FILE)
+    parser.add_argument("--trees", type=int, default=TREES_PER_UPDATE)
+    parser.add_argument("--no-record", action="store_true", help="Only update from rows already in the store")
+    args = parser.parse_args()
+    if not args.no_record:
+        added = append_log(iter_log(LOG_DIR, LEGACY_MASTER_LOG_FILE, decode_fleet=False), args.store)
+        print(f"Recorded {added} new days from the master log in {args.store}.")
+    print(json.dumps(update_strategist(args.model, args.store, args.trees), indent=2))
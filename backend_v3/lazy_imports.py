@@ -0,0 +1,43 @@
+import importlib
+import threading
+
+# --- 1. LAZY MODULE PROXY ---
+_IMPORT_LOCK = threading.RLock()
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is first used, then imports
+    it. Lets light tooling import the engine without paying for pandas, OR-Tools
+    or SHAP. Each attribute is cached on the proxy after the first lookup. The
+    proxy has no public attributes of its own (joblib.load must stay joblib's);
+    use import_now() and is_loaded() instead.
+    """
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_module'] = None
+
+    def _lazy_load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with _IMPORT_LOCK:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self._lazy_name)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        value = getattr(self._lazy_load(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        state = "loaded" if is_loaded(self) else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+def import_now(module):
+    """Imports a LazyModule's module immediately (e.g. while warming up a server) and returns it."""
+    return module._lazy_load() if isinstance(module, LazyModule) else module
+
+def is_loaded(module):
+    return not isinstance(module, LazyModule) or module.__dict__['_lazy_module'] is not None
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+
+# --- 1. CONFIGURATION ---
+# The master log is stored as one compact JSON file per simulated day, so a run
+# appends days as they are solved and a rerun from day N only rewrites days >= N.
+LOG_DIR = "simulation_log"
+LEGACY_MASTER_LOG_FILE = "simulation_log_master.json"
+# Fleet snapshots are delta-encoded against the previous snapshot; every
+# KEYFRAME_INTERVAL-th day stores them in full, so rebuilding any one day reads at
+# most that many shards.
+KEYFRAME_INTERVAL = 10
+SNAPSHOT_KEYS = ('fleet_status_before', 'fleet_status_after')
+
+def _day_file(day):
+    return f"day_{int(day):03d}.json"
+
+def _day_of(file_name):
+    return int(file_name[len("day_"):-len(".json")])
+
+def _encode(entry):
+    # Entries produced by run_simulation contain only native Python types, so no
+    # per-object default= fallback is needed here.
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+# --- 2. SNAPSHOT DELTA ENCODING ---
+# A snapshot is a list of per-rake records. It is stored column-wise, either in
+# full ({"keyframe": true, "columns": [...], "values": {col: [...]}}) or as the
+# columns that differ from a base snapshot ({"columns": [...], "changed": {col: delta}}),
+# where a delta lists the changed rows, or the whole column when most rows changed.
+def _to_columns(records):
+    columns = list(records[0]) if records else []
+    return {col: [record[col] for record in records] for col in columns}
+
+def _to_records(columns):
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+def _column_delta(old, new):
+    # Compares types too, so 1, 1.0 and True survive the round trip unchanged.
+    rows = [i for i, (a, b) in enumerate(zip(old, new)) if type(a) is not type(b) or a != b]
+    if not rows:
+        return None
+    if 2 * len(rows) >= len(new):
+        return {"values": new}
+    return {"rows": rows, "values": [new[i] for i in rows]}
+
+def encode_snapshot(columns, base=None):
+    """Encodes a column dict against base (a column dict), or as a keyframe if base is None or has other rakes."""
+    if base is None or base.get('train_id') != columns.get('train_id'):
+        return {"keyframe": True, "columns": list(columns), "values": columns}
+    changed = {}
+    for col, values in columns.items():
+        delta = _column_delta(base[col], values) if col in base else {"values": values}
+        if delta is not None:
+            changed[col] = delta
+    return {"columns": list(columns), "changed": changed}
+
+def decode_snapshot(encoded, base=None):
+    """Inverse of encode_snapshot: returns the column dict."""
+    if encoded.get("keyframe"):
+        return encoded["values"]
+    columns = {}
+    for col in encoded["columns"]:
+        delta = encoded["changed"].get(col)
+        if delta is None:
+            columns[col] = base[col]
+        elif "rows" in delta:
+            values = list(base[col])
+            for i, value in zip(delta["rows"], delta["values"]):
+                values[i] = value
+            columns[col] = values
+        else:
+            columns[col] = delta["values"]
+    return columns
+
+def encode_entry(entry, previous_after=None):
+    """
+    Returns (encoded_entry, after_columns). fleet_status_before is encoded against
+    previous_after (the prior day's fleet_status_after columns) and fleet_status_after
+    against fleet_status_before.
+    """
+    before = _to_columns(entry['fleet_status_before'])
+    after = _to_columns(entry['fleet_status_after'])
+    encoded = {}
+    for key, value in entry.items():
+        if key == SNAPSHOT_KEYS[0]:
+            encoded['fleet_encoding'] = {
+                "before": encode_snapshot(before, previous_after),
+                "after": encode_snapshot(after, before)
+            }
+        elif key != SNAPSHOT_KEYS[1]:
+            encoded[key] = value
+    return encoded, after
+
+def decode_entry(encoded, previous_after=None):
+    """Inverse of encode_entry. Returns (entry, after_columns); plain entries pass through."""
+    if 'fleet_encoding' not in encoded:
+        return encoded, _to_columns(encoded.get('fleet_status_after', []))
+    before = decode_snapshot(encoded['fleet_encoding']['before'], previous_after)
+    after = decode_snapshot(encoded['fleet_encoding']['after'], before)
+    entry = {}
+    for key, value in encoded.items():
+        if key == 'fleet_encoding':
+            entry['fleet_status_before'] = _to_records(before)
+            entry['fleet_status_after'] = _to_records(after)
+        else:
+            entry[key] = value
+    return entry, after
+
+def _needs_base(encoded):
+    return 'fleet_encoding' in encoded and not encoded['fleet_encoding']['before'].get('keyframe')
+
+def encode_log(entries):
+    """Delta-encodes a list of consecutive entries for transfer: the first is a keyframe, the rest deltas."""
+    encoded_entries, previous_after = [], None
+    for entry in entries:
+        encoded, previous_after = encode_entry(entry, previous_after)
+        encoded_entries.append(encoded)
+    return encoded_entries
+
+# --- 3. WRITER ---
+class DayShardedLogWriter:
+    def __init__(self, log_dir=LOG_DIR):
+        self.log_dir = log_dir
+        # (day, shard mtime_ns, fleet_status_after columns) of the last shard written,
+        # so consecutive appends encode against it without re-reading the log.
+        self._last_after = None
+
+    def _previous_after(self, day):
+        if (day - 1) % KEYFRAME_INTERVAL == 0:
+            return None
+        path = os.path.join(self.log_dir, _day_file(day - 1))
+        if not os.path.exists(path):
+            return None
+        if self._last_after and self._last_after[0] == day - 1 and self._last_after[1] == os.stat(path).st_mtime_ns:
+            return self._last_after[2]
+        return _rebuild_after(day - 1, self.log_dir)
+
+    def append(self, entry):
+        """Atomically writes (or replaces) the shard for entry['day'], delta-encoding its fleet snapshots. Returns its size in bytes."""
+        day = entry['day']
+        # Created on first write, so an unused writer does not make log_exists() true.
+        os.makedirs(self.log_dir, exist_ok=True)
+        path = os.path.join(self.log_dir, _day_file(day))
+        if all(key in entry for key in SNAPSHOT_KEYS):
+            entry, after = encode_entry(entry, self._previous_after(day))
+        else:
+            after = None
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_encode(entry))
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self._last_after = (day, stat.st_mtime_ns, after) if after is not None else None
+        return stat.st_size
+
+    def truncate(self, from_day):
+        """Drops every day >= from_day."""
+        if not os.path.isdir(self.log_dir):
+            return
+        for file_name in os.listdir(self.log_dir):
+            if file_name.startswith("day_") and file_name.endswith(".json") and _day_of(file_name) >= from_day:
+                os.remove(os.path.join(self.log_dir, file_name))
+        if self._last_after and self._last_after[0] >= from_day:
+            self._last_after = None
+
+    def backup_days(self, from_day):
+        """The stored shard text of every day >= from_day, for restore_days."""
+        backup = {}
+        for day in list_days(self.log_dir):
+            if day >= from_day:
+                with open(os.path.join(self.log_dir, _day_file(day)), 'r', encoding='utf-8') as f:
+                    backup[day] = f.read()
+        return backup
+
+    def restore_days(self, from_day, backup):
+        """Replaces every day >= from_day with the shards saved by backup_days."""
+        self.truncate(from_day)
+        if backup:
+            os.makedirs(self.log_dir, exist_ok=True)
+        for day, text in backup.items():
+            path = os.path.join(self.log_dir, _day_file(day))
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+# --- 4. READER ---
+def log_exists(log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE):
+    return os.path.isdir(log_dir) or os.path.exists(legacy_file)
+
+def _shard_files(log_dir):
+    return [f for f in os.listdir(log_dir) if f.startswith("day_") and f.endswith(".json")]
+
+def list_days(log_dir=LOG_DIR):
+    if not os.path.isdir(log_dir):
+        return []
+    return sorted(_day_of(f) for f in _shard_files(log_dir))
+
+def log_version(log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE):
+    """Cheap fingerprint of the log that changes whenever a day shard is written or removed."""
+    digest = hashlib.sha1()
+    if os.path.isdir(log_dir):
+        paths = [os.path.join(log_dir, f) for f in sorted(_shard_files(log_dir))]
+    else:
+        paths = [legacy_file] if os.path.exists(legacy_file) else []
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return digest.hexdigest()[:16]
+
+def log_size_bytes(log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE):
+    """Total size of the log on disk."""
+    if os.path.isdir(log_dir):
+        return sum(os.path.getsize(os.path.join(log_dir, f)) for f in _shard_files(log_dir))
+    return os.path.getsize(legacy_file) if os.path.exists(legacy_file) else 0
+
+def _read_raw(day, log_dir):
+    path = os.path.join(log_dir, _day_file(day))
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _rebuild_after(day, log_dir):
+    """fleet_status_after columns of `day`, decoded forward from the nearest keyframe."""
+    chain = []
+    while True:
+        encoded = _read_raw(day - len(chain), log_dir)
+        if encoded is None:
+            raise ValueError(f"Simulation log is missing the base snapshot for Day {day - len(chain) + 1}.")
+        chain.append(encoded)
+        if not _needs_base(encoded):
+            break
+    after = None
+    for encoded in reversed(chain):
+        _, after = decode_entry(encoded, after)
+    return after
+
+def read_day(day, log_dir=LOG_DIR, decode_fleet=True):
+    """
+    Returns one day's entry with its fleet snapshots rebuilt, or None if the day is
+    not logged. decode_fleet=False skips the rebuild and drops the snapshots.
+    """
+    encoded = _read_raw(day, log_dir)
+    if encoded is None or not decode_fleet:
+        return _strip_fleet(encoded)
+    base = _rebuild_after(day - 1, log_dir) if _needs_base(encoded) else None
+    return decode_entry(encoded, base)[0]
+
+def _strip_fleet(entry):
+    if entry is None:
+        return None
+    return {k: v for k, v in entry.items() if k != 'fleet_encoding' and k not in SNAPSHOT_KEYS}
+
+def iter_log(log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE, start_day=None, end_day=None, decode_fleet=True):
+    """
+    Yields the logged days in order, optionally limited to start_day..end_day (inclusive),
+    holding one day in memory at a time. Only the shards in range (plus, for the first
+    one, those back to its keyframe) are opened. decode_fleet=False leaves out the fleet
+    snapshots. Falls back to a pre-sharding master log if that is all there is.
+    """
+    def in_range(day):
+        return (start_day is None or day >= start_day) and (end_day is None or day <= end_day)
+
+    if not os.path.isdir(log_dir):
+        if not os.path.exists(legacy_file):
+            return
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        for entry in entries:
+            if in_range(entry['day']):
+                yield entry if decode_fleet else _strip_fleet(entry)
+        return
+    previous_day, previous_after = None, None
+    for day in list_days(log_dir):
+        if not in_range(day):
+            continue
+        encoded = _read_raw(day, log_dir)
+        if not decode_fleet:
+            yield _strip_fleet(encoded)
+            continue
+        if _needs_base(encoded) and previous_day != day - 1:
+            previous_after = _rebuild_after(day - 1, log_dir)
+        entry, previous_after = decode_entry(encoded, previous_after)
+        previous_day = day
+        yield entry
+
+def read_log(log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE, start_day=None, end_day=None, decode_fleet=True):
+    """List form of iter_log."""
+    return list(iter_log(log_dir, legacy_file, start_day, end_day, decode_fleet))
+
+def migrate_legacy_log(log_dir=LOG_DIR, legacy_file=LEGACY_MASTER_LOG_FILE):
+    """Splits a pre-sharding master log into day shards. No-op once the shard directory exists."""
+    if os.path.isdir(log_dir) or not os.path.exists(legacy_file):
+        return
+    with open(legacy_file, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    # Build the shards beside the target and rename, so a crash never leaves a partial log.
+    tmp_dir = f"{log_dir}.tmp"
+    writer = DayShardedLogWriter(tmp_dir)
+    writer.truncate(1)
+    os.makedirs(tmp_dir, exist_ok=True)
+    for entry in entries:
+        writer.append(entry)
+    os.replace(tmp_dir, log_dir)
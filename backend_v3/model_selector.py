@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+# --- 1. CONFIGURATION ---
+DEFAULT_PROBE_TIMEOUT_S = 8.0
+DEFAULT_STATE_FILE = "chatbot_model_choice.json"
+# After every candidate failed, selection is retried on demand at most this often.
+RETRY_AFTER_S = 60.0
+
+# --- 2. SELECTOR ---
+class ModelSelector:
+    """
+    Picks the chat model off the request path. All candidates are probed at once,
+    each with a short generate_content call bounded by probe_timeout_s, and the
+    most preferred one that answered wins, as soon as every candidate preferred
+    over it has failed. The winner is saved to state_file and
+    reused without probing on the next start; report_failure() forgets it and
+    probes again.
+
+    States: "idle" (lazy, nothing probed yet), "probing", "ready", "failed".
+    """
+    def __init__(self, candidates, factory, probe_timeout_s=DEFAULT_PROBE_TIMEOUT_S, state_file=DEFAULT_STATE_FILE):
+        self.candidates = list(candidates)
+        self.factory = factory
+        self.probe_timeout_s = probe_timeout_s
+        self.state_file = state_file
+        self.state = "idle"
+        self.model = None
+        self.model_name = None
+        self.error = None
+        self.probe_results = {}
+        self.selected_in_s = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    @classmethod
+    def fixed(cls, model, model_name):
+        """A selector that is ready from the start with a known model (no probing)."""
+        selector = cls([model_name], factory=None, state_file=None)
+        selector._finish(model, model_name, time.perf_counter())
+        return selector
+
+    @classmethod
+    def failed(cls, error):
+        """A selector that can never become ready, e.g. because no API key is configured."""
+        selector = cls([], factory=None, state_file=None)
+        selector.state = "failed"
+        selector.error = error
+        selector._ready.set()
+        return selector
+
+    def start(self):
+        """Starts selection in a background thread unless it already started. Returns immediately."""
+        with self._lock:
+            if self.state not in ("idle", "failed") or self.factory is None:
+                return self
+            if self.state == "failed" and time.time() - self._failed_at < RETRY_AFTER_S:
+                return self
+            self.state = "probing"
+            self.error = None
+            self._ready.clear()
+        threading.Thread(target=self._select, name="model-selector", daemon=True).start()
+        return self
+
+    def get(self, timeout=None):
+        """Returns the selected model, starting selection if needed; None if it is not ready within timeout."""
+        self.start()
+        self._ready.wait(timeout)
+        return self.model
+
+    def report_failure(self, model_name):
+        """Called when the selected model stops working (e.g. it was retired): probe the candidates again."""
+        with self._lock:
+            if model_name != self.model_name or self.state != "ready":
+                return
+            print(f"Model {model_name} failed; selecting a model again.")
+            self._save(None)
+            self.state = "idle"
+            self.model = None
+            self.model_name = None
+        self.start()
+
+    def _select(self):
+        started = time.perf_counter()
+        self.probe_results = {}
+        saved_name = self._load()
+        if saved_name in self.candidates:
+            try:
+                self._finish(self.factory(saved_name), saved_name, started)
+                print(f"✅ Using saved model choice: {saved_name}")
+                return
+            except Exception as e:
+                print(f"❌ Saved model {saved_name} could not be created: {e}")
+
+        def probe(name, future):
+            try:
+                model = self.factory(name)
+                model.generate_content("Hello")
+                future.set_result(model)
+            except Exception as e:
+                future.set_exception(e)
+
+        def best_finished():
+            for future in futures.values():
+                if not future.done():
+                    return None
+                if future.exception() is None:
+                    return future
+            return None
+
+        # Daemon threads rather than an executor: a probe stuck on a hung endpoint is
+        # abandoned at the deadline and never delays startup or shutdown.
+        futures = {name: Future() for name in self.candidates}
+        for name, future in futures.items():
+            threading.Thread(target=probe, args=(name, future), name=f"model-probe-{name}", daemon=True).start()
+        deadline = time.monotonic() + self.probe_timeout_s
+        pending = set(futures.values())
+        while pending and best_finished() is None and time.monotonic() < deadline:
+            _, pending = wait(pending, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED)
+        chosen = None
+        for name, future in futures.items():
+            if not future.done():
+                self.probe_results[name] = "not needed" if chosen else f"timed out after {self.probe_timeout_s}s"
+            elif future.exception() is not None:
+                self.probe_results[name] = f"failed: {future.exception()}"
+            else:
+                self.probe_results[name] = "ok"
+                if chosen is None:
+                    chosen = (future.result(), name)
+        for name, result in self.probe_results.items():
+            print(f"{'✅' if result == 'ok' else '❌'} Model {name}: {result}")
+
+        if chosen is None:
+            with self._lock:
+                self.state = "failed"
+                self.error = "No available Gemini model found"
+                self._failed_at = time.time()
+                self.selected_in_s = round(time.perf_counter() - started, 3)
+            self._ready.set()
+            return
+        self._save(chosen[1])
+        self._finish(chosen[0], chosen[1], started)
+        print(f"✅ Successfully connected to model: {chosen[1]}")
+
+    def _finish(self, model, model_name, started):
+        with self._lock:
+            self.model = model
+            self.model_name = model_name
+            self.state = "ready"
+            self.selected_in_s = round(time.perf_counter() - started, 3)
+        self._ready.set()
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("model")
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, model_name):
+        if not self.state_file:
+            return
+        if model_name is None:
+            if os.path.exists(self.state_file):
+                os.remove(self.state_file)
+            return
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"model": model_name, "chosen_at": time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+        os.replace(tmp_path, self.state_file)
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "model": self.model_name,
+                "error": self.error,
+                "selected_in_s": self.selected_in_s,
+                "probe_results": dict(self.probe_results)
+            }
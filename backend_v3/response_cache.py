@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# --- 1. CONFIGURATION ---
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_S = 6 * 3600
+# Changes are written to persist_file at most this often, off the request thread.
+DEFAULT_SAVE_DELAY_S = 5.0
+
+def normalize_question(question):
+    """Lower-cases and collapses whitespace and trailing punctuation, so trivially different phrasings share a key."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+def cache_key(question, day, train_ids, data_version):
+    payload = json.dumps([normalize_question(question), day, sorted(set(train_ids)), data_version])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+# --- 2. CACHE ---
+class ResponseCache:
+    """
+    LRU cache of model answers with a TTL. Entries belong to one simulation log
+    version; moving to a new version (see sync_version) drops them all. With
+    persist_file set, the cache is reloaded from that JSON file and saved to it
+    save_delay_s after a change (batching the changes in between) and on flush().
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_s=DEFAULT_TTL_S, persist_file=None, save_delay_s=DEFAULT_SAVE_DELAY_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.persist_file = persist_file
+        self.save_delay_s = save_delay_s
+        self._lock = threading.Lock()
+        # Serializes file writes; _changes/_saved_changes keep an older snapshot from overwriting a newer one.
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._changes = 0
+        self._saved_changes = 0
+        self._entries = OrderedDict()
+        self._data_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        if persist_file and os.path.exists(persist_file):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.persist_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable response cache {self.persist_file}: {e}")
+            return
+        now = time.time()
+        self._data_version = saved.get("data_version")
+        for key, (created_at, value) in saved.get("entries", {}).items():
+            if now - created_at < self.ttl_s:
+                self._entries[key] = (created_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _changed(self):
+        # Called with self._lock held: schedules a save unless one is already pending.
+        self._changes += 1
+        if self.persist_file and self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay_s, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Writes unsaved changes to persist_file now (call on shutdown)."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self.persist_file or self._changes == self._saved_changes:
+                return
+            changes = self._changes
+            snapshot = {"data_version": self._data_version, "entries": dict(self._entries)}
+        with self._save_lock:
+            if changes <= self._saved_changes:
+                return
+            tmp_path = f"{self.persist_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_file)
+            self._saved_changes = changes
+
+    def sync_version(self, data_version):
+        """Drops every entry if the simulation log changed since the entries were cached."""
+        with self._lock:
+            if data_version == self._data_version:
+                return
+            if self._entries:
+                self.invalidations += 1
+                print(f"Simulation log changed; dropping {len(self._entries)} cached answers.")
+            self._entries.clear()
+            self._data_version = data_version
+            self._changed()
+
+    def get(self, key):
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None and time.time() - found[0] >= self.ttl_s:
+                del self._entries[key]
+                self.expirations += 1
+                found = None
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return found[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._changed()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "data_version": self._data_version,
+                "persist_file": self.persist_file
+            }
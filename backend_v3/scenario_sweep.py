@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from answer_final import (
+    SIMULATION_MONTH_DAYS,
+    SCENARIO_MODIFIERS,
+    MODEL_FILE,
+    build_initial_fleet,
+    default_scenario_calendar,
+    get_strategist,
+    run_simulation
+)
+from batch_engine import run_batch
+
+# --- 1. CONFIGURATION ---
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+# Per-day probability of each non-NORMAL scenario in a randomized calendar.
+DEFAULT_SCENARIO_PROBABILITIES = {"FESTIVAL_SURGE": 0.10, "HEAVY_MONSOON": 0.07}
+# Each process runs one CP-SAT worker so the sweep scales with processes, not threads.
+SWEEP_SOLVER_CONFIG = {"num_workers": 1}
+PERCENTILES = [5, 50, 95]
+
+def generate_calendars(n_calendars, probabilities=DEFAULT_SCENARIO_PROBABILITIES, seed=0, days=SIMULATION_MONTH_DAYS):
+    """Draws n_calendars scenario calendars, each day independently from `probabilities` (NORMAL otherwise)."""
+    names = list(probabilities)
+    weights = [probabilities[name] for name in names]
+    if sum(weights) > 1:
+        raise ValueError("Scenario probabilities must sum to at most 1.")
+    names.append('NORMAL')
+    weights.append(1 - sum(weights))
+    rng = np.random.default_rng(seed)
+    return [rng.choice(names, size=days, p=weights).tolist() for _ in range(n_calendars)]
+
+# --- 2. WORKER PROCESS ---
+# Set once per worker by _init_worker so every task reuses the same model and fleet.
+_WORKER_STATE = {}
+
+def _init_worker(model_file, base_file):
+    # Forked workers find the model the parent loaded and share its pages; spawned
+    # ones memory-map the same file.
+    _WORKER_STATE['model'] = get_strategist(model_file)
+    _WORKER_STATE['fleet'] = build_initial_fleet(base_file)
+
+def _run_task(task):
+    """Runs one calendar and returns compact per-day metrics instead of the full log."""
+    calendar, manual_overrides, solver_config = task
+    log = run_simulation(
+        start_day=1,
+        initial_fleet_state=_WORKER_STATE['fleet'],
+        ai_model=_WORKER_STATE['model'],
+        feature_names=FEATURES,
+        targets=TARGETS,
+        manual_overrides=manual_overrides,
+        solver_config=solver_config,
+        scenario_calendar=calendar,
+        explain=False
+    )
+    return log_metrics(log, calendar)
+
+def log_metrics(log, calendar):
+    """Per-day cost, shortfall and plan sizes of one run's log, NaN for days it did not complete."""
+    days = len(calendar)
+    metrics = {name: np.full(days, np.nan) for name in ('cost', 'shortfall', 'service', 'maintenance')}
+    for entry in log:
+        i = entry['day'] - 1
+        n_service = len(entry['plan']['SERVICE'])
+        metrics['cost'][i] = entry['cost']
+        metrics['service'][i] = n_service
+        metrics['maintenance'][i] = len(entry['plan']['MAINTENANCE'])
+        metrics['shortfall'][i] = max(SCENARIO_MODIFIERS[calendar[i]]['MIN_SERVICE'] - n_service, 0)
+    metrics['completed_days'] = len(log)
+    return metrics
+
+# --- 3. SWEEP AND AGGREGATION ---
+def summarize(results, calendars):
+    """
+    Aggregates per-run metrics into per-day and per-run distribution statistics.
+    With no runs the statistics are empty (per_day) or None.
+    """
+    summary = {"runs": len(results), "failed_runs": sum(r['completed_days'] < len(c) for r, c in zip(results, calendars))}
+    if not results:
+        summary.update({"per_day": {}, "monthly_cost": None, "shortfall_days": None, "availability": None})
+        return summary
+    per_day = {}
+    for name in ('cost', 'shortfall', 'service', 'maintenance'):
+        stacked = np.vstack([r[name] for r in results])
+        per_day[name] = {
+            "mean": np.round(np.nanmean(stacked, axis=0), 3).tolist(),
+            "std": np.round(np.nanstd(stacked, axis=0), 3).tolist(),
+            **{f"p{q}": np.round(np.nanpercentile(stacked, q, axis=0), 3).tolist() for q in PERCENTILES}
+        }
+    summary["per_day"] = per_day
+    monthly_cost = np.array([np.nansum(r['cost']) for r in results])
+    shortfall_days = np.array([np.nansum(r['shortfall'] > 0) for r in results])
+    summary["monthly_cost"] = {"mean": float(monthly_cost.mean()), "std": float(monthly_cost.std()),
+                               **{f"p{q}": float(np.percentile(monthly_cost, q)) for q in PERCENTILES}}
+    summary["shortfall_days"] = {"mean": float(shortfall_days.mean()), "max": int(shortfall_days.max())}
+    # Availability: fraction of days whose MIN_SERVICE target was met.
+    summary["availability"] = float(1 - shortfall_days.sum() / sum(r['completed_days'] for r in results))
+    return summary
+
+def run_sweep(calendars, manual_overrides_list=None, processes=None, model_file=MODEL_FILE, base_file="fleet_data.csv", solver_config=SWEEP_SOLVER_CONFIG, batch_size=None):
+    """
+    Runs every calendar (optionally paired with its own manual_overrides) across a
+    process pool and returns the aggregated summary. With batch_size, calendars
+    are instead run batch_size at a time by the batched engine, which shares the
+    per-day work and strategist predict across a batch and uses the pool only
+    for the CP-SAT solves.
+    """
+    if manual_overrides_list is None:
+        manual_overrides_list = [{}] * len(calendars)
+    tasks = [(calendar, overrides, solver_config) for calendar, overrides in zip(calendars, manual_overrides_list)]
+    processes = processes or os.cpu_count()
+    start = time.perf_counter()
+    # Loaded once here, before the pool forks, rather than once per worker.
+    model = get_strategist(model_file)
+    if batch_size:
+        fleet = build_initial_fleet(base_file)
+        results = []
+        for i in range(0, len(tasks), batch_size):
+            chunk = tasks[i:i + batch_size]
+            replicas = [{'fleet': fleet, 'scenario_calendar': calendar, 'manual_overrides': overrides} for calendar, overrides, _ in chunk]
+            logs = run_batch(replicas, model, FEATURES, TARGETS, solver_config=solver_config, processes=processes, keep_fleet_status=False)
+            results.extend(log_metrics(log, calendar) for log, (calendar, _, _) in zip(logs, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(model_file, base_file)) as pool:
+            results = list(pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (processes * 4))))
+    summary = summarize(results, calendars)
+    summary["wall_time_s"] = round(time.perf_counter() - start, 3)
+    summary["processes"] = processes
+    summary["batch_size"] = batch_size
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo sweep over scenario calendars.")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--surge-prob", type=float, default=DEFAULT_SCENARIO_PROBABILITIES["FESTIVAL_SURGE"])
+    parser.add_argument("--monsoon-prob", type=float, default=DEFAULT_SCENARIO_PROBABILITIES["HEAVY_MONSOON"])
+    parser.add_argument("--include-default", action="store_true", help="Also run the standard calendar")
+    parser.add_argument("--overrides", default=None, help="JSON file of {day: {train_id: override}} applied to every run")
+    parser.add_argument("--batch-size", type=int, default=None, help="Run calendars this many at a time with the batched engine")
+    parser.add_argument("--output", default="scenario_sweep_summary.json")
+    args = parser.parse_args()
+
+    probabilities = {"FESTIVAL_SURGE": args.surge_prob, "HEAVY_MONSOON": args.monsoon_prob}
+    calendars = generate_calendars(args.runs, probabilities, seed=args.seed)
+    if args.include_default:
+        calendars.insert(0, default_scenario_calendar())
+    manual_overrides_list = None
+    if args.overrides:
+        with open(args.overrides, 'r', encoding='utf-8') as f:
+            manual_overrides_list = [json.load(f)] * len(calendars)
+    summary = run_sweep(calendars, manual_overrides_list, processes=args.processes, batch_size=args.batch_size)
+    summary["scenario_probabilities"] = probabilities
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"Sweep of {summary['runs']} calendars finished in {summary['wall_time_s']}s on {summary['processes']} processes.")
+    if summary['runs']:
+        print(f"Monthly cost mean {summary['monthly_cost']['mean']:.0f} (p5 {summary['monthly_cost']['p5']:.0f}, p95 {summary['monthly_cost']['p95']:.0f}); availability {summary['availability']:.3f}")
+    print(f"Summary saved to {args.output}")
@@ -0,0 +1,191 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 1. CONFIGURATION ---
+MAX_JOB_WORKERS = 2
+MAX_FINISHED_JOBS = 100
+ACTIVE_STATES = ("queued", "running")
+
+class JobCancelled(Exception):
+    pass
+
+class JobRejected(Exception):
+    """Raised by a job target that cannot start, e.g. because its input data is missing. The job ends as "rejected"."""
+    pass
+
+# --- 2. JOB RECORD ---
+class Job:
+    def __init__(self, kind, params, key, total_days):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.status = "queued"
+        self.total_days = total_days
+        self.days_done = 0
+        self.current_day = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+        # Entries reported so far, kept only while the job is active so follow() can replay them.
+        self._entries = []
+        self._entries_changed = threading.Condition()
+
+    def report_day(self, day, entry=None):
+        """
+        Called by the job target after each simulated day, with that day's log entry
+        for followers; raises JobCancelled if cancellation was requested.
+        """
+        self.current_day = day
+        self.days_done += 1
+        if entry is not None:
+            with self._entries_changed:
+                if self._entries is not None:
+                    self._entries.append(entry)
+                self._entries_changed.notify_all()
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def follow(self):
+        """
+        Returns an iterator over the entries reported so far and then each new one as it
+        is reported, ending when the job finishes. None if the job has already finished.
+        """
+        with self._entries_changed:
+            entries = self._entries
+        return None if entries is None else self._follow(entries)
+
+    def _follow(self, entries):
+        sent = 0
+        while True:
+            with self._entries_changed:
+                while len(entries) == sent and not self._done_event.is_set():
+                    self._entries_changed.wait()
+                new_entries = entries[sent:]
+            if not new_entries:
+                return
+            sent += len(new_entries)
+            yield from new_entries
+
+    def _finish(self):
+        with self._entries_changed:
+            self._entries = None
+            self._done_event.set()
+            self._entries_changed.notify_all()
+
+    def wait(self, timeout=None):
+        """Blocks until the job has finished (succeeded, failed or cancelled). Returns False on timeout."""
+        return self._done_event.wait(timeout)
+
+    def to_dict(self):
+        now = self.finished_at or time.time()
+        elapsed = (now - self.started_at) if self.started_at else 0.0
+        eta = None
+        if self.status == "running" and self.days_done:
+            eta = elapsed / self.days_done * max(self.total_days - self.days_done, 0)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "current_day": self.current_day,
+            "days_done": self.days_done,
+            "total_days": self.total_days,
+            "elapsed_s": round(elapsed, 3),
+            "eta_s": round(eta, 3) if eta is not None else None,
+            "error": self.error
+        }
+
+# --- 3. MANAGER ---
+class JobManager:
+    """
+    Bounded thread pool for simulation jobs. Submissions with the same kind and
+    parameters as a queued or running job are coalesced onto that job.
+    """
+    def __init__(self, max_workers=MAX_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sim-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    @staticmethod
+    def job_key(kind, params):
+        return kind + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def submit(self, kind, params, target, total_days):
+        """
+        Queues target(job) to run on the pool. Returns (job, coalesced) where
+        coalesced is True when an identical active job was reused.
+        """
+        key = self.job_key(kind, params)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.status in ACTIVE_STATES:
+                    return job, True
+            job = Job(kind, params, key, total_days)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, target)
+        return job, False
+
+    def _run(self, job, target):
+        # Status changes happen under the lock, so a cancel() either keeps the job from
+        # starting or finds it running; only this method finishes the job.
+        with self._lock:
+            cancelled = job._cancel_event.is_set()
+            if cancelled:
+                job.status = "cancelled"
+                job.finished_at = job.finished_at or time.time()
+            else:
+                job.status = "running"
+                job.started_at = time.time()
+        if cancelled:
+            job._finish()
+            return
+        status, error = "failed", None
+        try:
+            target(job)
+            status = "succeeded"
+        except JobCancelled:
+            status = "cancelled"
+        except JobRejected as e:
+            status, error = "rejected", str(e)
+        except Exception as e:
+            error = str(e)
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+        finally:
+            with self._lock:
+                job.status = status
+                job.error = error
+                job.finished_at = time.time()
+            job._finish()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Requests cancellation. Queued jobs never start; running jobs stop after their current day."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job._cancel_event.set()
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status not in ACTIVE_STATES]
+        for job in sorted(finished, key=lambda j: j.submitted_at)[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job.id]
@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+import threading
+import pandas as pd
+
+# --- 1. CONFIGURATION ---
+REQUIRED_COLUMNS = ['simulation_day', 'train_id', 'status', 'health_score', 'consecutive_service_days', 'scenario']
+
+class SimulationLogIndex:
+    """
+    In-memory copy of the chatbot's per-train simulation log, indexed by
+    (simulation_day, train_id), by train_id and by day (the day's scenario and the
+    trains in each status). The file is re-read only when its
+    mtime or size changes, so a lookup costs the same whatever the log's length.
+    """
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self._lock = threading.Lock()
+        self._version = None
+        self._indexes = ({}, {}, [], {}, None)
+
+    @property
+    def by_day_train(self):
+        return self._indexes[0]
+
+    @property
+    def by_train(self):
+        return self._indexes[1]
+
+    @property
+    def days(self):
+        return self._indexes[2]
+
+    @property
+    def data_version(self):
+        """Hash of the loaded file's contents; unchanged if the log is rewritten with the same data."""
+        return self._indexes[4]
+
+    def _file_version(self):
+        stat = os.stat(self.log_file)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        with open(self.log_file, 'rb') as f:
+            raw = f.read()
+        log_df = pd.read_csv(io.BytesIO(raw))
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in log_df.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns in CSV: {missing_columns}")
+        by_day_train, by_train = {}, {}
+        for position, row in enumerate(log_df[REQUIRED_COLUMNS].to_dict(orient='records')):
+            # The file position keeps multi-train context in log order.
+            by_day_train[(row['simulation_day'], row['train_id'])] = (position, row)
+            by_train.setdefault(row['train_id'], []).append(row)
+        by_day = {}
+        for _, row in sorted(by_day_train.values(), key=lambda item: item[0]):
+            summary = by_day.setdefault(row['simulation_day'], {"scenario": row['scenario'], "status": {}})
+            summary["status"].setdefault(row['status'], []).append(row['train_id'])
+        return by_day_train, by_train, sorted(by_day), by_day, hashlib.sha1(raw).hexdigest()[:16]
+
+    def refresh(self):
+        """
+        Reloads the index if the file changed since the last load. Raises
+        FileNotFoundError if the log is missing and ValueError if it lacks columns.
+        """
+        version = self._file_version()
+        if version == self._version:
+            return self
+        with self._lock:
+            if version != self._version:
+                # Replaced in one assignment so readers never see a half-built index.
+                self._indexes = self._load()
+                self._version = version
+                print(f"Loaded {len(self.by_day_train)} log rows for {len(self.by_train)} trains from {self.log_file}")
+        return self
+
+    def has_day(self, day):
+        return day in self._indexes[3]
+
+    def day_summary(self, day):
+        """{"scenario": ..., "status": {status: [train_id, ...]}} for one day, or None if it is not logged."""
+        return self._indexes[3].get(day)
+
+    def row(self, day, train_id):
+        """The log row of one train on one day, or None."""
+        found = self.by_day_train.get((day, train_id))
+        return found[1] if found else None
+
+    def rows_for(self, day, train_ids):
+        """Rows for the given trains on one day, in log order (unknown trains are skipped)."""
+        by_day_train = self.by_day_train
+        found = [by_day_train[(day, t)] for t in set(train_ids) if (day, t) in by_day_train]
+        return [row for _, row in sorted(found, key=lambda item: item[0])]
+
+    def history(self, train_id, start_day=None, end_day=None):
+        """Every logged row of one train, optionally limited to start_day..end_day (inclusive)."""
+        return [row for row in self.by_train.get(train_id, [])
+                if (start_day is None or row['simulation_day'] >= start_day) and (end_day is None or row['simulation_day'] <= end_day)]
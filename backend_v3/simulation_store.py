@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import threading
+import time
+from convert_to_chatbot_format import chatbot_rows, MAX_LOOKBACK_DAYS
+
+# --- 1. CONFIGURATION ---
+# Shared between the simulation backend (the only writer) and the chatbot (readers).
+# Every write transaction bumps meta.version, which readers poll to notice reruns.
+# meta.store_id is random per database file, so a recreated store never repeats
+# a version an older file already had.
+STORE_FILE = "simulation_store.sqlite"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS days (
+    simulation_day INTEGER PRIMARY KEY,
+    scenario TEXT NOT NULL,
+    cost REAL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    simulation_day INTEGER NOT NULL,
+    train_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    health_score REAL NOT NULL,
+    consecutive_service_days INTEGER NOT NULL,
+    scenario TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (simulation_day, train_id)
+);
+CREATE INDEX IF NOT EXISTS assignments_by_train ON assignments (train_id, simulation_day);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', lower(hex(randomblob(8))));
+"""
+ROW_COLUMNS = "simulation_day, train_id, status, health_score, consecutive_service_days, scenario"
+
+def _connect(path, create=False):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    if create:
+        # WAL lets the chatbot keep reading while the backend writes.
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+    return connection
+
+def _bump_version(connection):
+    connection.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (str(time.time()),))
+
+# --- 2. WRITER ---
+class SimulationStoreWriter:
+    """
+    Writes simulated days into the store as the backend persists them. Safe to
+    share between threads: each thread gets its own connection (Flask requests,
+    job workers and startup all write) and write transactions are serialized.
+    """
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+
+    @property
+    def connection(self):
+        # sqlite3 connections may only be used by the thread that opened them.
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = _connect(self.path, create=True)
+        return self._local.connection
+
+    def is_empty(self):
+        return self.connection.execute("SELECT COUNT(*) FROM days").fetchone()[0] == 0
+
+    def _streaks_before(self, day):
+        # The previous day's rows carry each train's capped streak; a service day extends it by one.
+        rows = self.connection.execute(
+            "SELECT train_id, consecutive_service_days FROM assignments WHERE simulation_day = ? AND status = 'SERVICE'", (day - 1,))
+        return {row['train_id']: min(row['consecutive_service_days'] + 1, MAX_LOOKBACK_DAYS) for row in rows}
+
+    def write_days(self, log_entries):
+        """Replaces the stored rows of each entry's day, in one transaction and one version bump."""
+        with self._write_lock, self.connection:
+            streaks, previous_day = None, None
+            for entry in log_entries:
+                day = entry['day']
+                if previous_day != day - 1:
+                    streaks = self._streaks_before(day)
+                rows, streaks = chatbot_rows(entry, streaks)
+                self.connection.execute("DELETE FROM assignments WHERE simulation_day = ?", (day,))
+                self.connection.executemany(
+                    f"INSERT INTO assignments ({ROW_COLUMNS}, position) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(*row, position) for position, row in enumerate(rows)])
+                self.connection.execute("INSERT OR REPLACE INTO days (simulation_day, scenario, cost) VALUES (?, ?, ?)",
+                                        (day, entry.get('scenario', 'NORMAL'), entry.get('cost')))
+                previous_day = day
+            _bump_version(self.connection)
+
+    def truncate(self, from_day):
+        """Drops every day >= from_day."""
+        with self._write_lock, self.connection:
+            self.connection.execute("DELETE FROM assignments WHERE simulation_day >= ?", (from_day,))
+            self.connection.execute("DELETE FROM days WHERE simulation_day >= ?", (from_day,))
+            _bump_version(self.connection)
+
+# --- 3. READER ---
+class SimulationStoreReader:
+    """
+    Read side for the chatbot, with the same lookups as SimulationLogIndex. Rows are
+    queried through the (day, train) and train indexes; the day list and per-day
+    summaries are cached until refresh() sees a new store version.
+    """
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._version = None
+        self._days = []
+        self._day_set = frozenset()
+        self._day_summaries = {}
+
+    @property
+    def connection(self):
+        # sqlite3 connections are per thread; Flask serves requests on several.
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = _connect(self.path)
+        return self._local.connection
+
+    def refresh(self):
+        """Drops cached summaries if the backend wrote since the last call. Raises FileNotFoundError if there is no store."""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        meta = dict(self.connection.execute("SELECT key, value FROM meta WHERE key IN ('store_id', 'version')").fetchall())
+        version = f"{meta.get('store_id', 'none')}-{meta['version']}"
+        if version != self._version:
+            days = [row['simulation_day'] for row in self.connection.execute("SELECT simulation_day FROM days ORDER BY simulation_day")]
+            self._days, self._day_set, self._day_summaries, self._version = days, frozenset(days), {}, version
+            print(f"Simulation store at version {version}: {len(days)} days")
+        return self
+
+    @property
+    def data_version(self):
+        return f"store-{self._version}"
+
+    @property
+    def days(self):
+        return self._days
+
+    def has_day(self, day):
+        return day in self._day_set
+
+    def day_summary(self, day):
+        summary = self._day_summaries.get(day)
+        if summary is None:
+            rows = self.connection.execute(
+                "SELECT train_id, status, scenario FROM assignments WHERE simulation_day = ? ORDER BY position", (day,)).fetchall()
+            if not rows:
+                return None
+            summary = {"scenario": rows[0]['scenario'], "status": {}}
+            for row in rows:
+                summary["status"].setdefault(row['status'], []).append(row['train_id'])
+            self._day_summaries[day] = summary
+        return summary
+
+    def row(self, day, train_id):
+        found = self.connection.execute(
+            f"SELECT {ROW_COLUMNS} FROM assignments WHERE simulation_day = ? AND train_id = ?", (day, train_id)).fetchone()
+        return dict(found) if found else None
+
+    def rows_for(self, day, train_ids):
+        train_ids = list(set(train_ids))
+        placeholders = ", ".join("?" * len(train_ids))
+        rows = self.connection.execute(
+            f"SELECT {ROW_COLUMNS} FROM assignments WHERE simulation_day = ? AND train_id IN ({placeholders}) ORDER BY position",
+            (day, *train_ids))
+        return [dict(row) for row in rows]
+
+    def history(self, train_id, start_day=None, end_day=None):
+        rows = self.connection.execute(
+            f"SELECT {ROW_COLUMNS} FROM assignments WHERE train_id = ? AND simulation_day BETWEEN ? AND ? ORDER BY simulation_day",
+            (train_id, start_day if start_day is not None else 0, end_day if end_day is not None else 2**31))
+        return [dict(row) for row in rows]
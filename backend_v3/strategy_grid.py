@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import time
+import numpy as np
+
+# --- 1. CONFIGURATION ---
+# Compiled after brain_make.py: python strategy_grid.py [--mode linear --health-resolution 0.25]
+MODEL_FILE = "strategy_model.joblib"
+GRID_FILE = "strategy_grid.npz"
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+HEALTH_FEATURE = 'avg_fleet_health'
+# Health scores are clipped to this range by the engine.
+HEALTH_RANGE = (0.0, 100.0)
+DEFAULT_HEALTH_RESOLUTION = 0.5
+# The error check evaluates the forest this many times more finely than the grid.
+ERROR_CHECK_OVERSAMPLING = 10
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# --- 2. LOOKUP ---
+class CompiledStrategist:
+    """
+    The strategist forest tabulated over its reachable inputs. Every input except
+    avg_fleet_health is discrete, so each (total_fleet_size, target_service_trains,
+    is_monsoon, is_surge) combination gets a table of the five outputs over a
+    health grid:
+
+    - mode "step": the grid is the forest's own split thresholds on health. The
+      forest is constant between them, so a lookup reproduces it exactly
+      (max_abs_error is all zeros).
+    - mode "linear": a uniform grid at health_resolution, linearly interpolated.
+      max_abs_error holds the largest deviation from the forest per output,
+      measured at compile time on a grid ERROR_CHECK_OVERSAMPLING times finer.
+
+    predict() has the same contract as the forest's. Off-grid discrete inputs fall
+    back to the forest, which is also what estimators_ (for SHAP) loads from.
+    """
+    def __init__(self, keys, health_nodes, values, mode, feature_names, max_abs_error, source_model_file, source_sha1, health_resolution=None):
+        self.keys = {tuple(int(v) for v in key): i for i, key in enumerate(keys)}
+        self.health_nodes = np.asarray(health_nodes, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.mode = mode
+        self.feature_names = list(feature_names)
+        self.max_abs_error = np.asarray(max_abs_error, dtype=np.float64)
+        self.source_model_file = source_model_file
+        self.source_sha1 = source_sha1
+        self.health_resolution = health_resolution
+        self._health_column = self.feature_names.index(HEALTH_FEATURE)
+        self._key_columns = [i for i in range(len(self.feature_names)) if i != self._health_column]
+        self._forest = None
+
+    @classmethod
+    def load(cls, path=GRID_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(data['keys'], data['health_nodes'], data['values'], meta['mode'], meta['feature_names'],
+                       data['max_abs_error'], meta['source_model_file'], meta['source_sha1'], meta.get('health_resolution'))
+
+    def save(self, path=GRID_FILE):
+        meta = {
+            "mode": self.mode,
+            "feature_names": self.feature_names,
+            "targets": TARGETS,
+            "source_model_file": self.source_model_file,
+            "source_sha1": self.source_sha1,
+            "health_resolution": self.health_resolution,
+            "compiled_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        keys = np.array(sorted(self.keys, key=self.keys.get), dtype=np.int64)
+        with open(path, 'wb') as f:
+            np.savez(f, keys=keys, health_nodes=self.health_nodes, values=self.values,
+                     max_abs_error=self.max_abs_error, meta=np.array(json.dumps(meta)))
+
+    def lookup(self, key, health):
+        """The five outputs for one input, or None if key is not on the grid."""
+        table = self.keys.get(key)
+        if table is None:
+            return None
+        nodes, values = self.health_nodes, self.values[table]
+        if self.mode == "step":
+            # The forest compares float32 inputs with `<= threshold`, so node i covers (node[i-1], node[i]].
+            return values[np.searchsorted(nodes, float(np.float32(health)), side='left')]
+        position = (min(max(health, nodes[0]), nodes[-1]) - nodes[0]) / self.health_resolution
+        i = min(int(position), len(nodes) - 2)
+        weight = position - i
+        return values[i] * (1 - weight) + values[i + 1] * weight
+
+    def predict_conditions(self, conditions):
+        """The five outputs for one engine conditions dict, as a list of floats. The hot path: no pandas or sklearn."""
+        key = tuple(int(conditions[name]) for name in self.feature_names if name != HEALTH_FEATURE)
+        found = self.lookup(key, conditions[HEALTH_FEATURE])
+        if found is None:
+            return self.predict([[conditions[name] for name in self.feature_names]])[0].tolist()
+        return found.tolist()
+
+    def predict(self, X):
+        rows = np.asarray(X, dtype=np.float64)
+        out = np.empty((len(rows), self.values.shape[-1]))
+        for r, row in enumerate(rows):
+            found = self.lookup(tuple(int(row[c]) for c in self._key_columns), row[self._health_column])
+            if found is None:
+                import pandas as pd
+                found = self.forest.predict(pd.DataFrame(rows[r:r + 1], columns=self.feature_names))[0]
+            out[r] = found
+        return out
+
+    @property
+    def forest(self):
+        if self._forest is None:
+            import joblib
+            self._forest = joblib.load(self.source_model_file)
+        return self._forest
+
+    @property
+    def estimators_(self):
+        return self.forest.estimators_
+
+    def is_current(self, model_file):
+        """True if model_file is still the forest this grid was compiled from."""
+        return file_sha1(model_file) == self.source_sha1
+
+# --- 3. COMPILATION ---
+def reachable_keys(fleet_sizes, scenario_modifiers):
+    """Discrete inputs the engine can produce: each fleet size with each scenario's (MIN_SERVICE, is_monsoon, is_surge)."""
+    scenario_inputs = sorted({(mods['MIN_SERVICE'], int(name == 'HEAVY_MONSOON'), int(name == 'FESTIVAL_SURGE'))
+                              for name, mods in scenario_modifiers.items()})
+    return [(fleet_size, *inputs) for fleet_size in sorted(set(fleet_sizes)) for inputs in scenario_inputs]
+
+def health_thresholds(forest, feature_names=FEATURES):
+    """Every split threshold on avg_fleet_health across all trees of all outputs, sorted."""
+    column = feature_names.index(HEALTH_FEATURE)
+    thresholds = set()
+    for output_forest in forest.estimators_:
+        for tree in output_forest.estimators_:
+            tree_ = tree.tree_
+            thresholds.update(tree_.threshold[tree_.feature == column].tolist())
+    return np.array(sorted(thresholds))
+
+def _forest_table(forest, key, health_values, feature_names):
+    import pandas as pd
+    columns = {name: np.full(len(health_values), value) for name, value in zip([f for f in feature_names if f != HEALTH_FEATURE], key)}
+    columns[HEALTH_FEATURE] = health_values
+    return forest.predict(pd.DataFrame(columns)[feature_names])
+
+def compile_strategist(forest, fleet_sizes, scenario_modifiers, mode="step", health_resolution=DEFAULT_HEALTH_RESOLUTION,
+                       feature_names=FEATURES, source_model_file=MODEL_FILE):
+    keys = reachable_keys(fleet_sizes, scenario_modifiers)
+    if mode == "step":
+        thresholds = health_thresholds(forest, feature_names)
+        # Inputs above the last threshold take the value of any point past it.
+        health_nodes = np.append(thresholds, np.inf)
+        evaluate_at = np.append(thresholds, max(HEALTH_RANGE[1], thresholds[-1] + 1) if len(thresholds) else HEALTH_RANGE[1])
+        health_resolution = None
+    elif mode == "linear":
+        steps = int(round((HEALTH_RANGE[1] - HEALTH_RANGE[0]) / health_resolution))
+        health_nodes = evaluate_at = HEALTH_RANGE[0] + np.arange(steps + 1) * health_resolution
+    else:
+        raise ValueError(f"Unknown mode {mode!r}; use 'step' or 'linear'.")
+    values = np.stack([_forest_table(forest, key, evaluate_at, feature_names) for key in keys])
+    compiled = CompiledStrategist(keys, health_nodes, values, mode, feature_names, np.zeros(values.shape[-1]),
+                                  source_model_file, file_sha1(source_model_file), health_resolution)
+    compiled.max_abs_error = measure_error(compiled, forest, keys)
+    return compiled
+
+def measure_error(compiled, forest, keys):
+    """Largest absolute difference from the forest per output, over a fine health grid and every key."""
+    resolution = (compiled.health_resolution or DEFAULT_HEALTH_RESOLUTION) / ERROR_CHECK_OVERSAMPLING
+    health_values = np.arange(HEALTH_RANGE[0], HEALTH_RANGE[1] + resolution / 2, resolution)
+    if compiled.mode == "step":
+        # Just either side of every threshold is where a step table could go wrong.
+        finite = compiled.health_nodes[np.isfinite(compiled.health_nodes)]
+        health_values = np.concatenate([health_values, finite, np.nextafter(finite.astype(np.float32), np.float32(np.inf)).astype(np.float64)])
+    error = np.zeros(compiled.values.shape[-1])
+    for key in keys:
+        expected = _forest_table(forest, key, health_values, compiled.feature_names)
+        got = np.array([compiled.lookup(key, health) for health in health_values])
+        error = np.maximum(error, np.abs(got - expected).max(axis=0))
+    return error
+
+if __name__ == "__main__":
+    import joblib
+    from answer_final import SCENARIO_MODIFIERS
+    parser = argparse.ArgumentParser(description="Compile the strategist forest into a lookup table for the engine.")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--output", default=GRID_FILE)
+    parser.add_argument("--mode", choices=["step", "linear"], default="step")
+    parser.add_argument("--health-resolution", type=float, default=DEFAULT_HEALTH_RESOLUTION, help="Grid spacing for --mode linear")
+    parser.add_argument("--fleet-sizes", default=None, help="Comma-separated fleet sizes to cover (default: the size of fleet_data.csv)")
+    args = parser.parse_args()
+
+    if args.fleet_sizes:
+        fleet_sizes = [int(size) for size in args.fleet_sizes.split(',')]
+    else:
+        with open("fleet_data.csv", 'r', encoding='utf-8') as f:
+            fleet_sizes = [sum(1 for line in f if line.strip()) - 1]
+    start = time.perf_counter()
+    compiled = compile_strategist(joblib.load(args.model), fleet_sizes, SCENARIO_MODIFIERS, args.mode, args.health_resolution, source_model_file=args.model)
+    compiled.save(args.output)
+    print(f"Compiled {len(compiled.keys)} input combinations x {len(compiled.health_nodes)} health points ({args.mode}) in {time.perf_counter() - start:.2f}s")
+    for target, error in zip(TARGETS, compiled.max_abs_error):
+        print(f"  max |error| {target}: {error:.6g}")
+    print(f"Saved to {args.output}")
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are flat files in backend_v3/ and import each other by name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_log_entries(days=6, rakes=5):
+    """Small, self-consistent log entries: rake i is in service on days where (day + i) is even."""
+    entries = []
+    train_ids = [f"Rake-{i:02d}" for i in range(1, rakes + 1)]
+    fleet = [{"train_id": t, "current_km": 50000 + 10 * i, "health_score": 90.0 - i, "consecutive_service_days": 0,
+              "branding_sla_active": i % 2 == 0} for i, t in enumerate(train_ids)]
+    for day in range(1, days + 1):
+        service = [t for i, t in enumerate(train_ids) if (day + i) % 2 == 0]
+        before = [dict(record) for record in fleet]
+        for record in fleet:
+            in_service = record["train_id"] in service
+            record["current_km"] += 200 if in_service else 0
+            record["consecutive_service_days"] = record["consecutive_service_days"] + 1 if in_service else 0
+            record["health_score"] = round(record["health_score"] - 0.5, 1)
+        entries.append({
+            "day": day,
+            "scenario": "NORMAL",
+            "plan": {"SERVICE": service, "MAINTENANCE": [], "STANDBY": [t for t in train_ids if t not in service]},
+            "cost": 1000 * day,
+            "fleet_status_before": before,
+            "fleet_status_after": [dict(record) for record in fleet],
+        })
+    return entries
+
+
+@pytest.fixture
+def log_entries():
+    return make_log_entries()
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURES = ['total_fleet_size', 'target_service_trains', 'avg_fleet_health', 'is_monsoon', 'is_surge']
+TARGETS = ['historical_cost_per_km', 'historical_fatigue_factor', 'historical_branding_penalty', 'historical_target_mileage', 'historical_maint_threshold']
+
+
+@pytest.fixture(scope="session")
+def strategist():
+    """A small forest trained like brain_make's, so tests do not need strategy_model.joblib."""
+    from brain_make import build_model, for_inference, load_training_data
+    X, y = load_training_data(os.path.join(BACKEND_DIR, "historical_data_retrain.csv"))
+    model = build_model({'n_estimators': 10, 'max_depth': 8, 'min_samples_leaf': 1})
+    model.fit(X, y)
+    return for_inference(model)
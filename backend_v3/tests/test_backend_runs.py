@@ -0,0 +1,159 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import BACKEND_DIR
+from log_store import DayShardedLogWriter
+from simulation_store import SimulationStoreWriter
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch, strategist):
+    """The backend module working in an empty directory, with a full month already simulated."""
+    shutil.copy(os.path.join(BACKEND_DIR, "fleet_data.csv"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    import backend_run_rerun
+    monkeypatch.setattr(backend_run_rerun, "get_strategist", lambda: strategist)
+    monkeypatch.setattr(backend_run_rerun, "record_training_data", lambda: None)
+    # Fresh writers, so no connection or cached snapshot points into another test's directory.
+    monkeypatch.setattr(backend_run_rerun, "LOG_WRITER", DayShardedLogWriter())
+    monkeypatch.setattr(backend_run_rerun, "SIMULATION_STORE", SimulationStoreWriter())
+    for _ in backend_run_rerun.iter_run_days(1, {}):
+        pass
+    return backend_run_rerun
+
+
+def persisted_state(backend):
+    """Everything a run writes: log shards, checkpoint files and manifest, and the store's rows per day."""
+    files = {}
+    for directory in ("simulation_log", "checkpoints"):
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), "rb") as f:
+                files[f"{directory}/{name}"] = f.read()
+    store = backend.SIMULATION_STORE.connection.execute(
+        "SELECT simulation_day, train_id, status, health_score FROM assignments ORDER BY simulation_day, position").fetchall()
+    return files, [tuple(row) for row in store]
+
+
+def test_full_run_persists_every_day(backend):
+    files, store = persisted_state(backend)
+    assert len([name for name in files if name.startswith("simulation_log/")]) == 30
+    assert {row[0] for row in store} == set(range(1, 31))
+
+
+def test_closing_a_rerun_early_restores_the_log(backend):
+    before = persisted_state(backend)
+    days = backend.iter_run_days(25, {"manual_overrides": {"25": {"Rake-03": {"force_maintenance": True}}}})
+    assert next(days)["day"] == 25
+    days.close()
+    assert persisted_state(backend) == before
+
+
+def test_failed_rerun_restores_the_log(backend, monkeypatch):
+    before = persisted_state(backend)
+    persist_day = backend.persist_day
+
+    def failing_persist(entry):
+        if entry["day"] == 27:
+            raise OSError("disk full")
+        persist_day(entry)
+
+    monkeypatch.setattr(backend, "persist_day", failing_persist)
+    with pytest.raises(OSError):
+        for _ in backend.iter_run_days(24, {"manual_overrides": {"24": {"Rake-05": {"health_penalty": 60}}}}):
+            pass
+    assert persisted_state(backend) == before
+
+
+def test_cancelled_job_restores_the_log(backend):
+    from sim_jobs import Job
+    before = persisted_state(backend)
+    job = Job("rerun", {"start_day": 26, "manual_overrides": {"26": {"Rake-02": {"force_maintenance": True}}}}, "test", 5)
+    original_report = job.report_day
+
+    def cancel_after_first_day(day, entry=None):
+        job._cancel_event.set()
+        original_report(day, entry)
+
+    job.report_day = cancel_after_first_day
+    backend.JOBS._run(job, backend.simulation_job)
+    assert job.status == "cancelled"
+    assert job.days_done == 1
+    assert persisted_state(backend) == before
+
+
+def test_blocking_endpoint_runs_through_the_job_pool(backend):
+    client = backend.app.test_client()
+    response = client.post("/rerun_from_day", json={"start_day": 29})
+    assert response.status_code == 200
+    job = backend.JOBS.get(response.get_json()["job_id"])
+    assert job.status == "succeeded" and job.days_done == 2
+
+
+def test_rerun_without_a_start_state_is_rejected_by_the_job(backend):
+    backend.truncate_from(20)
+    client = backend.app.test_client()
+    response = client.post("/rerun_from_day", json={"start_day": 25})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Could not find data for Day 24 to start rerun."
+    assert response.get_json()["job"]["status"] == "rejected"
+
+
+def test_stream_runs_as_a_job_and_forwards_its_days(backend):
+    import json
+    client = backend.app.test_client()
+    response = client.post("/stream_simulation", json={"start_day": 28})
+    assert response.status_code == 200
+    days = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [entry["day"] for entry in days] == [28, 29, 30]
+    job = backend.JOBS.get(response.headers["X-Job-Id"])
+    assert job.status == "succeeded" and job.kind == "rerun"
+
+
+def test_stream_validates_start_day_and_reports_rejected_jobs(backend):
+    import json
+    client = backend.app.test_client()
+    for start_day in ("abc", 0, 31):
+        assert client.post("/stream_simulation", json={"start_day": start_day}).status_code == 400
+    backend.truncate_from(20)
+    response = client.post("/stream_simulation?format=sse", json={"start_day": 25})
+    body = response.get_data(as_text=True)
+    assert body.startswith("event: error\n")
+    assert json.loads(body.split("data: ", 1)[1])["job"]["status"] == "rejected"
+
+
+def test_simulation_data_etag_and_compression(backend):
+    import gzip
+    import json
+    from log_store import read_log
+    client = backend.app.test_client()
+    response = client.get("/get_simulation_data", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(response.get_data()))["data"] == read_log()
+    etag = response.headers["ETag"]
+
+    assert client.get("/get_simulation_data", headers={"If-None-Match": etag}).status_code == 304
+    # Another query is another representation.
+    ranged = client.get("/get_simulation_data?start_day=3&end_day=4&fields=cost", headers={"If-None-Match": etag})
+    assert ranged.status_code == 200 and "Content-Encoding" not in ranged.headers
+    assert ranged.get_json()["data"] == [{"day": entry["day"], "cost": entry["cost"]} for entry in read_log(start_day=3, end_day=4)]
+
+    # A rerun changes the log, so the old tag no longer matches.
+    for _ in backend.iter_run_days(30, {"manual_overrides": {"30": {"Rake-01": {"force_maintenance": True}}}}):
+        pass
+    changed = client.get("/get_simulation_data", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_simulation_data_delta_encoding(backend):
+    from log_store import decode_entry, read_log
+    client = backend.app.test_client()
+    encoded = client.get("/get_simulation_data?encoding=delta&start_day=11").get_json()["data"]
+    decoded, previous_after = [], None
+    for entry in encoded:
+        entry, previous_after = decode_entry(entry, previous_after)
+        decoded.append(entry)
+    assert decoded == read_log(start_day=11)
@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+from answer_final import default_scenario_calendar, run_simulation
+from batch_engine import run_batch
+from conftest import BACKEND_DIR, FEATURES, TARGETS
+
+START_DAY = 20
+SOLVER_CONFIG = {"num_workers": 1}
+
+
+def _without_timings(log):
+    return [{k: v for k, v in entry.items() if k not in ('timings', 'solve_time_s')} for entry in log]
+
+
+def test_replicas_match_run_simulation(strategist):
+    fleet = pd.read_csv(os.path.join(BACKEND_DIR, "fleet_status.csv"))
+    monsoon = default_scenario_calendar()
+    monsoon[START_DAY:START_DAY + 3] = ['HEAVY_MONSOON'] * 3
+    replicas = [
+        {"fleet": fleet},
+        {"fleet": fleet, "scenario_calendar": monsoon,
+         "manual_overrides": {START_DAY + 1: {"Rake-04": {"force_maintenance": True, "reason": "Test"}}}},
+    ]
+    logs = run_batch(replicas, strategist, FEATURES, TARGETS, start_day=START_DAY, solver_config=SOLVER_CONFIG, processes=1)
+
+    assert len(logs) == len(replicas)
+    for replica, log in zip(replicas, logs):
+        expected = run_simulation(START_DAY, replica["fleet"], strategist, FEATURES, TARGETS,
+                                  replica.get("manual_overrides", {}), solver_config=SOLVER_CONFIG,
+                                  scenario_calendar=replica.get("scenario_calendar"), explain=False)
+        assert len(log) == len(expected)
+        assert _without_timings(log) == _without_timings(expected)
+    assert logs[0] != logs[1]
+
+
+def test_solver_pool_matches_in_process(strategist):
+    fleet = pd.read_csv(os.path.join(BACKEND_DIR, "fleet_status.csv"))
+    replicas = [{"fleet": fleet}, {"fleet": fleet, "strategy_overrides": {"maint_threshold": 60}}]
+    in_process = run_batch(replicas, strategist, FEATURES, TARGETS, start_day=26, solver_config=SOLVER_CONFIG, processes=1)
+    pooled = run_batch(replicas, strategist, FEATURES, TARGETS, start_day=26, solver_config=SOLVER_CONFIG, processes=2)
+    assert [_without_timings(log) for log in pooled] == [_without_timings(log) for log in in_process]
+    assert all(entry["ai_strategy"]["maint_threshold"] == 60 for entry in in_process[1])
@@ -0,0 +1,104 @@
+import importlib
+import sys
+
+import pytest
+
+from chatbot_queries import answer_locally, parse_days, parse_train_ids
+from response_cache import ResponseCache
+from simulation_store import SimulationStoreReader, SimulationStoreWriter
+
+
+@pytest.fixture
+def store(tmp_path, log_entries):
+    path = str(tmp_path / "store.sqlite")
+    SimulationStoreWriter(path).write_days(log_entries)
+    return SimulationStoreReader(path).refresh()
+
+
+def test_parsing():
+    assert parse_train_ids("Compare rake 3, Rake-03 and rake-12") == ["Rake-03", "Rake-12"]
+    assert parse_days("What happened on day 4?") == (4, 4)
+    assert parse_days("days 5 to 2") == (2, 5)
+    assert parse_days("this month") is None
+
+
+def test_train_status(store):
+    answer = answer_locally("Was Rake-02 in service on day 1?", store)
+    assert answer == "- Rake-02 on Day 1: **SERVICE**"
+
+
+def test_status_listing(store):
+    answer = answer_locally("Which trains were in service on day 2?", store)
+    assert answer == "- Day 2, SERVICE (3): Rake-01, Rake-03, Rake-05"
+    assert answer_locally("How many trains were on standby on day 2?", store) == "- Day 2: 2 train(s) in STANDBY"
+
+
+def test_counting_days_in_a_status(store):
+    # Rake-05 is in service on even days; the store holds days 1-6.
+    answer = answer_locally("How many days was Rake 5 in service between day 1 and day 10?", store)
+    assert answer == "- Rake-05, Days 1-6: 3 of 6 day(s) in SERVICE"
+    answer = answer_locally("How many days were Rake-01 and Rake-02 on standby in days 1-4?", store)
+    assert answer == "- Rake-01, Days 1-4: 2 of 4 day(s) in STANDBY\n- Rake-02, Days 1-4: 2 of 4 day(s) in STANDBY"
+    # A count without a status to count is left to the model.
+    assert answer_locally("How many times was Rake-05 assigned between day 1 and day 10?", store) is None
+
+
+def test_consecutive_service_days_is_a_field_not_a_status(store):
+    answer = answer_locally("How many consecutive service days did Rake-01 have on day 4?", store)
+    assert answer == "- Rake-01 on Day 4: 0 consecutive service day(s)"
+    # Without a train this used to list the trains in SERVICE.
+    assert answer_locally("What were the consecutive service days on day 4?", store) is None
+    assert answer_locally("Show service days on day 4", store) is None
+
+
+def test_explanations_go_to_the_model(store):
+    assert answer_locally("Why was Rake-02 in service on day 1?", store) is None
+    assert answer_locally("What was the health of Rake-02?", store) is None
+
+
+@pytest.fixture
+def chatbot(monkeypatch, store):
+    monkeypatch.setenv("CHATBOT_MODEL", "local-stub")
+    monkeypatch.setenv("CHATBOT_MODEL_STARTUP", "lazy")
+    monkeypatch.setenv("CHATBOT_DATA_SOURCE", "store")
+    monkeypatch.setitem(sys.modules, "google.generativeai", None)
+    server = importlib.import_module("chatbot_server")
+    monkeypatch.setattr(server, "STORE_READER", store)
+    monkeypatch.setattr(server, "RESPONSE_CACHE", ResponseCache())
+    return server.app.test_client()
+
+
+def test_ask_answers_locally(chatbot):
+    response = chatbot.post("/ask", json={"question": "How many consecutive service days did Rake-01 have on day 4?"})
+    assert response.status_code == 200
+    assert response.get_json() == {"answer": "- Rake-01 on Day 4: 0 consecutive service day(s)", "source": "local"}
+
+
+def test_ask_falls_back_to_the_stub_model(chatbot):
+    question = {"question": "Why was Rake-02 in service on day 1?"}
+    first = chatbot.post("/ask", json=question).get_json()
+    assert first["source"] == "llm"
+    assert first["answer"].startswith("[local-stub]")
+    assert "Rake-02" in first["answer"]
+    assert chatbot.post("/ask", json=question).get_json() == {"answer": first["answer"], "source": "cache"}
+
+
+def test_cached_answers_belong_to_the_selected_model(chatbot, monkeypatch):
+    import chatbot_server
+    from model_selector import ModelSelector
+    question = {"question": "Why was Rake-03 on standby on day 2?"}
+    assert chatbot.post("/ask", json=question).get_json()["source"] == "llm"
+    assert chatbot.post("/ask", json=question).get_json()["source"] == "cache"
+    # The selector falls back to another model: its first answer must not come from the cache.
+    monkeypatch.setattr(chatbot_server, "MODEL_SELECTOR", ModelSelector.fixed(chatbot_server.LocalStubModel(), "fallback-model"))
+    assert chatbot.post("/ask", json=question).get_json()["source"] == "llm"
+
+
+def test_ask_without_simulation_data(chatbot, monkeypatch, tmp_path):
+    import chatbot_server
+    # An empty store, as the backend creates it on startup.
+    SimulationStoreWriter(str(tmp_path / "empty.sqlite")).is_empty()
+    monkeypatch.setattr(chatbot_server, "STORE_READER", SimulationStoreReader(str(tmp_path / "empty.sqlite")))
+    response = chatbot.post("/ask", json={"question": "Why was Rake-03 on standby on day 2?"})
+    assert response.status_code == 200
+    assert response.get_json()["answer"] == "No simulation data found. Run a simulation first."
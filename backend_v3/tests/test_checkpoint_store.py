@@ -0,0 +1,38 @@
+import os
+
+from checkpoint_store import (MANIFEST_FILE, backup_checkpoints, load_checkpoint, load_manifest, restore_checkpoints,
+                              save_checkpoints, truncate_checkpoints)
+
+
+def test_save_and_load(tmp_path, log_entries):
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    save_checkpoints(log_entries, checkpoint_dir)
+    assert sorted(load_manifest(checkpoint_dir)["days"], key=int) == [str(entry["day"]) for entry in log_entries]
+    fleet_df, plan = load_checkpoint(3, checkpoint_dir)
+    assert plan == log_entries[2]["plan"]
+    assert fleet_df.to_dict("records") == log_entries[2]["fleet_status_after"]
+    assert fleet_df["branding_sla_active"].dtype == bool
+    assert load_checkpoint(99, checkpoint_dir) == (None, None)
+
+
+def test_truncate(tmp_path, log_entries):
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    save_checkpoints(log_entries, checkpoint_dir)
+    truncate_checkpoints(4, checkpoint_dir)
+    assert sorted(load_manifest(checkpoint_dir)["days"], key=int) == ["1", "2", "3"]
+    assert sorted(os.listdir(checkpoint_dir)) == ["day_001.npz", "day_002.npz", "day_003.npz", MANIFEST_FILE]
+
+
+def test_backup_and_restore(tmp_path, log_entries):
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    save_checkpoints(log_entries, checkpoint_dir)
+    backup = backup_checkpoints(4, checkpoint_dir)
+    assert sorted(backup, key=int) == ["4", "5", "6"]
+    # A rerun from day 4 that wrote one day before failing.
+    truncate_checkpoints(4, checkpoint_dir)
+    save_checkpoints([{**log_entries[3], "plan": {}}], checkpoint_dir)
+    restore_checkpoints(4, backup, checkpoint_dir)
+    fleet_df, plan = load_checkpoint(4, checkpoint_dir)
+    assert plan == log_entries[3]["plan"]
+    assert fleet_df.to_dict("records") == log_entries[3]["fleet_status_after"]
+    assert load_checkpoint(6, checkpoint_dir)[1] == log_entries[5]["plan"]
@@ -0,0 +1,59 @@
+from conftest import make_log_entries
+from convert_to_chatbot_format import CSV_COLUMNS, MAX_LOOKBACK_DAYS, convert_json_to_csv
+from log_store import DayShardedLogWriter
+
+
+def always_in_service(entries, train_id):
+    """Keeps train_id in service every day, so its streak grows past MAX_LOOKBACK_DAYS."""
+    for entry in entries:
+        plan = entry["plan"]
+        for status in plan:
+            plan[status] = [t for t in plan[status] if t != train_id]
+        plan["SERVICE"].append(train_id)
+    return entries
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_incremental_conversion_matches_a_full_one(tmp_path):
+    log_dir = str(tmp_path / "log")
+    writer = DayShardedLogWriter(log_dir)
+    for entry in always_in_service(make_log_entries(days=20), "Rake-01"):
+        writer.append(entry)
+    full, incremental = str(tmp_path / "full.csv"), str(tmp_path / "incremental.csv")
+    convert_json_to_csv(csv_file=incremental, log_dir=log_dir)
+
+    # A rerun from day 14 that takes Rake-01 out of service on day 15.
+    rerun = always_in_service(make_log_entries(days=20), "Rake-01")
+    rerun[14]["plan"]["SERVICE"].remove("Rake-01")
+    rerun[14]["plan"]["MAINTENANCE"].append("Rake-01")
+    for entry in rerun[13:]:
+        writer.append(entry)
+    convert_json_to_csv(csv_file=full, log_dir=log_dir)
+    convert_json_to_csv(from_day=14, csv_file=incremental, log_dir=log_dir)
+
+    rows = read_csv(full)
+    assert rows[0] == ",".join(CSV_COLUMNS)
+    assert read_csv(incremental) == rows
+    streaks = {int(day): int(streak) for day, train_id, status, _, streak, _ in (row.split(",") for row in rows[1:])
+               if train_id == "Rake-01" and status == "SERVICE"}
+    assert streaks[1] == 0 and streaks[12] == MAX_LOOKBACK_DAYS
+    # The streak restarts after the maintenance day.
+    assert 15 not in streaks and streaks[16] == 0 and streaks[17] == 1
+
+
+def test_incremental_conversion_keeps_earlier_rows(tmp_path):
+    log_dir, csv_file = str(tmp_path / "log"), str(tmp_path / "log.csv")
+    writer = DayShardedLogWriter(log_dir)
+    for entry in make_log_entries(days=8):
+        writer.append(entry)
+    convert_json_to_csv(csv_file=csv_file, log_dir=log_dir)
+    rows = read_csv(csv_file)
+    marked = rows[:1] + [rows[1].replace("NORMAL", "MARKED")] + rows[2:]
+    with open(csv_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(marked) + "\n")
+    convert_json_to_csv(from_day=5, csv_file=csv_file, log_dir=log_dir)
+    assert read_csv(csv_file) == marked
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from answer_final import (
+    CERTIFICATE_VALIDITY_DAYS,
+    DAILY_HOURS_PER_TRAIN,
+    DAILY_KM_PER_TRAIN,
+    PENALTY_PER_EXPIRED_DAY,
+    SIMULATION_START_DATE,
+    FleetState,
+    apply_daily_updates,
+    preprocess_and_health_score
+)
+from fleet_generator import generate_fleet
+
+
+# The row-masked pandas implementations the vectorized kernels replaced, kept as the reference.
+def reference_preprocess(df, current_day, manual_inputs):
+    df['cert_telecom_expiry'] = pd.to_datetime(df['cert_telecom_expiry'])
+    today = SIMULATION_START_DATE + timedelta(days=current_day - 1)
+    df['is_cert_expired'] = df['cert_telecom_expiry'] < today
+    df['health_score'] = 100.0
+    df['km_since_last_service'] = df['current_km'] - df['bogie_last_service_km']
+    df['health_score'] -= (df['km_since_last_service'] / 50).astype(float)
+    if 'consecutive_service_days' in df.columns:
+        df['health_score'] -= df['consecutive_service_days']*10
+    expired_trains = df[df['is_cert_expired']].index
+    if not expired_trains.empty:
+        days_expired = (today - df.loc[expired_trains, 'cert_telecom_expiry']).dt.days
+        expired_penalty = days_expired * PENALTY_PER_EXPIRED_DAY
+        df.loc[expired_trains, 'health_score'] -= expired_penalty
+    priority_penalties = {'LOW': 10, 'MEDIUM': 20, 'CRITICAL': 50}
+    for p, penalty in priority_penalties.items():
+        df.loc[(df['job_card_status'] == 'OPEN') & (df['job_card_priority'] == p), 'health_score'] -= penalty
+    df['manual_force_maintenance'] = False
+    for train_id, override in manual_inputs.items():
+        if 'health_penalty' in override: df.loc[df['train_id'] == train_id, 'health_score'] -= override['health_penalty']
+        if 'force_maintenance' in override: df.loc[df['train_id'] == train_id, 'manual_force_maintenance'] = True
+    df['health_score'] = df['health_score'].clip(lower=0)
+    return df
+
+
+def reference_apply_updates(df, plan, current_day):
+    service_trains, maintenance_trains = plan['SERVICE'], plan['MAINTENANCE']
+    today = SIMULATION_START_DATE + timedelta(days=current_day - 1)
+    if 'consecutive_service_days' not in df.columns: df['consecutive_service_days'] = 0
+    df.loc[df['train_id'].isin(service_trains), 'consecutive_service_days'] += 1
+    df.loc[~df['train_id'].isin(service_trains), 'consecutive_service_days'] = 0
+    df.loc[df['train_id'].isin(service_trains), 'current_km'] += DAILY_KM_PER_TRAIN
+    branded_service = df[(df['train_id'].isin(service_trains)) & (df['branding_sla_active'])]
+    df.loc[df.index.isin(branded_service.index), 'current_hours'] += DAILY_HOURS_PER_TRAIN
+    for train_id in maintenance_trains:
+        train_index = df[df['train_id'] == train_id].index
+        current_expiry = pd.to_datetime(df.loc[train_index, 'cert_telecom_expiry'].iloc[0])
+        if current_expiry < today:
+            new_expiry_date = today + timedelta(days=CERTIFICATE_VALIDITY_DAYS)
+            df.loc[train_index, 'cert_telecom_expiry'] = new_expiry_date
+    df.loc[df['train_id'].isin(maintenance_trains), 'health_score'] = 100
+    df.loc[df['train_id'].isin(maintenance_trains), 'bogie_last_service_km'] = df.loc[df['train_id'].isin(maintenance_trains), 'current_km']
+    maintained_indices = df[df['train_id'].isin(maintenance_trains)].index
+    df.loc[maintained_indices, 'job_card_status'] = 'CLOSED'
+    df.loc[maintained_indices, 'job_card_priority'] = 'NONE'
+    if 'total_service_days_month' not in df.columns: df['total_service_days_month'] = 0
+    if 'total_maintenance_days_month' not in df.columns: df['total_maintenance_days_month'] = 0
+    df.loc[df['train_id'].isin(service_trains), 'total_service_days_month'] += 1
+    df.loc[df['train_id'].isin(maintenance_trains), 'total_maintenance_days_month'] += 1
+    return df
+
+
+def records(df):
+    df = df.copy()
+    df['cert_telecom_expiry'] = df['cert_telecom_expiry'].dt.strftime('%Y-%m-%d')
+    return df.to_dict(orient='records')
+
+
+def random_day(rng, train_ids):
+    """Overrides for a few rakes (one of them unknown) and a random service/maintenance/standby split."""
+    picked = rng.choice(train_ids, size=4, replace=False)
+    manual_inputs = {picked[0]: {"health_penalty": float(rng.integers(5, 60))}, picked[1]: {"force_maintenance": True},
+                     picked[2]: {"health_penalty": 30, "force_maintenance": True}, "Rake-9999": {"health_penalty": 10}}
+    assignment = rng.integers(0, 3, size=len(train_ids))
+    plan = {status: [t for t, a in zip(train_ids, assignment) if a == k] for k, status in enumerate(("SERVICE", "MAINTENANCE", "STANDBY"))}
+    return manual_inputs, plan
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("n_rakes", [25, 120])
+def test_vectorized_paths_match_the_reference(seed, n_rakes):
+    fleet = generate_fleet(n_rakes, seed=seed, expiry_offset_days=(-20, 25), open_job_card_ratio=0.4)
+    rng = np.random.default_rng(seed)
+    train_ids = fleet['train_id'].tolist()
+    reference, vectorized, state = fleet.copy(), fleet.copy(), FleetState(fleet)
+    for day in range(1, 16):
+        manual_inputs, plan = random_day(rng, train_ids)
+        reference = reference_preprocess(reference, day, manual_inputs)
+        vectorized = preprocess_and_health_score(vectorized, day, manual_inputs)
+        state.preprocess(day, manual_inputs)
+        pd.testing.assert_frame_equal(vectorized, reference, check_exact=True)
+        assert state.to_records() == records(reference)
+
+        reference = reference_apply_updates(reference, plan, day)
+        vectorized = apply_daily_updates(vectorized, plan, day)
+        state.apply_updates(plan, day)
+        pd.testing.assert_frame_equal(vectorized, reference, check_exact=True)
+        assert state.to_records() == records(reference)
@@ -0,0 +1,87 @@
+import json
+import os
+
+import joblib
+import pandas as pd
+
+from answer_final import SCENARIO_MODIFIERS
+from brain_make import metadata_file
+from conftest import BACKEND_DIR, FEATURES
+from incremental_training import MAX_TREES, STRATEGY_KEYS, append_log, update_strategist
+from strategy_grid import CompiledStrategist, compile_strategist
+
+
+def _training_entries(days, first_day=1):
+    """Log entries carrying the features, strategy and cost that append_log records."""
+    entries = []
+    for day in range(first_day, first_day + days):
+        entries.append({
+            "day": day,
+            "scenario": "NORMAL",
+            "feature_names": FEATURES,
+            "feature_values": [25, 18, 80.0 + day % 10, 0, 0],
+            "ai_strategy": dict(zip(STRATEGY_KEYS, [1.0 + day / 100, 1.5, 50.0, 200.0, 70.0])),
+            # Every other day is cheap, so half the rows count as successful.
+            "cost": 1000 + 500 * (day % 2),
+            "solver_status": "OPTIMAL",
+        })
+    return entries
+
+
+def _saved_model(tmp_path, trees):
+    from brain_make import build_model, for_inference, load_training_data
+    X, y = load_training_data(os.path.join(BACKEND_DIR, "historical_data_retrain.csv"))
+    model = build_model({'n_estimators': trees, 'max_depth': 4, 'min_samples_leaf': 1})
+    model.fit(X, y)
+    model_file = str(tmp_path / "model.joblib")
+    joblib.dump(for_inference(model), model_file)
+    return model_file
+
+
+def test_append_log_adds_only_new_rows(tmp_path):
+    store_file = str(tmp_path / "store.csv")
+    assert append_log(_training_entries(10), store_file) == 10
+    # A rerun logs the same days again plus a few new ones.
+    assert append_log(_training_entries(14), store_file) == 4
+    assert append_log(_training_entries(14), store_file) == 0
+    store = pd.read_csv(store_file)
+    assert store['day'].tolist() == list(range(1, 15))
+    assert store['row_key'].is_unique
+
+
+def test_update_learns_each_row_once(tmp_path):
+    model_file, store_file = _saved_model(tmp_path, trees=5), str(tmp_path / "store.csv")
+    append_log(_training_entries(20), store_file)
+    first = update_strategist(model_file, store_file, trees=2, grid_file=None)
+    assert first["updated"] and first["new_rows"] == 10
+    assert first["trees_per_target"] == [7] * 5
+    # Nothing new: the rows already learned are not fitted again.
+    assert not update_strategist(model_file, store_file, trees=2, grid_file=None)["updated"]
+    append_log(_training_entries(12, first_day=21), store_file)
+    second = update_strategist(model_file, store_file, trees=2, grid_file=None)
+    assert second["new_rows"] == 6
+    with open(metadata_file(model_file), encoding="utf-8") as f:
+        incremental = json.load(f)["incremental"]
+    assert incremental["rows_learned"] == 32
+    assert [update["new_rows"] for update in incremental["updates"]] == [10, 6]
+
+
+def test_forests_are_capped(tmp_path):
+    model_file, store_file = _saved_model(tmp_path, trees=MAX_TREES - 5), str(tmp_path / "store.csv")
+    append_log(_training_entries(20), store_file)
+    update = update_strategist(model_file, store_file, trees=10, grid_file=None)
+    assert update["trees_dropped"] == 5 * 5
+    assert update["trees_per_target"] == [MAX_TREES] * 5
+    assert all(len(forest.estimators_) == MAX_TREES for forest in joblib.load(model_file).estimators_)
+
+
+def test_update_recompiles_the_grid(tmp_path):
+    model_file, store_file = _saved_model(tmp_path, trees=5), str(tmp_path / "store.csv")
+    grid_file = str(tmp_path / "grid.npz")
+    compile_strategist(joblib.load(model_file), [25], SCENARIO_MODIFIERS, source_model_file=model_file).save(grid_file)
+    assert CompiledStrategist.load(grid_file).is_current(model_file)
+    append_log(_training_entries(20), store_file)
+    assert update_strategist(model_file, store_file, trees=2, grid_file=grid_file)["updated"]
+    grid = CompiledStrategist.load(grid_file)
+    assert grid.is_current(model_file)
+    assert sorted({key[0] for key in grid.keys}) == [25]
@@ -0,0 +1,92 @@
+import json
+
+from conftest import make_log_entries
+from log_store import (KEYFRAME_INTERVAL, DayShardedLogWriter, decode_snapshot, encode_log, encode_snapshot,
+                       iter_log, list_days, migrate_legacy_log, read_day, read_log)
+
+
+def _json_round_trip(value):
+    return json.loads(json.dumps(value))
+
+
+def test_snapshot_round_trip_keeps_types():
+    base = {"train_id": ["Rake-01", "Rake-02", "Rake-03"], "value": [1, 1.0, True]}
+    columns = {"train_id": ["Rake-01", "Rake-02", "Rake-03"], "value": [1.0, True, 1]}
+    encoded = _json_round_trip(encode_snapshot(columns, base))
+    assert not encoded.get("keyframe")
+    decoded = decode_snapshot(encoded, base)
+    assert decoded == columns
+    assert [type(v) for v in decoded["value"]] == [float, bool, int]
+
+
+def test_snapshot_delta_stores_only_changed_rows():
+    base = {"train_id": [f"Rake-{i:02d}" for i in range(10)], "km": list(range(10)), "flag": [False] * 10}
+    columns = {"train_id": base["train_id"], "km": list(range(10)), "flag": [False] * 10}
+    columns["km"][3] = 300
+    encoded = encode_snapshot(columns, base)
+    assert encoded["changed"] == {"km": {"rows": [3], "values": [300]}}
+    assert decode_snapshot(encoded, base) == columns
+    # Another set of rakes cannot be a delta.
+    assert encode_snapshot(columns, {"train_id": base["train_id"][:5]})["keyframe"]
+
+
+def test_writer_round_trip_across_keyframes(tmp_path):
+    entries = make_log_entries(days=KEYFRAME_INTERVAL * 2 + 3)
+    log_dir = str(tmp_path / "log")
+    writer = DayShardedLogWriter(log_dir)
+    for entry in entries:
+        writer.append(entry)
+    assert read_log(log_dir) == entries
+    # Reading from the middle of a delta chain rebuilds its base from the keyframe.
+    assert read_day(KEYFRAME_INTERVAL + 5, log_dir) == entries[KEYFRAME_INTERVAL + 4]
+    assert list(iter_log(log_dir, start_day=14, end_day=16)) == entries[13:16]
+    assert "fleet_status_after" not in read_day(3, log_dir, decode_fleet=False)
+
+
+def test_rewriting_days_after_truncate(tmp_path):
+    entries = make_log_entries(days=15)
+    log_dir = str(tmp_path / "log")
+    writer = DayShardedLogWriter(log_dir)
+    for entry in entries:
+        writer.append(entry)
+    writer.truncate(8)
+    assert list_days(log_dir) == list(range(1, 8))
+    # A new writer (another process) appends against the shards on disk.
+    rerun = make_log_entries(days=15, rakes=5)
+    for entry in rerun[7:]:
+        entry["cost"] = -entry["cost"]
+        DayShardedLogWriter(log_dir).append(entry)
+    assert read_log(log_dir) == entries[:7] + rerun[7:]
+
+
+def test_backup_and_restore_days(tmp_path, log_entries):
+    log_dir = str(tmp_path / "log")
+    writer = DayShardedLogWriter(log_dir)
+    for entry in log_entries:
+        writer.append(entry)
+    backup = writer.backup_days(4)
+    writer.truncate(4)
+    writer.restore_days(4, backup)
+    assert read_log(log_dir) == log_entries
+
+
+def test_encode_log_matches_entries(log_entries):
+    encoded = _json_round_trip(encode_log(log_entries))
+    assert encoded[0]["fleet_encoding"]["before"]["keyframe"]
+    assert not encoded[1]["fleet_encoding"]["before"].get("keyframe")
+
+
+def test_migrate_legacy_log(tmp_path, log_entries):
+    log_dir, legacy_file = str(tmp_path / "log"), str(tmp_path / "master.json")
+    with open(legacy_file, "w", encoding="utf-8") as f:
+        json.dump(log_entries, f)
+    # Before migration the master log is read as is.
+    assert read_log(log_dir, legacy_file) == log_entries
+    migrate_legacy_log(log_dir, legacy_file)
+    assert list_days(log_dir) == [entry["day"] for entry in log_entries]
+    assert read_log(log_dir, legacy_file) == log_entries
+    assert not (tmp_path / "log.tmp").exists()
+    # Migrating again leaves the shards alone.
+    DayShardedLogWriter(log_dir).truncate(3)
+    migrate_legacy_log(log_dir, legacy_file)
+    assert list_days(log_dir) == [1, 2]
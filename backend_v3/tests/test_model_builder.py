@@ -0,0 +1,24 @@
+import pytest
+
+from answer_final import preprocess_and_health_score, solve_daily_optimization, solve_daily_optimization_rowwise
+from benchmark_model_builder import BENCH_STRATEGY
+from fleet_generator import generate_fleet
+
+
+@pytest.mark.parametrize("n_rakes", [25, 100, 250])
+@pytest.mark.parametrize("scenario", ["NORMAL", "HEAVY_MONSOON", "FESTIVAL_SURGE"])
+@pytest.mark.parametrize("day", [5, 13, 28])
+def test_columnar_builder_matches_rowwise(n_rakes, scenario, day):
+    fleet = preprocess_and_health_score(generate_fleet(n_rakes, seed=n_rakes + day), day, {})
+    expected_plan, expected_cost = solve_daily_optimization_rowwise(fleet, day, scenario, BENCH_STRATEGY)
+    plan, cost, solve_info = solve_daily_optimization(fleet, day, scenario, BENCH_STRATEGY)
+    assert solve_info["solver_status"] == "OPTIMAL"
+    assert cost == expected_cost
+    assert plan == expected_plan
+
+
+def test_default_strategy_and_manual_inputs_match_rowwise():
+    manual_inputs = {"Rake-0003": {"force_maintenance": True}, "Rake-0007": {"health_penalty": 50}}
+    fleet = preprocess_and_health_score(generate_fleet(60, seed=7), 10, manual_inputs)
+    assert fleet.set_index("train_id").loc["Rake-0003", "manual_force_maintenance"]
+    assert solve_daily_optimization(fleet, 10, "NORMAL")[:2] == solve_daily_optimization_rowwise(fleet, 10, "NORMAL")
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+
+from model_selector import ModelSelector
+
+
+class FakeModels:
+    """Factory whose models answer, fail or hang according to `behaviour[name]`."""
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.probed = []
+        self.release = threading.Event()
+
+    def __call__(self, name):
+        factory = self
+
+        class Model:
+            model_name = name
+
+            def generate_content(self, prompt):
+                factory.probed.append(name)
+                if factory.behaviour[name] == "fail":
+                    raise RuntimeError(f"404 {name} not found")
+                if factory.behaviour[name] == "hang":
+                    factory.release.wait(10)
+                return "Hi"
+
+        return Model()
+
+
+def test_hung_preferred_model_is_abandoned_at_the_deadline(tmp_path):
+    models = FakeModels({"best": "hang", "good": "ok"})
+    selector = ModelSelector(["best", "good"], models, probe_timeout_s=0.3, state_file=str(tmp_path / "choice.json"))
+    started = time.monotonic()
+    assert selector.get(timeout=5).model_name == "good"
+    assert 0.3 <= time.monotonic() - started < 3
+    assert selector.status()["probe_results"] == {"best": "timed out after 0.3s", "good": "ok"}
+    models.release.set()
+
+
+def test_preferred_model_wins_without_waiting_for_others(tmp_path):
+    models = FakeModels({"best": "ok", "slow": "hang"})
+    selector = ModelSelector(["best", "slow"], models, probe_timeout_s=5, state_file=str(tmp_path / "choice.json"))
+    started = time.monotonic()
+    assert selector.get(timeout=5).model_name == "best"
+    assert time.monotonic() - started < 2
+    assert selector.status()["probe_results"]["slow"] == "not needed"
+    models.release.set()
+
+
+def test_all_candidates_failing(tmp_path):
+    selector = ModelSelector(["a", "b"], FakeModels({"a": "fail", "b": "fail"}), probe_timeout_s=1, state_file=None)
+    assert selector.get(timeout=5) is None
+    assert selector.state == "failed" and selector.error
+    # A failed selection is not retried on every question.
+    assert selector.start().state == "failed"
+
+
+def test_report_failure_falls_back_and_saved_choice_is_reused(tmp_path):
+    state_file = tmp_path / "choice.json"
+    models = FakeModels({"best": "ok", "good": "ok"})
+    selector = ModelSelector(["best", "good"], models, probe_timeout_s=1, state_file=str(state_file))
+    assert selector.get(timeout=5).model_name == "best"
+    assert json.loads(state_file.read_text())["model"] == "best"
+
+    # A failure reported for a model that is no longer selected is ignored.
+    selector.report_failure("good")
+    assert selector.model_name == "best"
+    models.behaviour["best"] = "fail"
+    selector.report_failure("best")
+    assert selector.get(timeout=5).model_name == "good"
+    assert json.loads(state_file.read_text())["model"] == "good"
+
+    # The next start reuses the saved choice without probing anything.
+    restarted = FakeModels({"best": "ok", "good": "ok"})
+    assert ModelSelector(["best", "good"], restarted, state_file=str(state_file)).get(timeout=5).model_name == "good"
+    assert restarted.probed == []
+
+
+def test_fixed_and_failed_selectors():
+    assert ModelSelector.fixed("model", "local-stub").get(timeout=0) == "model"
+    failed = ModelSelector.failed("no key")
+    assert failed.get(timeout=0) is None and failed.status()["error"] == "no key"
@@ -0,0 +1,92 @@
+import json
+
+import response_cache
+from response_cache import ResponseCache, cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_normalizes_questions():
+    assert cache_key("Why was Rake-03 in service?", 5, ["Rake-03"], "v1") == \
+        cache_key("  why was  rake-03 in service ", 5, ["Rake-03", "Rake-03"], "v1")
+    assert cache_key("why", 5, [], "v1") != cache_key("why", 5, [], "v2")
+
+
+def test_ttl_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    cache = ResponseCache(ttl_s=60)
+    cache.put("a", "answer")
+    clock.now += 59
+    assert cache.get("a") == "answer"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_new_data_version_drops_entries():
+    cache = ResponseCache()
+    cache.sync_version("v1")
+    cache.put("a", 1)
+    cache.sync_version("v1")
+    assert cache.get("a") == 1
+    cache.sync_version("v2")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_puts_are_saved_on_flush_not_per_request(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = ResponseCache(persist_file=str(path), save_delay_s=3600)
+    cache.sync_version("v1")
+    cache.put("a", "first")
+    cache.put("b", "second")
+    assert not path.exists()
+    cache.flush()
+    assert json.loads(path.read_text())["data_version"] == "v1"
+
+    reloaded = ResponseCache(persist_file=str(path))
+    assert (reloaded.get("a"), reloaded.get("b")) == ("first", "second")
+    reloaded.sync_version("v1")
+    assert reloaded.get("a") == "first"
+
+
+def test_pending_changes_are_saved_after_the_delay(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = ResponseCache(persist_file=str(path), save_delay_s=0.2)
+    cache.put("a", "answer")
+    timer = cache._save_timer
+    assert not path.exists()
+    timer.join(5)
+    assert list(json.loads(path.read_text())["entries"]) == ["a"]
+
+
+def test_reload_skips_expired_entries(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    path = tmp_path / "cache.json"
+    cache = ResponseCache(ttl_s=60, persist_file=str(path), save_delay_s=3600)
+    cache.put("old", 1)
+    clock.now += 30
+    cache.put("new", 2)
+    cache.flush()
+    clock.now += 45
+    reloaded = ResponseCache(ttl_s=60, persist_file=str(path))
+    assert reloaded.stats()["entries"] == 1 and reloaded.get("new") == 2
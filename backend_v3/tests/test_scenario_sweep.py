@@ -0,0 +1,27 @@
+import json
+
+from scenario_sweep import log_metrics, summarize
+
+
+def _log(days, service):
+    return [{"day": day, "cost": 100.0 * day, "plan": {"SERVICE": ["Rake-01"] * service, "MAINTENANCE": []}}
+            for day in range(1, days + 1)]
+
+
+def test_summary_of_runs():
+    calendars = [["NORMAL"] * 3, ["NORMAL"] * 3]
+    results = [log_metrics(_log(3, 6), calendars[0]), log_metrics(_log(2, 0), calendars[1])]
+    summary = summarize(results, calendars)
+    assert summary["runs"] == 2 and summary["failed_runs"] == 1
+    assert summary["per_day"]["cost"]["mean"] == [100.0, 200.0, 300.0]
+    assert summary["monthly_cost"]["mean"] == 450.0
+    assert summary["shortfall_days"] == {"mean": 1.0, "max": 2}
+    assert summary["availability"] == 1 - 2 / 5
+
+
+def test_summary_without_runs():
+    summary = summarize([], [])
+    assert summary == {"runs": 0, "failed_runs": 0, "per_day": {}, "monthly_cost": None, "shortfall_days": None,
+                       "availability": None}
+    # The sweep writes the summary out as JSON.
+    json.dumps(summary)
@@ -0,0 +1,75 @@
+import threading
+
+from sim_jobs import JobCancelled, JobManager, JobRejected
+
+
+def test_cancelled_queued_job_never_runs():
+    jobs = JobManager(max_workers=1)
+    release, ran = threading.Event(), []
+    blocker, _ = jobs.submit("block", {}, lambda job: release.wait(5), total_days=1)
+    queued, _ = jobs.submit("run", {}, lambda job: ran.append(job.id), total_days=1)
+    assert jobs.cancel(queued.id).status == "cancelled"
+    # Done only once the pool has dequeued it, so wait() never returns while it could still start.
+    assert not queued.wait(0.05)
+    release.set()
+    assert queued.wait(5) and blocker.wait(5)
+    assert ran == [] and queued.status == "cancelled" and blocker.status == "succeeded"
+
+
+def test_wait_returns_after_the_run_finishes():
+    jobs = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def target(job):
+        started.set()
+        release.wait(5)
+        job.report_day(1)
+
+    job, _ = jobs.submit("run", {}, target, total_days=1)
+    assert started.wait(5)
+    # Cancelling a running job only asks it to stop after its current day.
+    jobs.cancel(job.id)
+    assert job.status == "running" and not job.wait(0.05)
+    release.set()
+    assert job.wait(5) and job.status == "cancelled" and job.days_done == 1
+
+
+def test_outcomes_and_coalescing():
+    jobs = JobManager(max_workers=1)
+    release = threading.Event()
+    first, coalesced = jobs.submit("run", {"a": 1}, lambda job: release.wait(5), total_days=1)
+    again, coalesced_again = jobs.submit("run", {"a": 1}, lambda job: None, total_days=1)
+    assert not coalesced and coalesced_again and again is first
+    release.set()
+
+    def reject(job):
+        raise JobRejected("no data")
+
+    def fail(job):
+        raise RuntimeError("boom")
+
+    def cancel(job):
+        raise JobCancelled()
+
+    results = [jobs.submit(kind, {}, target, total_days=1)[0] for kind, target in (("reject", reject), ("fail", fail), ("cancel", cancel))]
+    for job in results:
+        assert job.wait(5)
+    assert [(job.status, job.error) for job in results] == [("rejected", "no data"), ("failed", "boom"), ("cancelled", None)]
+
+
+def test_follow_replays_and_forwards_entries():
+    jobs = JobManager(max_workers=1)
+    reported, release = threading.Event(), threading.Event()
+
+    def target(job):
+        job.report_day(1, {"day": 1})
+        reported.set()
+        release.wait(5)
+        job.report_day(2, {"day": 2})
+
+    job, _ = jobs.submit("run", {}, target, total_days=2)
+    assert reported.wait(5)
+    entries = job.follow()
+    release.set()
+    assert [entry["day"] for entry in entries] == [1, 2]
+    assert job.wait(5) and job.follow() is None
@@ -0,0 +1,65 @@
+import threading
+
+from simulation_store import SimulationStoreReader, SimulationStoreWriter
+
+
+def test_days_round_trip(tmp_path, log_entries):
+    path = str(tmp_path / "store.sqlite")
+    writer = SimulationStoreWriter(path)
+    assert writer.is_empty()
+    writer.write_days(log_entries)
+    reader = SimulationStoreReader(path).refresh()
+    assert reader.days == [entry["day"] for entry in log_entries]
+    summary = reader.day_summary(2)
+    assert summary["status"]["SERVICE"] == log_entries[1]["plan"]["SERVICE"]
+
+
+def test_writer_shared_between_threads(tmp_path, log_entries):
+    path = str(tmp_path / "store.sqlite")
+    writer = SimulationStoreWriter(path)
+    # Opened on this thread first, as the backend does at startup.
+    writer.write_days(log_entries[:1])
+    errors = []
+
+    def write(entries):
+        try:
+            for entry in entries:
+                writer.write_days([entry])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(log_entries[i::3],)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    truncating = threading.Thread(target=writer.truncate, args=(4,))
+    truncating.start()
+    truncating.join()
+
+    assert errors == []
+    reader = SimulationStoreReader(path).refresh()
+    assert reader.days == [1, 2, 3]
+    assert {row["train_id"] for row in reader.history("Rake-01")} == {"Rake-01"}
+
+
+def test_version_bumps_on_every_write(tmp_path, log_entries):
+    path = str(tmp_path / "store.sqlite")
+    writer = SimulationStoreWriter(path)
+    writer.write_days(log_entries)
+    reader = SimulationStoreReader(path).refresh()
+    version = reader.data_version
+    writer.truncate(3)
+    assert reader.refresh().data_version != version
+    assert reader.days == [1, 2]
+
+
+def test_recreated_store_gets_a_new_version(tmp_path, log_entries):
+    path = tmp_path / "store.sqlite"
+    SimulationStoreWriter(str(path)).write_days(log_entries)
+    version = SimulationStoreReader(str(path)).refresh().data_version
+    for leftover in tmp_path.glob("store.sqlite*"):
+        leftover.unlink()
+    # The same writes on a fresh file reach the same version count; the versions must still differ.
+    SimulationStoreWriter(str(path)).write_days(log_entries)
+    assert SimulationStoreReader(str(path)).refresh().data_version != version
@@ -0,0 +1,42 @@
+import joblib
+import numpy as np
+import pandas as pd
+
+from answer_final import SCENARIO_MODIFIERS
+from conftest import FEATURES
+from strategy_grid import CompiledStrategist, compile_strategist, reachable_keys
+
+FLEET_SIZES = [25]
+
+
+def _forest_rows(keys, health_values):
+    return pd.DataFrame([dict(zip(FEATURES, (size, target, health, monsoon, surge)))
+                         for size, target, monsoon, surge in keys for health in health_values])[FEATURES]
+
+
+def test_step_grid_reproduces_the_forest(tmp_path, strategist):
+    model_file = str(tmp_path / "model.joblib")
+    joblib.dump(strategist, model_file)
+    compiled = compile_strategist(strategist, FLEET_SIZES, SCENARIO_MODIFIERS, source_model_file=model_file)
+    assert not compiled.max_abs_error.any()
+
+    keys = reachable_keys(FLEET_SIZES, SCENARIO_MODIFIERS)
+    # Random healths plus the split thresholds themselves, where a step table is most likely to be off by one.
+    health_values = np.concatenate([np.random.default_rng(0).uniform(0, 100, 200), compiled.health_nodes[:-1]])
+    rows = _forest_rows(keys, health_values)
+    np.testing.assert_array_equal(compiled.predict(rows.to_numpy()), strategist.predict(rows))
+
+    path = str(tmp_path / "grid.npz")
+    compiled.save(path)
+    loaded = CompiledStrategist.load(path)
+    assert loaded.is_current(model_file)
+    conditions = rows.iloc[5].to_dict()
+    assert loaded.predict_conditions(conditions) == strategist.predict(rows.iloc[5:6])[0].tolist()
+
+
+def test_off_grid_inputs_fall_back_to_the_forest(tmp_path, strategist):
+    model_file = str(tmp_path / "model.joblib")
+    joblib.dump(strategist, model_file)
+    compiled = compile_strategist(strategist, FLEET_SIZES, SCENARIO_MODIFIERS, source_model_file=model_file)
+    rows = _forest_rows([(30, 6, 0, 0)], [55.0, 80.0])
+    np.testing.assert_array_equal(compiled.predict(rows.to_numpy()), strategist.predict(rows))
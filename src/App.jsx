@@ -374,7 +374,11 @@ export default function App() {
   useEffect(() => {
     const fetchInitialData = async () => {
       setLoading(true);
-      const data = await loadSimulationData();
+      // A fresh run streams its days: show each one as soon as it arrives
+      const data = await loadSimulationData((day) => {
+        setSimulationData(previous => [...previous, day]);
+        setLoading(false);
+      });
       setSimulationData(data);
       
       // Load AI explanations
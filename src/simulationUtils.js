@@ -3,40 +3,109 @@ import { useState } from 'react';
 // Constants
 const API_BASE_URL = 'http://localhost:5001';
 
-// Main simulation data loading function
-export const loadSimulationData = async () => {
+// Rebuild one column-wise fleet snapshot from its keyframe or its delta against base
+const decodeSnapshot = (encoded, base) => {
+  if (encoded.keyframe) return encoded.values;
+  const columns = {};
+  for (const col of encoded.columns) {
+    const delta = encoded.changed[col];
+    if (!delta) {
+      columns[col] = base[col];
+    } else if (delta.rows) {
+      const values = base[col].slice();
+      delta.rows.forEach((row, i) => { values[row] = delta.values[i]; });
+      columns[col] = values;
+    } else {
+      columns[col] = delta.values;
+    }
+  }
+  return columns;
+};
+
+const snapshotToRecords = (columns) => {
+  const names = Object.keys(columns);
+  const length = names.length ? columns[names[0]].length : 0;
+  return Array.from({ length }, (_, i) => Object.fromEntries(names.map(name => [name, columns[name][i]])));
+};
+
+// Expand a log fetched with ?encoding=delta back into full fleet_status_before/after records
+export const decodeDeltaLog = (entries) => {
+  let previousAfter = null;
+  return entries.map(entry => {
+    if (!entry.fleet_encoding) return entry;
+    const { fleet_encoding: encoding, ...rest } = entry;
+    const before = decodeSnapshot(encoding.before, previousAfter);
+    const after = decodeSnapshot(encoding.after, before);
+    previousAfter = after;
+    return { ...rest, fleet_status_before: snapshotToRecords(before), fleet_status_after: snapshotToRecords(after) };
+  });
+};
+
+// Run (or rerun) the simulation and receive each day as soon as it is solved.
+// onDay is called with every day entry; resolves with the full list of streamed days.
+export const streamSimulation = async (startDay = 1, overrides = {}, onDay = () => {}) => {
+  const response = await fetch(`${API_BASE_URL}/stream_simulation`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({
+      start_day: startDay,
+      manual_overrides: overrides
+    })
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Streaming simulation failed with status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const days = [];
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const day = JSON.parse(line);
+    // A run that fails or is cancelled ends the stream with an error object instead of a day
+    if (day.status === 'error') {
+      throw new Error(day.message);
+    }
+    if (day.day === undefined) return;
+    days.push(day);
+    onDay(day);
+  };
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+  return days;
+};
+
+// Main simulation data loading function.
+// With no stored data it runs the month, calling onDay with each day as soon as it is solved.
+export const loadSimulationData = async (onDay = () => {}) => {
   // Try to get existing simulation data first, fallback to local JSON if it fails
   try {
     console.log('Attempting to load existing simulation data from API...');
-    const response = await fetch(`${API_BASE_URL}/get_simulation_data`);
+    const response = await fetch(`${API_BASE_URL}/get_simulation_data?encoding=delta`);
     
     if (response.ok) {
       const result = await response.json();
       if (result.status === 'success' && result.data) {
         console.log('Successfully loaded simulation data from API:', result.data.length, 'days');
-        return result.data;
+        return decodeDeltaLog(result.data);
       }
     }
     
     console.log('No existing simulation data found, running new simulation...');
-    const simResponse = await fetch(`${API_BASE_URL}/run_full_simulation`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      }
-    });
-    
-    if (!simResponse.ok) {
-      throw new Error(`API failed with status: ${simResponse.status}`);
-    }
-
-    const simResult = await simResponse.json();
-    if (simResult.status === 'error') {
-      throw new Error(simResult.message);
-    }
-    
-    console.log('Successfully generated simulation data from API:', simResult.data?.length || 0, 'days');
-    return simResult.data || [];
+    const days = await streamSimulation(1, {}, onDay);
+    console.log('Successfully generated simulation data from API:', days.length, 'days');
+    return days;
   } catch (error) {
     console.error('Failed to load simulation from API:', error);
     console.log('Falling back to local JSON file...');